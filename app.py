@@ -1,46 +1,69 @@
 import os
 
 import streamlit as st
-from dotenv import load_dotenv
 
 from auth.rbac import create_navigation_pages
 from auth.auth import render_auth_sidebar
-from pages import ALL_PAGES
-
-# Load environment variables
-load_dotenv(override=True)
+from auth.oidc_metadata import install_oidc_metadata_cache
+from db.instrumentation import track_rerun
+from monitoring.metrics import start_metrics
+from monitoring.profiler import profile_rerun
+from monitoring.session_memory import track_session_memory
+from pages import get_all_pages
+from utils.admission import admission_scope
+from utils.env import load_env
 
 # Constants
 # SOME_FILE_PATH = "hello.txt"
 
-st.set_page_config(
-    page_icon="🛬", # use same icon for all pages
-    page_title="My Streamlit App",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Always render auth sidebar to ensure login/logout UI is available
-render_auth_sidebar()
-
-# Create navigation with only pages the current user can access.
-pages = create_navigation_pages(ALL_PAGES)
-
-# Check for and display RBAC warning if applicable
-if st.session_state.get('rbac_using_defaults_due_to_no_persistent_db', False):
-    st.warning(
-        "**⚠️ RBAC Using Default/Temporary Settings:**\n\n"
-        "The `DATABASE_URL` environment variable is not set. "
-        "The application is using temporary, non-persistent settings for page access control, "
-        "loaded from `get_default_page_access_config()` in `pages.py`.\n\n"
-        "Any changes to access rules (e.g., via an admin panel) **will not be saved.**\n\n"
-        "To enable persistent storage for Role-Based Access Control, configure `DATABASE_URL` (e.g., for PostgreSQL).",
-        icon="💾"
+# Time each phase of this rerun (see monitoring/profiler.py), attribute every query
+# issued during it (see db/instrumentation.py), account the session's state size
+# when it ends (see monitoring/session_memory.py) and release the page concurrency
+# slots it took (see utils/admission.py)
+with profile_rerun() as profile, track_rerun() as rerun, track_session_memory(), admission_scope():
+    # Load environment variables (re-read only when .env changes, see utils/env.py)
+    with profile.phase("load_env"):
+        load_env()
+
+    # Start the Prometheus exporters if configured (once per process, see monitoring/metrics.py)
+    start_metrics()
+
+    # Serve OIDC discovery metadata and JWKS to login flows from the cache (see auth/oidc_metadata.py)
+    install_oidc_metadata_cache()
+
+    st.set_page_config(
+        page_icon="🛬", # use same icon for all pages
+        page_title="My Streamlit App",
+        layout="wide",
+        initial_sidebar_state="expanded"
     )
 
-if pages:
-    pg = st.navigation(pages)
-    pg.run()
-else:
-    # If no pages are accessible, show a message
-    st.warning("No pages are accessible. Please log in to continue.")
\ No newline at end of file
+    # Always render auth sidebar to ensure login/logout UI is available
+    with profile.phase("auth"):
+        render_auth_sidebar()
+
+    # Create navigation with only pages the current user can access.
+    with profile.phase("rbac"):
+        pages = create_navigation_pages(get_all_pages(write_manifest=True))
+
+    # Check for and display RBAC warning if applicable
+    if st.session_state.get('rbac_using_defaults_due_to_no_persistent_db', False):
+        st.warning(
+            "**⚠️ RBAC Using Default/Temporary Settings:**\n\n"
+            "The `DATABASE_URL` environment variable is not set. "
+            "The application is using temporary, non-persistent settings for page access control, "
+            "taken from the `PAGE_META` declared by each page (see `pages.py`).\n\n"
+            "Any changes to access rules (e.g., via an admin panel) **will not be saved.**\n\n"
+            "To enable persistent storage for Role-Based Access Control, configure `DATABASE_URL` (e.g., for PostgreSQL).",
+            icon="💾"
+        )
+
+    if pages:
+        with profile.phase("navigation"):
+            pg = st.navigation(pages)
+        profile.page = rerun.page = pg.title
+        with profile.phase("page"):
+            pg.run()
+    else:
+        # If no pages are accessible, show a message
+        st.warning("No pages are accessible. Please log in to continue.")
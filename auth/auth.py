@@ -9,8 +9,13 @@ from typing import Optional, List, Callable, Dict
 import os
 from dataclasses import dataclass, field
 
-from dotenv import load_dotenv
-load_dotenv(override=True)
+from utils.env import load_env
+from monitoring.metrics import counter, histogram
+load_env()
+
+# Metrics (see monitoring/metrics.py)
+USER_LOOKUPS = counter("auth_current_user_total", "get_current_user calls by outcome", ["state"])
+USER_LOOKUP_SECONDS = histogram("auth_current_user_seconds", "get_current_user latency")
 
 # @lru_cache(maxsize=1)
 def _get_auth_provider_name() -> str:
@@ -44,6 +49,11 @@ class User:
             self._roles = self._raw_user_obj.get(roles_claim, [])
         return self._roles
 
+    @property
+    def user_id(self) -> Optional[str]:
+        """The identity provider's user ID (`sub` claim, e.g. auth0|123456)."""
+        return self._raw_user_obj.get("sub")
+
     @classmethod
     def from_st_user(cls, st_user_obj) -> Optional['User']:
         if not st_user_obj or not hasattr(st_user_obj, 'email'):
@@ -55,6 +65,7 @@ class User:
         )
 
 # @lru_cache(maxsize=1) # Cache the user object for the duration of a script run
+@USER_LOOKUP_SECONDS.time()
 def get_current_user() -> Optional[User]:
     """
     Retrieves the current authenticated user.
@@ -70,7 +81,9 @@ def get_current_user() -> Optional[User]:
         st.stop()
 
     if st_user:
+        USER_LOOKUPS.inc(state="authenticated")
         return User.from_st_user(st_user)
+    USER_LOOKUPS.inc(state="anonymous")
     return None
 
 def render_auth_sidebar() -> None:
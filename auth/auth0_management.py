@@ -0,0 +1,293 @@
+"""
+Auth0 Management API helpers without Streamlit dependencies.
+
+These functions only make HTTP calls and return data or raise
+`requests.exceptions.RequestException`, so they can run in background jobs
+(see utils/jobs.py) and scripts as well as in pages. Pages are responsible for
+turning errors into `st.error` messages.
+
+User listings are cached process-wide (`get_user_list`): one TTL-bound, immutable
+snapshot per tenant, connection and field set, shared by every session. Concurrent
+callers collapse onto a single in-flight download, and mutations patch or
+invalidate the cached snapshot instead of forcing each admin to re-download it.
+
+Every Management API call goes through `auth0_request`, which records latency,
+status codes and rate-limit (429) responses per endpoint (see monitoring/metrics.py),
+and retries rate-limited calls up to `AUTH0_RATE_LIMIT_RETRIES` times. Set
+`AUTH0_BASE_URL` to send the calls to another host, e.g. a local stub.
+"""
+
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from monitoring.metrics import counter, histogram
+
+USER_LIST_FIELDS = "email,user_id,name,last_login,logins_count,email_verified,app_metadata,identities"
+# Auth0 caps per_page at 100, and search results at 1000 users (page * per_page)
+MAX_PER_PAGE = 100
+MAX_SEARCH_RESULTS = 1000
+REQUEST_TIMEOUT = 30
+MAX_RETRY_WAIT_SECONDS = 10
+
+# Metrics (see monitoring/metrics.py)
+AUTH0_REQUEST_SECONDS = histogram("auth0_request_seconds", "Auth0 API call latency", ["endpoint", "method"])
+AUTH0_REQUESTS = counter("auth0_requests_total", "Auth0 API calls by response status", ["endpoint", "method", "status"])
+AUTH0_RATE_LIMITED = counter("auth0_rate_limited_total", "Auth0 API calls rejected with 429", ["endpoint"])
+
+# Collapse ids in paths so endpoint labels stay low-cardinality
+_ID_SEGMENT = re.compile(r"(/api/v2/(?:users|tickets|jobs|roles))/[^/]+")
+
+
+def auth0_request(method: str, path: str, domain: str, **kwargs) -> requests.Response:
+    """Make an instrumented request to the Auth0 tenant (`path` starts with a slash).
+
+    Keyword arguments are passed to `requests.request`; the timeout defaults to
+    REQUEST_TIMEOUT. The response is returned as-is, without `raise_for_status()`;
+    a 429 is only returned once the retries are used up.
+    """
+    base_url = os.getenv("AUTH0_BASE_URL") or f"https://{domain}"
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    endpoint = _ID_SEGMENT.sub(r"\1/{id}", path)
+    method = method.upper()
+    retries = int(os.getenv("AUTH0_RATE_LIMIT_RETRIES", "3"))
+
+    for attempt in range(retries + 1):
+        status = "error"
+        try:
+            with AUTH0_REQUEST_SECONDS.time(endpoint=endpoint, method=method):
+                response = requests.request(method, f"{base_url.rstrip('/')}{path}", **kwargs)
+            status = str(response.status_code)
+        finally:
+            AUTH0_REQUESTS.inc(endpoint=endpoint, method=method, status=status)
+        if response.status_code != 429:
+            return response
+        AUTH0_RATE_LIMITED.inc(endpoint=endpoint)
+        if attempt < retries:
+            time.sleep(_retry_delay(response, attempt))
+    return response
+
+
+def _retry_delay(response: requests.Response, attempt: int) -> float:
+    """Seconds to wait before retrying a 429, from Auth0's rate-limit headers or backoff."""
+    if reset := response.headers.get("x-ratelimit-reset"):  # Epoch seconds
+        try:
+            return min(max(float(reset) - time.time(), 0.1), MAX_RETRY_WAIT_SECONDS)
+        except ValueError:
+            pass
+    if retry_after := response.headers.get("Retry-After"):
+        try:
+            return min(float(retry_after), MAX_RETRY_WAIT_SECONDS)
+        except ValueError:
+            pass
+    return min(0.5 * 2 ** attempt + random.random() * 0.1, MAX_RETRY_WAIT_SECONDS)
+
+
+def get_management_token(domain: str, client_id: str, client_secret: str) -> str:
+    """Fetch a Management API access token with the client credentials grant."""
+    response = auth0_request(
+        "POST", "/oauth/token", domain,
+        json={
+            "grant_type": "client_credentials",
+            "client_id": client_id,
+            "client_secret": client_secret,
+            "audience": f'https://{domain}/api/v2/'
+        },
+        headers={"content-type": "application/json"}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def list_users(domain: str, access_token: str, connection: str, fields: str = USER_LIST_FIELDS,
+               per_page: int = MAX_PER_PAGE,
+               progress: Optional[Callable[[int, int], None]] = None) -> Tuple[List[Dict], int]:
+    """List all users of a database connection, following pagination.
+
+    Args:
+        domain: Auth0 tenant domain.
+        access_token: Management API (M2M) token with `read:users`.
+        connection: Database connection name to filter by.
+        fields: Comma-separated user fields to return.
+        per_page: Page size (at most 100).
+        progress: Optional callback(fetched, total) called after each page.
+
+    Returns:
+        (users, total) where total is the count reported by Auth0. Only the first
+        1000 users are reachable through search; use the users export job beyond that.
+    """
+    query = f'identities.connection:{search_phrase(connection)}'
+    return search_users(domain, access_token, query, fields, per_page, progress)
+
+
+def search_phrase(value: str) -> str:
+    """Quote a value as an exact phrase for a user search query (`\\` and `"` escaped)."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def search_users(domain: str, access_token: str, query: str, fields: str = USER_LIST_FIELDS,
+                 per_page: int = MAX_PER_PAGE,
+                 progress: Optional[Callable[[int, int], None]] = None) -> Tuple[List[Dict], int]:
+    """Return all users matching a user search (v3 Lucene syntax) query, following pagination.
+
+    For example `identities.connection:"db" AND app_metadata.roles:"admin"`. Arguments
+    and return value are as for `list_users`.
+    """
+    per_page = min(per_page, MAX_PER_PAGE)
+    users: List[Dict] = []
+    total = 0
+    page = 0
+    while True:
+        response = auth0_request(
+            "GET", "/api/v2/users", domain,
+            headers={"Authorization": f"Bearer {access_token}"},
+            params={
+                "per_page": per_page,
+                "page": page,
+                "include_totals": "true",
+                "fields": fields,
+                "include_fields": "true",
+                "search_engine": "v3",
+                "q": query
+            },
+        )
+        response.raise_for_status()
+        data = response.json()
+
+        # Extract users from response (a plain list when totals aren't included)
+        batch = data if isinstance(data, list) else data.get('users', [])
+        users.extend(batch)
+        total = max(data.get('total', 0) if isinstance(data, dict) else 0, len(users))
+        page += 1
+
+        if progress:
+            progress(len(users), total)
+        if len(batch) < per_page or len(users) >= MAX_SEARCH_RESULTS or (isinstance(data, dict) and len(users) >= total):
+            return users, total
+
+
+# ==============================================================================
+# Shared user list cache
+# ==============================================================================
+
+@dataclass(frozen=True)
+class UserListSnapshot:
+    """A cached user listing. Shared by all sessions: treat `users` as read-only."""
+    users: Tuple[Dict, ...]
+    total: int
+    fetched_at: float
+    ttl: float
+
+    @property
+    def expired(self) -> bool:
+        return time.time() - self.fetched_at >= self.ttl
+
+
+class _Flight:
+    """An in-flight fetch that concurrent callers wait on instead of fetching again."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[UserListSnapshot] = None
+        self.error: Optional[BaseException] = None
+
+
+_cache_lock = threading.Lock()
+_user_lists: Dict[tuple, UserListSnapshot] = {}
+_in_flight: Dict[tuple, _Flight] = {}
+_generations: Dict[tuple, int] = {}  # Bumped by patches/invalidation; stale fetches aren't stored
+
+
+def get_user_list(domain: str, access_token: str, connection: str, fields: str = USER_LIST_FIELDS,
+                  force: bool = False,
+                  progress: Optional[Callable[[int, int], None]] = None) -> UserListSnapshot:
+    """Return the cached user list, fetching it if missing, expired or `force`d.
+
+    Concurrent callers for the same key wait for one fetch (single-flight), even when
+    forcing, so simultaneous "Refresh" clicks download the tenant once.
+    """
+    key = (domain, connection, fields)
+    with _cache_lock:
+        snapshot = _user_lists.get(key)
+        if snapshot is not None and not snapshot.expired and not force:
+            return snapshot
+        flight = _in_flight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _in_flight[key] = _Flight()
+            generation = _generations.get(key, 0)
+
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        users, total = list_users(domain, access_token, connection, fields, progress=progress)
+        snapshot = UserListSnapshot(tuple(users), total, time.time(),
+                                    float(os.getenv("AUTH0_USER_LIST_CACHE_TTL", "300")))
+        with _cache_lock:
+            # A patch or invalidation during the download may not be reflected in it
+            if _generations.get(key, 0) == generation:
+                _user_lists[key] = snapshot
+        flight.result = snapshot
+        return snapshot
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _cache_lock:
+            _in_flight.pop(key, None)
+        flight.done.set()
+
+
+def get_cached_user_list(domain: str, connection: str, fields: str = USER_LIST_FIELDS) -> Optional[UserListSnapshot]:
+    """Return the cached snapshot without fetching (it may be expired), or None."""
+    with _cache_lock:
+        return _user_lists.get((domain, connection, fields))
+
+
+def patch_cached_user(domain: str, user_id: str, changes: Dict) -> None:
+    """Apply a successful update to every cached listing of the tenant (copy-on-write).
+
+    Top-level dict fields such as `app_metadata` are merged, like Auth0's PATCH does.
+    """
+    with _cache_lock:
+        for key in _keys_for(domain):
+            if snapshot := _user_lists.get(key):
+                users = tuple(
+                    _merge_user(user, changes) if user.get("user_id") == user_id else user
+                    for user in snapshot.users
+                )
+                _user_lists[key] = UserListSnapshot(users, snapshot.total, snapshot.fetched_at, snapshot.ttl)
+            _generations[key] = _generations.get(key, 0) + 1
+
+
+def invalidate_user_lists(domain: Optional[str] = None) -> None:
+    """Drop cached listings (of one tenant, or all) so the next read fetches them again."""
+    with _cache_lock:
+        for key in _keys_for(domain):
+            _user_lists.pop(key, None)
+            _generations[key] = _generations.get(key, 0) + 1
+
+
+def _keys_for(domain: Optional[str]) -> List[tuple]:
+    """Cached and in-flight keys of a tenant (caller holds the lock)."""
+    return [key for key in {*_user_lists, *_in_flight} if domain is None or key[0] == domain]
+
+
+def _merge_user(user: Dict, changes: Dict) -> Dict:
+    merged = dict(user)
+    for field, value in changes.items():
+        if isinstance(value, dict) and isinstance(merged.get(field), dict):
+            merged[field] = {**merged[field], **value}
+        else:
+            merged[field] = value
+    return merged
@@ -0,0 +1,199 @@
+"""
+Pre-fetched OIDC discovery metadata and JWKS for the login flow.
+
+Streamlit creates a new OAuth client for every `/auth/login` and `/oauth2callback`
+request, and each client downloads the provider's discovery document (the callback
+also its JWKS) before it can redirect or verify the ID token. That puts one or two
+round trips to the identity provider on every login, and a slow metadata endpoint
+stalls every login with it.
+
+`python scripts/generate_secrets.py --prefetch-oidc` downloads both at deploy time
+into a cache file (`OIDC_METADATA_CACHE`, default `.streamlit/oidc_metadata.json`),
+and `install_oidc_metadata_cache()` (called from app.py) seeds every OAuth client
+from it:
+
+- Entries are used for `OIDC_METADATA_MAX_AGE_SECONDS` (default one day) after
+  they were fetched. Older or missing entries are fetched live, as without the
+  cache, and the result is kept in memory and written back to the file. If the live
+  fetch fails, a stale entry is used rather than failing the login.
+- An ID token signed with a key ID missing from the cached JWKS makes Authlib fetch
+  the JWKS again from `jwks_uri` (key rotation); the new set replaces the cached one.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import requests
+
+from monitoring.metrics import counter
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+CACHE_VERSION = 1
+FETCH_TIMEOUT = 10
+
+# Metrics (see monitoring/metrics.py)
+OIDC_METADATA_LOADS = counter("oidc_metadata_loads_total", "OIDC discovery metadata loads by source", ["source"])
+OIDC_JWKS_REFRESHES = counter("oidc_jwks_refreshes_total", "JWKS fetched live (missing, expired or unknown key ID)")
+
+_lock = threading.Lock()
+_entries: Optional[Dict[str, Dict]] = None  # server_metadata_url -> {"fetched_at", "metadata", "jwks"}
+_installed = False
+
+
+def get_cache_path() -> Path:
+    return Path(os.getenv("OIDC_METADATA_CACHE", PROJECT_ROOT / ".streamlit" / "oidc_metadata.json"))
+
+
+def fetch_oidc_metadata(server_metadata_url: str, timeout: float = FETCH_TIMEOUT) -> Dict:
+    """Download a provider's discovery document and JWKS as a cache entry."""
+    response = requests.get(server_metadata_url, timeout=timeout)
+    response.raise_for_status()
+    metadata = response.json()
+
+    jwks = None
+    if jwks_uri := metadata.get("jwks_uri"):
+        response = requests.get(jwks_uri, timeout=timeout)
+        response.raise_for_status()
+        jwks = response.json()
+    return {"fetched_at": time.time(), "metadata": metadata, "jwks": jwks}
+
+
+def prefetch_oidc_metadata(server_metadata_urls: Iterable[str], path: Optional[os.PathLike] = None) -> Dict[str, Dict]:
+    """Fetch the metadata of each provider and write them to the cache file.
+
+    Raises `requests.exceptions.RequestException` if a provider can't be reached, so a
+    deploy fails loudly instead of silently starting without the cache.
+    """
+    global _entries
+    path = Path(path) if path else get_cache_path()
+    entries = _read_cache(path)
+    for url in server_metadata_urls:
+        entries[url] = fetch_oidc_metadata(url)
+    _write_cache(path, entries)
+    with _lock:
+        _entries = dict(entries)
+    return entries
+
+
+def get_cached_entry(server_metadata_url: str, max_age: Optional[float] = None) -> Optional[Dict]:
+    """Return the cache entry of a provider if it's younger than `max_age` seconds, else None."""
+    entry = _get_entries().get(server_metadata_url)
+    if not entry or not entry.get("metadata"):
+        return None
+    if max_age is None:
+        max_age = float(os.getenv("OIDC_METADATA_MAX_AGE_SECONDS", "86400"))
+    return entry if time.time() - entry["fetched_at"] < max_age else None
+
+
+def store_entry(server_metadata_url: str, metadata: Optional[Dict] = None, jwks: Optional[Dict] = None) -> None:
+    """Update a provider's cache entry (in memory and in the file) with live-fetched data."""
+    global _entries
+    with _lock:
+        entries = dict(_get_entries())
+        entry = dict(entries.get(server_metadata_url) or {"metadata": {}, "jwks": None})
+        if metadata is not None:
+            entry["metadata"] = metadata
+            entry["fetched_at"] = time.time()
+        if jwks is not None:
+            entry["jwks"] = jwks
+        entry.setdefault("fetched_at", time.time())
+        entries[server_metadata_url] = entry
+        _entries = entries
+    _write_cache(get_cache_path(), entries)
+
+
+def install_oidc_metadata_cache() -> bool:
+    """Make Streamlit's OAuth clients load provider metadata through the cache (once per process).
+
+    Returns False when Streamlit's authentication dependencies (Authlib) aren't installed.
+    """
+    global _installed
+    if _installed:
+        return True
+    try:
+        from streamlit.web.server.oidc_mixin import TornadoOAuth2App
+    except ImportError:
+        return False
+
+    with _lock:
+        if _installed:
+            return True
+        load_server_metadata = TornadoOAuth2App.load_server_metadata
+        fetch_jwk_set = TornadoOAuth2App.fetch_jwk_set
+
+        def cached_load_server_metadata(self):
+            url = self._server_metadata_url
+            if not url or "_loaded_at" in self.server_metadata:
+                return load_server_metadata(self)
+
+            if entry := get_cached_entry(url):
+                _seed(self, entry)
+                OIDC_METADATA_LOADS.inc(source="cache")
+                return load_server_metadata(self)
+
+            try:
+                result = load_server_metadata(self)
+            except Exception as e:
+                if (stale := get_cached_entry(url, max_age=float("inf"))) is None:
+                    raise
+                print(f"Could not refresh OIDC metadata from {url}, using the cached copy: {e}")
+                _seed(self, stale)
+                OIDC_METADATA_LOADS.inc(source="stale")
+                return load_server_metadata(self)
+            OIDC_METADATA_LOADS.inc(source="live")
+            store_entry(url, metadata={key: value for key, value in result.items()
+                                       if not key.startswith("_") and key != "jwks"})
+            return result
+
+        def cached_fetch_jwk_set(self, force=False):
+            had_jwks = bool(self.load_server_metadata().get("jwks"))
+            jwks = fetch_jwk_set(self, force)
+            if (force or not had_jwks) and self._server_metadata_url:
+                OIDC_JWKS_REFRESHES.inc()
+                store_entry(self._server_metadata_url, jwks=jwks)
+            return jwks
+
+        TornadoOAuth2App.load_server_metadata = cached_load_server_metadata
+        TornadoOAuth2App.fetch_jwk_set = cached_fetch_jwk_set
+        _installed = True
+    return True
+
+
+def _seed(client, entry: Dict) -> None:
+    """Fill a client's metadata from a cache entry so Authlib skips the download."""
+    client.server_metadata.update(entry["metadata"])
+    if entry.get("jwks"):
+        client.server_metadata["jwks"] = entry["jwks"]
+    client.server_metadata["_loaded_at"] = entry["fetched_at"]
+
+
+def _get_entries() -> Dict[str, Dict]:
+    global _entries
+    if _entries is None:
+        _entries = _read_cache(get_cache_path())
+    return _entries
+
+
+def _read_cache(path: Path) -> Dict[str, Dict]:
+    try:
+        cache = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache.get("providers", {})
+
+
+def _write_cache(path: Path, entries: Dict[str, Dict]) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temp_path.write_text(json.dumps({"version": CACHE_VERSION, "providers": entries}, indent=2), encoding="utf-8")
+        os.replace(temp_path, path)  # Atomic, so other workers never read a partial file
+    except OSError as e:
+        # Read-only deployments still work; they just fetch expired metadata live
+        print(f"Could not write OIDC metadata cache {path}: {e}")
@@ -4,19 +4,32 @@ Role-Based Access Control (RBAC) for Streamlit pages.
 This module provides functionality to control page access based on user roles.
 Page access configuration is stored in the database and can be managed through
 the Auth Admin interface.
+
+Page rules may also limit how many reruns of a page run at once (`max_concurrent`,
+`queue_timeout`), with the config's `role_priorities` ordering the queue; see
+utils/admission.py.
 """
 
 import streamlit as st
 from typing import List, Dict, Optional
-import json
 from json import JSONDecodeError
 import os
-from db.models import Session as SessionFactory, AppSettings
 from auth.auth import get_current_user  # Updated import
 from pages import get_default_page_access_config
 from datetime import datetime
+from monitoring.metrics import counter, histogram
+from utils.cache import get_cache, invalidate_tag
 
 AVAILABLE_ROLES = ["admin", "users"]
+PAGE_ACCESS_SETTING_KEY = "page_access"
+ADMISSION_KEYS = ("max_concurrent", "queue_timeout")
+RBAC_CACHE = get_cache("rbac")  # Merged page-access config (see utils/cache.py)
+
+# Metrics (see monitoring/metrics.py)
+RBAC_CONFIG_FETCHES = counter("rbac_config_fetches_total", "Page access config loads by source", ["source"])
+RBAC_CONFIG_FETCH_SECONDS = histogram("rbac_config_fetch_seconds", "Page access config load time")
+RBAC_DECISIONS = counter("rbac_decisions_total", "Page access decisions", ["check", "result"])
+RBAC_CHECK_SECONDS = histogram("rbac_check_seconds", "require_page_access latency")
 
 
 def get_user_roles() -> List[str]:
@@ -27,43 +40,83 @@ def get_user_roles() -> List[str]:
     return current_user.roles  # Access roles via the User object's property
 
 
-# @st.cache_data(ttl=60, show_spinner=False)
+def _has_database() -> bool:
+    """Return True if a database is configured (as seen by db.models).
+
+    db.models is imported on first use rather than at module load, and only checks
+    its URL: the engine, driver and pool are created when a query needs them.
+    """
+    from db.models import has_database
+    return has_database()
+
+
+@RBAC_CONFIG_FETCH_SECONDS.time()
 def _fetch_page_access_config() -> Dict:
     """Return page-access configuration from DB or sensible defaults.
 
-    Fetches the page access configuration from the database. Falls back to
-    defaults if no configuration is found or if there's an error.
+    Fetches the page access configuration from the settings store (a read-through
+    cache with TTL and version checks). Raises if it can't be read or decoded.
     """
     # If no database is configured, return defaults
-    if SessionFactory is None:
+    if not _has_database():
+        RBAC_CONFIG_FETCHES.inc(source="default")
         return get_default_page_access_config()
 
-    try:
-        with SessionFactory() as session:
-            setting = (
-                session.query(AppSettings)
-                .filter(AppSettings.key == "page_access")
-                .first()
-            )
+    from db.settings_store import get_setting, invalidate
+
+    # Only called on an RBAC_CACHE miss (TTL expiry or a `page_access` tag bump, possibly by
+    # another process): skip the settings store's own cache, which would still hold the old copy
+    invalidate([PAGE_ACCESS_SETTING_KEY])
+    config = get_setting(PAGE_ACCESS_SETTING_KEY, type_=dict)  # May raise JSONDecodeError
+    if config is None:                            # No record in DB
+        RBAC_CONFIG_FETCHES.inc(source="default")
+        return get_default_page_access_config()
+    RBAC_CONFIG_FETCHES.inc(source="db")
+    return config
 
-            if setting is None:                       # No record in DB
-                return get_default_page_access_config()
 
-            config = json.loads(setting.value)        # May raise JSONDecodeError
-            return config
+def load_page_access_config() -> Dict:
+    """Return the cached page-access configuration dict (shared: don't modify it).
 
+    Pages without a saved rule (e.g. added after the config was last saved) get the
+    default rule declared in their `PAGE_META` (see pages.py), and saved rules without
+    admission limits get the declared ones. The merged config is cached for
+    `RBAC_CONFIG_CACHE_TTL` seconds and dropped when the config is saved. If it can't
+    be read, the defaults are used (and not cached).
+    """
+    try:
+        return RBAC_CACHE.get_or_load(
+            PAGE_ACCESS_SETTING_KEY, _merge_page_access_config,
+            ttl=float(os.getenv("RBAC_CONFIG_CACHE_TTL", "5")), tags=[PAGE_ACCESS_SETTING_KEY],
+        )
     except JSONDecodeError:
         st.error("Error decoding page-access config from DB. Falling back to defaults.")
     except Exception as e:
         st.error(f"Database error fetching page-access config: {e}. Falling back to defaults.")
 
     # Any failure path ends up here
+    RBAC_CONFIG_FETCHES.inc(source="error")
     return get_default_page_access_config()
 
 
-def load_page_access_config() -> Dict:
-    """Return the cached page-access configuration dict."""
-    return _fetch_page_access_config()
+def _merge_page_access_config() -> Dict:
+    config = _fetch_page_access_config()
+    defaults = get_default_page_access_config()
+    saved = config.get("pages", {})
+    filled = {}
+    for path, rule in defaults["pages"].items():
+        if path not in saved:
+            filled[path] = rule
+        elif limits := {key: rule[key] for key in ADMISSION_KEYS if key in rule and key not in saved[path]}:
+            filled[path] = {**saved[path], **limits}
+    if not filled and "role_priorities" in config:
+        return config
+    # Copy: the fetched config may be shared through the settings cache
+    return {
+        "role_priorities": defaults["role_priorities"],
+        **config,
+        "pages": {**saved, **filled},
+    }
 
 
 def save_page_access_config(config: Dict) -> bool:
@@ -76,33 +129,18 @@ def save_page_access_config(config: Dict) -> bool:
         True if saved successfully, False otherwise.
     """
     # If no database is configured, can't save
-    if SessionFactory is None:
+    if not _has_database():
         st.error("Cannot save page access config: No database configured")
         return False
 
     try:
-        with SessionFactory() as session:
-            setting = session.query(AppSettings).filter(
-                AppSettings.key == 'page_access'
-            ).first()
-
-            config_json = json.dumps(config, indent=2)
-
-            if setting:
-                setting.value = config_json
-            else:
-                setting = AppSettings(
-                    key='page_access',
-                    value=config_json,
-                    description='Page access control configuration'
-                )
-                session.add(setting)
-
-            session.commit()
-            # Invalidate the cached copy so next call fetches fresh data
-            # TODO: re-enable once we have fully debugged auth and caching is added back in
-            # _fetch_page_access_config.clear()
-            return True
+        from db.settings_store import set_setting
+
+        # set_setting bumps the version; the tag drops the merged config in this process and,
+        # through the disk tier, in the others (which then re-read it from the database)
+        set_setting(PAGE_ACCESS_SETTING_KEY, config, description='Page access control configuration')
+        invalidate_tag(PAGE_ACCESS_SETTING_KEY)  # Other processes share the tag through the disk tier
+        return True
     except Exception as e:
         st.error(f"Error saving page access config: {str(e)}")
         return False
@@ -174,7 +212,9 @@ def filter_pages_by_access(all_pages: List[Dict], current_user: Optional[object]
     accessible_pages = []
 
     for page_info in all_pages:
-        if can_access_page(page_info["file"], current_user, config):
+        allowed = can_access_page(page_info["file"], current_user, config)
+        RBAC_DECISIONS.inc(check="navigation", result="allow" if allowed else "deny")
+        if allowed:
             accessible_pages.append(page_info)
 
     return accessible_pages
@@ -205,6 +245,7 @@ def create_navigation_pages(all_pages: List[Dict]) -> List:
     return pages
 
 
+@RBAC_CHECK_SECONDS.time()
 def require_page_access(page_path: str) -> None:
     """Check if current user can access the page and if their email is verified, stop execution if not.
 
@@ -214,8 +255,11 @@ def require_page_access(page_path: str) -> None:
         page_path: Path to the current page file.
     """
     current_user = get_current_user()
+    config = load_page_access_config()
 
-    if not can_access_page(page_path, current_user):
+    allowed = can_access_page(page_path, current_user, config)
+    RBAC_DECISIONS.inc(check="page", result="allow" if allowed else "deny")
+    if not allowed:
         user_roles_display = ", ".join(current_user.roles) if current_user and current_user.roles else "None"
         auth_status = "Authenticated" if current_user else "Not Authenticated"
         st.error("🚫 You don't have permission to access this page.")
@@ -224,7 +268,7 @@ def require_page_access(page_path: str) -> None:
 
     # Check email verification for non-public pages after permission check
     # We only do this if the user *could* access the page, but might be blocked by email verification
-    page_config = load_page_access_config()["pages"].get(page_path, {})
+    page_config = config["pages"].get(page_path, {})
     is_public_page = page_config.get("access") == "public"
 
     if current_user and not current_user.email_verified and not is_public_page:
@@ -236,4 +280,25 @@ def require_page_access(page_path: str) -> None:
         # Optionally, show st.user details if needed for debugging
         # if hasattr(st, 'user') and st.user:
         #     st.json(st.user.to_dict())
-        st.stop()
\ No newline at end of file
+        st.stop()
+
+    if page_config.get("max_concurrent"):
+        _admit(page_path, page_config, config, current_user)
+
+
+def _admit(page_path: str, page_config: Dict, config: Dict, current_user: Optional[object]) -> None:
+    """Take a slot of a concurrency-limited page, or show a busy message and stop.
+
+    The slot is released by app.py when the rerun ends (see utils/admission.py).
+    """
+    from utils.admission import acquire, get_priority
+
+    roles = current_user.roles if current_user else []
+    priority = get_priority(roles, config.get("role_priorities", {}))
+    timeout = page_config.get("queue_timeout")
+    if acquire(page_path, int(page_config["max_concurrent"]), priority,
+               float(timeout) if timeout is not None else None):
+        return
+    st.warning("⏳ This page is busy right now. Please retry in a few seconds.")
+    st.button("🔄 Retry", key="admission_retry")
+    st.stop()
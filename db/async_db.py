@@ -0,0 +1,128 @@
+"""
+Asyncio database access alongside the synchronous Session in db.models.
+
+Streamlit already runs its own event loop, so async database work is executed on a
+single process-wide event loop running in a background thread. The async engine is
+bound to that loop and configured from the same `DATABASE_URL` (asyncpg for
+PostgreSQL, aiosqlite for SQLite). Pages call the blocking helpers below from the
+script thread:
+
+    from db.async_db import run_queries
+
+    results = run_queries({
+        "users": lambda session: session.scalar(select(func.count(User.id))),
+        "settings": lambda session: session.scalars(select(AppSettings.key)),
+    })
+
+Each query gets its own AsyncSession (sessions are not safe to share between
+concurrent tasks), so a page's independent queries take as long as the slowest one
+instead of the sum of all of them.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from db.models import DB_URL
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_engine = None
+_async_session_factory = None
+
+
+def run_queries(queries: Dict[str, Callable[[Any], Awaitable]], timeout: Optional[float] = None,
+                return_exceptions: bool = False) -> Dict[str, Any]:
+    """Run independent queries concurrently and return their results by name.
+
+    Args:
+        queries: Mapping of name -> async callable taking an AsyncSession.
+        timeout: Optional overall timeout in seconds.
+        return_exceptions: If True, a failing query's exception is returned as its
+            result instead of being raised.
+
+    Returns:
+        Dict mapping each name to its query's result.
+    """
+    return run_async(_gather(queries, return_exceptions), timeout)
+
+
+def run_async(coroutine: Awaitable, timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the shared database event loop and block until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coroutine, _get_loop()).result(timeout)
+
+
+def get_async_engine():
+    """Return the process-wide async engine, or None if no database is configured."""
+    global _async_engine
+    if _async_engine is None and DB_URL:
+        with _lock:
+            if _async_engine is None:
+                _async_engine = _build_async_engine(get_async_url(DB_URL))
+    return _async_engine
+
+
+def get_async_session_factory():
+    """Return the process-wide `async_sessionmaker`, or None if no database is configured."""
+    global _async_session_factory
+    if _async_session_factory is None and DB_URL:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        engine = get_async_engine()
+        with _lock:
+            if _async_session_factory is None:
+                # Results are often used after the session closes, so don't expire them
+                _async_session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    return _async_session_factory
+
+
+def get_async_url(url: str) -> str:
+    """Translate a sync database URL into its asyncio driver equivalent."""
+    scheme, _, rest = url.partition("://")
+    dialect = scheme.split("+")[0]
+    if dialect in ("postgres", "postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+
+async def _gather(queries: Dict[str, Callable[[Any], Awaitable]], return_exceptions: bool) -> Dict[str, Any]:
+    SessionFactory = get_async_session_factory()
+    if SessionFactory is None:
+        raise RuntimeError("Cannot run queries: No database configured")
+
+    async def run_one(query):
+        async with SessionFactory() as session:
+            return await query(session)
+
+    results = await asyncio.gather(*(run_one(query) for query in queries.values()),
+                                   return_exceptions=return_exceptions)
+    return dict(zip(queries.keys(), results))
+
+
+def _build_async_engine(url: str):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from db import sqlite
+    from db.pool import get_pool_settings
+
+    if sqlite.is_sqlite_url(url) and sqlite.is_memory_url(url.replace("+aiosqlite", "")):
+        from sqlalchemy.pool import StaticPool
+        engine = create_async_engine(url, poolclass=StaticPool)
+    else:
+        engine = create_async_engine(url, pool_logging_name="async", **get_pool_settings())
+
+    if sqlite.is_sqlite_url(url):
+        sqlite.register_sqlite_pragmas(engine.sync_engine)
+    return engine
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Return the background event loop, starting its thread on first use."""
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="db-async-loop", daemon=True).start()
+                _loop = loop
+    return _loop
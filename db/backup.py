@@ -0,0 +1,352 @@
+"""
+Logical backup and restore built on the SQLAlchemy metadata in db.models.Base.
+
+Each table is streamed through a server-side cursor in fixed-size chunks and
+written to gzip-compressed NDJSON (or Parquet, if pyarrow is installed), with
+tables exported in parallel. A manifest records row counts and SHA-256 checksums.
+Restore verifies the checksums and bulk-loads every table in batches inside a
+single transaction. Memory use depends on the chunk size, not the table size, and
+the same backup can be restored on SQLite or PostgreSQL.
+
+Tables are read and written with the columns the database actually has, not the
+ones the models declare, so a database that hasn't been migrated yet (e.g. the
+pre-migration backup in db/migrations.py) is backed up as it is.
+
+On PostgreSQL every worker reads the same exported snapshot, so the tables are
+consistent with each other. Other backends export each table on its own
+connection, so tables may reflect slightly different moments if the app is
+writing meanwhile; the manifest's `consistent_snapshot` says which applies.
+
+Usage:
+    python -m db.backup backup [--dir backups] [--format ndjson|parquet] [--workers 4]
+    python -m db.backup restore backups/app_20250704_1200
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import Column, DateTime, Date, MetaData, Table, delete, func, inspect, select, text
+from sqlalchemy.types import JSON
+
+from db.models import Base, get_engine
+from db.types import PortableJSON
+
+MANIFEST_FILE = "manifest.json"
+DEFAULT_CHUNK_SIZE = 1000
+
+# ==============================================================================
+# Backup
+# ==============================================================================
+
+def backup_db(backup_dir="backups", format="ndjson", workers=4, chunk_size=DEFAULT_CHUNK_SIZE) -> str:
+    """Export every table in Base.metadata and return the backup directory path.
+
+    Args:
+        backup_dir: Parent directory; each backup gets a timestamped subdirectory.
+        format: "ndjson" (gzip-compressed, no extra dependencies) or "parquet" (needs pyarrow).
+        workers: Number of tables exported in parallel (each uses its own connection).
+        chunk_size: Rows fetched and written per chunk.
+    """
+    if format not in ("ndjson", "parquet"):
+        raise ValueError(f"Unsupported backup format: {format}")
+
+    engine = _require_engine()
+    backup_path = Path(backup_dir) / f"app_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    backup_path.mkdir(parents=True, exist_ok=False)
+
+    tables = _live_tables(engine)
+    with _exported_snapshot(engine) as snapshot:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            entries = list(executor.map(
+                lambda table: _export_table(engine, table, backup_path, format, chunk_size, snapshot), tables
+            ))
+
+    manifest = {
+        "created_at": datetime.now().isoformat(),
+        "dialect": engine.dialect.name,
+        "format": format,
+        "chunk_size": chunk_size,
+        "consistent_snapshot": snapshot is not None,
+        "tables": {entry["table"]: entry for entry in entries},
+    }
+    (backup_path / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+    return str(backup_path)
+
+
+@contextmanager
+def _exported_snapshot(engine) -> Iterator[Optional[str]]:
+    """On PostgreSQL, hold a REPEATABLE READ transaction open and yield its exported
+    snapshot ID, which the export connections adopt; elsewhere yield None."""
+    if engine.dialect.name != "postgresql":
+        yield None
+        return
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn:
+        with conn.begin():
+            yield conn.execute(text("SELECT pg_export_snapshot()")).scalar()
+
+
+def _export_table(engine, table, backup_path: Path, format: str, chunk_size: int,
+                  snapshot: Optional[str] = None) -> Dict:
+    """Stream one table to a file in chunks and return its manifest entry."""
+    extension = "ndjson.gz" if format == "ndjson" else "parquet"
+    file_path = backup_path / f"{table.name}.{extension}"
+    order_by = list(table.primary_key.columns) or list(table.columns)
+
+    with engine.connect() as conn:
+        if snapshot:
+            conn.execution_options(isolation_level="REPEATABLE READ")
+            # Snapshot IDs are server-generated (e.g. 00000003-0000001B-1); SET can't take parameters
+            conn.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot}'"))
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(
+            select(table).order_by(*order_by)
+        )
+        chunks = (
+            [_encode_row(row._mapping) for row in partition]
+            for partition in result.partitions(chunk_size)
+        )
+        if format == "ndjson":
+            rows = _write_ndjson(file_path, chunks)
+        else:
+            rows = _write_parquet(file_path, table, chunks)
+
+    return {
+        "table": table.name,
+        "file": file_path.name,
+        "rows": rows,
+        "sha256": _sha256(file_path),
+        "columns": [column.name for column in table.columns],
+    }
+
+
+def _write_ndjson(file_path: Path, chunks: Iterator[List[Dict]]) -> int:
+    rows = 0
+    with gzip.open(file_path, "wt", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.writelines(json.dumps(row, separators=(",", ":")) + "\n" for row in chunk)
+            rows += len(chunk)
+    return rows
+
+
+def _write_parquet(file_path: Path, table, chunks: Iterator[List[Dict]]) -> int:
+    pa, pq = _import_pyarrow()
+    # JSON columns are kept as JSON strings and datetimes as ISO strings (see _encode_row),
+    # so the schema follows directly from the column types
+    schema = pa.schema([(column.name, _arrow_type(pa, column.type)) for column in table.columns])
+    rows = 0
+    with pq.ParquetWriter(file_path, schema, compression="zstd") as writer:
+        for chunk in chunks:
+            records = [
+                {name: json.dumps(value) if _is_json(table.c[name].type) else value for name, value in row.items()}
+                for row in chunk
+            ]
+            writer.write_table(pa.Table.from_pylist(records, schema=schema))
+            rows += len(chunk)
+    return rows
+
+
+# ==============================================================================
+# Restore
+# ==============================================================================
+
+def restore_db(backup_path, batch_size=DEFAULT_CHUNK_SIZE) -> Dict[str, int]:
+    """Replace the contents of every backed-up table and return restored row counts.
+
+    ⚠️ WARNING: All existing rows in the backed-up tables are deleted. Everything runs
+    in one transaction, so a failure (including a checksum mismatch) leaves the
+    database untouched.
+    """
+    backup_path = Path(backup_path)
+    manifest = json.loads((backup_path / MANIFEST_FILE).read_text())
+    entries = manifest["tables"]
+
+    for name, entry in entries.items():
+        if _sha256(backup_path / entry["file"]) != entry["sha256"]:
+            raise ValueError(f"Checksum mismatch for table '{name}' ({entry['file']})")
+
+    engine = _require_engine()
+    tables = [table for table in _live_tables(engine) if table.name in entries]
+    restored = {}
+    with engine.begin() as conn:
+        # Children first when deleting, parents first when inserting
+        for table in reversed(tables):
+            conn.execute(delete(table))
+
+        for table in tables:
+            entry = entries[table.name]
+            reader = _read_ndjson if manifest["format"] == "ndjson" else _read_parquet
+            count = 0
+            for batch in reader(backup_path / entry["file"], table, batch_size):
+                conn.execute(table.insert(), batch)
+                count += len(batch)
+            if count != entry["rows"]:
+                raise ValueError(f"Row count mismatch for table '{table.name}': {count} != {entry['rows']}")
+            restored[table.name] = count
+
+        if conn.dialect.name == "postgresql":
+            _reset_sequences(conn, tables)
+
+    return restored
+
+
+def _read_ndjson(file_path: Path, table, batch_size: int) -> Iterator[List[Dict]]:
+    batch = []
+    with gzip.open(file_path, "rt", encoding="utf-8") as f:
+        for line in f:
+            batch.append(_decode_row(table, json.loads(line)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _read_parquet(file_path: Path, table, batch_size: int) -> Iterator[List[Dict]]:
+    _, pq = _import_pyarrow()
+    for record_batch in pq.ParquetFile(file_path).iter_batches(batch_size=batch_size):
+        yield [
+            _decode_row(table, {
+                name: json.loads(value) if name in table.c and _is_json(table.c[name].type) and value is not None else value
+                for name, value in row.items()
+            })
+            for row in record_batch.to_pylist()
+        ]
+
+
+def _reset_sequences(conn, tables) -> None:
+    """Move PostgreSQL serial sequences past the restored ids."""
+    for table in tables:
+        for column in table.primary_key.columns:
+            if column.autoincrement and column.type.python_type is int:
+                conn.execute(select(func.setval(
+                    func.pg_get_serial_sequence(table.name, column.name),
+                    func.coalesce(select(func.max(column)).scalar_subquery(), 1),
+                )))
+
+
+# ==============================================================================
+# Helpers
+# ==============================================================================
+
+def _require_engine():
+    engine = get_engine()
+    if engine is None:
+        raise ValueError("DATABASE_URL environment variable is required")
+    return engine
+
+
+def _live_tables(engine) -> List[Table]:
+    """Return the model tables that exist in the database, in dependency order, each
+    with the columns the database actually has.
+
+    Columns the models also declare keep the model's type (e.g. PortableJSON), so
+    values are encoded the same way whatever the backend; columns only the database
+    has (e.g. dropped from the models but not yet from the schema) use the reflected type.
+    """
+    inspector = inspect(engine)
+    live_tables = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        columns = [_live_column(table, column) for column in inspector.get_columns(table.name)]
+        live_tables.append(Table(table.name, MetaData(), *columns))
+    return live_tables
+
+
+def _live_column(table, reflected: Dict) -> Column:
+    if reflected["name"] not in table.c:
+        return Column(reflected["name"], reflected["type"])
+    column = table.c[reflected["name"]]._copy()
+    if _is_json(column.type) and column.nullable:
+        # Backups can't tell SQL NULL from JSON null; restore both as SQL NULL, not the string 'null'
+        column.type = PortableJSON(none_as_null=True)
+    return column
+
+
+def _encode_row(row) -> Dict:
+    return {
+        name: value.isoformat() if isinstance(value, (datetime, date)) else value
+        for name, value in row.items()
+    }
+
+
+def _decode_row(table, row: Dict) -> Dict:
+    decoded = {}
+    for name, value in row.items():
+        if name not in table.c:
+            continue  # Column dropped since the backup was taken
+        column_type = table.c[name].type
+        if isinstance(value, str) and isinstance(column_type, DateTime):
+            value = datetime.fromisoformat(value)
+        elif isinstance(value, str) and isinstance(column_type, Date):
+            value = date.fromisoformat(value)
+        decoded[name] = value
+    return decoded
+
+
+def _is_json(column_type) -> bool:
+    return isinstance(column_type, (JSON, PortableJSON))
+
+
+def _arrow_type(pa, column_type):
+    if _is_json(column_type):
+        return pa.string()
+    try:
+        python_type = column_type.python_type
+    except NotImplementedError:
+        return pa.string()
+    return {int: pa.int64(), float: pa.float64(), bool: pa.bool_()}.get(python_type, pa.string())
+
+
+def _sha256(file_path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet backups require pyarrow: `uv pip install pyarrow`") from e
+    return pa, pq
+
+
+# CLI interface
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Logical database backup and restore.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backup_parser = subparsers.add_parser("backup", help="Export all tables")
+    backup_parser.add_argument("--dir", default="backups")
+    backup_parser.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson")
+    backup_parser.add_argument("--workers", type=int, default=4)
+    backup_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    restore_parser = subparsers.add_parser("restore", help="Replace table contents from a backup")
+    restore_parser.add_argument("path")
+    restore_parser.add_argument("--batch-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    restore_parser.add_argument("--yes", action="store_true", help="Skip the confirmation prompt")
+
+    args = parser.parse_args()
+    if args.command == "backup":
+        path = backup_db(args.dir, args.format, args.workers, args.chunk_size)
+        print(f"✅ Backup written to {path}")
+    else:
+        confirm = "RESTORE" if args.yes else input(
+            "⚠️ WARNING: This will replace all rows in the backed-up tables. Type 'RESTORE' to confirm: "
+        )
+        if confirm == "RESTORE":
+            counts = restore_db(args.path, args.batch_size)
+            print(f"✅ Restored {sum(counts.values())} rows into {len(counts)} tables")
+        else:
+            print("Operation cancelled")
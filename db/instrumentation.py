@@ -0,0 +1,192 @@
+"""
+Per-rerun SQL query instrumentation.
+
+Cursor execution events on every engine built by db.models time each statement
+and attribute it to the Streamlit rerun that issued it. `app.py` wraps each rerun
+in `track_rerun()`; when it finishes, the rerun's query count, total query time,
+slowest statement and repeated statements are added to a rolling in-memory store
+that the Monitoring page summarizes per page.
+
+A statement executed several times in one rerun is reported as repeated: with the
+same parameters it is a redundant read (e.g. loading `page_access` twice), with
+different parameters it usually means an N+1 loop that could be one query.
+
+Statements run outside a tracked rerun (CLI scripts, background threads, the async
+loop in db.async_db) are not attributed to a page, but every statement is timed in
+the `db_query_seconds` metric (see monitoring/metrics.py).
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from monitoring.metrics import histogram
+
+# Reruns kept in the rolling store (process-wide, shared by all sessions)
+_HISTORY_SIZE = int(os.getenv("QUERY_STATS_HISTORY", "500"))
+# A statement run this many times in one rerun is flagged as repeated
+_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "3"))
+
+_current_rerun: contextvars.ContextVar = contextvars.ContextVar("current_rerun", default=None)
+
+_history_lock = threading.Lock()
+_history: deque = deque(maxlen=_HISTORY_SIZE)
+
+QUERY_SECONDS = histogram("db_query_seconds", "SQL statement execution time", ["pool"])
+
+
+@dataclass
+class RerunQueries:
+    """Queries issued by one rerun of one Streamlit session."""
+    session_id: Optional[str] = None
+    page: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    count: int = 0
+    total_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_statement: Optional[str] = None
+    statements: Counter = field(default_factory=Counter)
+    duplicates: Counter = field(default_factory=Counter)  # Same statement and parameters
+
+    def record(self, statement: str, parameters, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms, self.slowest_statement = elapsed_ms, statement
+        self.statements[statement] += 1
+        self.duplicates[(statement, repr(parameters))] += 1
+
+    def repeated(self) -> Dict[str, int]:
+        """Return statements run at least `QUERY_REPEAT_THRESHOLD` times in this rerun."""
+        return {statement: n for statement, n in self.statements.items() if n >= _REPEAT_THRESHOLD}
+
+    def redundant(self) -> int:
+        """Return how many executions repeated an earlier identical statement and parameters."""
+        return sum(n - 1 for n in self.duplicates.values())
+
+
+def register_query_instrumentation(engine) -> None:
+    """Attach the timing hooks to an engine (called by db.models for every engine it builds)."""
+    from sqlalchemy import event  # Deferred: app.py imports this module on every worker start
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+@contextmanager
+def track_rerun(page: Optional[str] = None):
+    """Attribute queries issued in this block to one rerun, then add it to the store.
+
+    Yields the `RerunQueries` record so the caller can set `page` once it is known
+    (after `st.navigation` has picked the page).
+    """
+    rerun = RerunQueries(session_id=_get_session_id(), page=page)
+    token = _current_rerun.set(rerun)
+    try:
+        yield rerun
+    finally:
+        _current_rerun.reset(token)
+        with _history_lock:
+            _history.append(rerun)
+
+
+def get_current_rerun() -> Optional[RerunQueries]:
+    """Return the rerun being tracked in this context, if any."""
+    return _current_rerun.get()
+
+
+def get_page_summary() -> List[Dict]:
+    """Aggregate the stored reruns per page, worst average query time first."""
+    with _history_lock:
+        reruns = list(_history)
+
+    pages: Dict[str, List[RerunQueries]] = {}
+    for rerun in reruns:
+        pages.setdefault(rerun.page or "(no page)", []).append(rerun)
+
+    summary = []
+    for page, page_reruns in pages.items():
+        slowest = max(page_reruns, key=lambda rerun: rerun.slowest_ms)
+        repeated = Counter()
+        for rerun in page_reruns:
+            repeated.update(rerun.repeated())
+        summary.append({
+            "page": page,
+            "reruns": len(page_reruns),
+            "avg_queries": round(sum(r.count for r in page_reruns) / len(page_reruns), 1),
+            "max_queries": max(r.count for r in page_reruns),
+            "avg_query_ms": round(sum(r.total_ms for r in page_reruns) / len(page_reruns), 2),
+            "max_query_ms": round(max(r.total_ms for r in page_reruns), 2),
+            "redundant_per_rerun": round(sum(r.redundant() for r in page_reruns) / len(page_reruns), 1),
+            "slowest_ms": round(slowest.slowest_ms, 2),
+            "slowest_statement": _shorten(slowest.slowest_statement),
+            "top_repeated": _shorten(repeated.most_common(1)[0][0]) if repeated else None,
+        })
+    return sorted(summary, key=lambda row: row["avg_query_ms"], reverse=True)
+
+
+def get_recent_reruns(limit: int = 50) -> List[Dict]:
+    """Return the most recent reruns, newest first."""
+    with _history_lock:
+        reruns = list(_history)[-limit:]
+    return [
+        {
+            "page": rerun.page,
+            "session_id": rerun.session_id,
+            "started_at": rerun.started_at,
+            "queries": rerun.count,
+            "query_ms": round(rerun.total_ms, 2),
+            "slowest_ms": round(rerun.slowest_ms, 2),
+            "redundant": rerun.redundant(),
+            "repeated": {_shorten(s): n for s, n in rerun.repeated().items()},
+        }
+        for rerun in reversed(reruns)
+    ]
+
+
+def reset_query_stats() -> None:
+    """Clear the rolling store."""
+    with _history_lock:
+        _history.clear()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    elapsed = time.perf_counter() - start_times.pop()
+    QUERY_SECONDS.observe(elapsed, pool=conn.engine.pool.logging_name or "default")
+    if (rerun := _current_rerun.get()) is not None:
+        rerun.record(statement, parameters, elapsed * 1000)
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    start_times = context.connection.info.get("query_start_time") if context.connection else None
+    if start_times:
+        start_times.pop()
+
+
+def _get_session_id() -> Optional[str]:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        return ctx.session_id if ctx else None
+    except Exception:
+        return None
+
+
+def _shorten(statement: Optional[str], length: int = 160) -> Optional[str]:
+    if statement is None:
+        return None
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= length else statement[:length - 1] + "…"
@@ -1,69 +1,461 @@
-# THIS IS INTENDED TO BE A HIGH LEVEL EXAMPLE
-from sqlalchemy import text
-from datetime import datetime
+"""
+Versioned database migrations with chunked online backfills.
+
+Migrations are registered in order with `register_migration(version, description, steps)`.
+Applied versions are recorded in the `schema_version` table, and only one worker can
+migrate at a time (PostgreSQL advisory lock, or a lock row on other backends).
+
+A migration is a list of steps:
+    ddl(fn)       - runs fn(conn) in one short transaction (or autocommit, for e.g.
+                    CREATE INDEX CONCURRENTLY).
+    backfill(...) - updates rows in bounded primary-key ranges, one small transaction per
+                    batch with a lock timeout, optional throttling between batches, and
+                    progress saved in `migration_progress` so an interrupted run resumes
+                    where it stopped. Large tables are never locked for long, so the live
+                    app's `users`/`app_settings` queries keep flowing.
+
+Usage:
+    python -m db.migrations status
+    python -m db.migrations upgrade [--target N] [--batch-size 1000] [--throttle 0.05]
+                                    [--no-backup] [--allow-destructive]
+    python -m db.migrations force-unlock
+"""
+
+import argparse
 import os
-from pathlib import Path
-from .models import engine, Base  # Import from models.py
+import socket
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, Integer, MetaData, String, Table, and_, func, insert, inspect,
+    select, text, update,
+)
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from .models import get_engine, Base, User, create_sqlite_role_index  # Import from models.py
+from .backup import backup_db
 
 DB_URL = os.getenv('DATABASE_URL')
 
+DEFAULT_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+DEFAULT_THROTTLE_SECONDS = float(os.getenv("MIGRATION_THROTTLE_SECONDS", "0.05"))
+# Per-batch lock wait on PostgreSQL; a batch that can't get its locks quickly is retried
+# instead of queueing ahead of (and stalling) the app's own queries
+BATCH_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "2s")
+BATCH_MAX_RETRIES = 5
+ADVISORY_LOCK_KEY = 726_001  # Arbitrary, but must be the same for every worker
+
+# Bookkeeping tables live in their own MetaData so they stay out of Base (and backups)
+migration_metadata = MetaData()
+
+schema_version = Table(
+    "schema_version", migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+migration_progress = Table(
+    "migration_progress", migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("step", Integer, primary_key=True),
+    Column("last_key", Integer, nullable=True, comment="Last primary key processed by a backfill"),
+    Column("rows_done", Integer, nullable=False, default=0),
+    Column("completed", Boolean, nullable=False, default=False),
+    Column("updated_at", DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow),
+)
+
+migration_lock = Table(
+    "migration_lock", migration_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("owner", String(255), nullable=False),
+    Column("acquired_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
 # ==============================================================================
-# Database Utility Functions
+# Registry and step types
 # ==============================================================================
 
-def backup_db(backup_dir="backups"):
-    # For SQLite: direct file copy
-    Path(backup_dir).mkdir(exist_ok=True)
-    backup_path = f"{backup_dir}/app_{datetime.now().strftime('%Y%m%d_%H%M')}.db"
+@dataclass
+class Step:
+    kind: str  # "ddl" or "backfill"
+    apply: Callable
+    description: str = ""
+    transactional: bool = True
+    table: Optional[Table] = None
+    batch_size: Optional[int] = None
 
-    # @Cursor AI: For Railway PostgreSQL, just print the URL to the Postgres service and instruct user to create a manual backup, we also dont need the `backup_dir="backups"`
-    # So for example:
-    # print("\n⚠️Please create a manual backup in your Railway PostgreSQL service:")
-    # print("https://railway.com/project/e6...d706/service/0e...979/backups")
-    # print("1. Go to Railway dashboard > 2. PostgreSQL service > Backups tab > 3. Click 'Create Backup'")
-    return backup_path
 
-def restore_db(backup_path):
-    # For SQLite: overwrite DB file
-    # For Railway PostgreSQL: psql with connection string
-    pass  # Placeholder implementation
+@dataclass
+class Migration:
+    version: int
+    description: str
+    steps: List[Step] = field(default_factory=list)
+    destructive: bool = False
 
-# TODO: maybe some function to close all open connections before a migration? not sure how aggressive to be
+
+MIGRATIONS: Dict[int, Migration] = {}
+
+
+def register_migration(version: int, description: str, steps: List[Step], destructive: bool = False) -> None:
+    """Register a migration. Versions must be unique and are applied in ascending order.
+
+    Mark migrations that drop data or break older app versions as `destructive`; they
+    only run with `--allow-destructive`.
+    """
+    if version in MIGRATIONS:
+        raise ValueError(f"Migration version {version} is already registered")
+    MIGRATIONS[version] = Migration(version, description, steps, destructive)
+
+
+def ddl(fn: Callable, description: str = "", transactional: bool = True) -> Step:
+    """Step that runs fn(conn) once. Use transactional=False for statements that can't
+    run inside a transaction, such as CREATE INDEX CONCURRENTLY."""
+    return Step("ddl", fn, description or fn.__name__, transactional)
+
+
+def backfill(table: Table, apply: Callable, description: str = "", batch_size: Optional[int] = None) -> Step:
+    """Step that calls apply(conn, lo, hi) for successive primary-key ranges lo < pk <= hi.
+
+    The table must have a single integer primary key. Each range is processed in its
+    own transaction together with the progress update, so work is never repeated.
+    """
+    return Step("backfill", apply, description or f"backfill {table.name}", table=table, batch_size=batch_size)
+
+
+def set_values(table: Table, values: Dict, where=None) -> Callable:
+    """Build a backfill `apply` that runs UPDATE table SET values for each key range."""
+    pk = _single_pk(table)
+
+    def apply(conn, lo, hi):
+        condition = and_(pk > lo, pk <= hi, *([where] if where is not None else []))
+        return conn.execute(update(table).where(condition).values(**values)).rowcount
+
+    return apply
 
 # ==============================================================================
 # Migrations
 # ==============================================================================
 
-def migration_add_column():
-    backup_db("migration_backups")
+def _create_base_schema(conn):
+    # Idempotent: only creates tables (and indexes) that don't exist yet
+    Base.metadata.create_all(conn, checkfirst=True)
+
+
+def _app_settings_large_values(conn):
+    """Allow unbounded (optionally compressed) values in app_settings and add versioning.
+
+    Changes `value` from VARCHAR(1000) to TEXT and adds the `encoding` and `version`
+    columns used by db.settings_store. Backwards compatible: existing rows keep their
+    JSON values and default to encoding 'json', version 1.
+    Rollback: restore the backup, or drop the two columns (after shortening any value
+    longer than 1000 characters) and alter `value` back to VARCHAR(1000).
+    """
+    existing = {column["name"] for column in inspect(conn).get_columns("app_settings")}
+    # SQLite doesn't enforce VARCHAR lengths, so only PostgreSQL needs the type change
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("ALTER TABLE app_settings ALTER COLUMN value TYPE TEXT"))
+    if "encoding" not in existing:
+        conn.execute(text("ALTER TABLE app_settings ADD COLUMN encoding VARCHAR(20) NOT NULL DEFAULT 'json'"))
+    if "version" not in existing:
+        conn.execute(text("ALTER TABLE app_settings ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+def _role_index(conn):
+    """Index users.roles for db.models.get_users_with_role / get_users_with_any_role.
+
+    PostgreSQL: GIN index built CONCURRENTLY, so writes to `users` aren't blocked.
+    SQLite: `user_roles` table plus the triggers that keep it in sync (filled by the next step).
+    Rollback: DROP INDEX idx_users_roles_gin, or drop the trg_users_roles_* triggers and user_roles.
+    """
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_roles_gin ON users USING gin (roles)"
+        ))
+    elif conn.dialect.name == "sqlite":
+        create_sqlite_role_index(conn)
+
+
+def _fill_user_roles(conn, lo, hi):
+    if conn.dialect.name != "sqlite":
+        return 0
+    return conn.execute(text(
+        "INSERT OR IGNORE INTO user_roles (user_id, role) "
+        "SELECT users.id, json_each.value FROM users, json_each(users.roles) "
+        "WHERE users.id > :lo AND users.id <= :hi"
+    ), {"lo": lo, "hi": hi}).rowcount
+
+
+register_migration(1, "Create base schema", [ddl(_create_base_schema)])
+register_migration(2, "Unbounded, versioned app_settings values", [ddl(_app_settings_large_values)])
+register_migration(3, "Indexed role lookups on users", [
+    ddl(_role_index, transactional=False),
+    backfill(User.__table__, _fill_user_roles, "fill user_roles"),
+])
+
+# NOTE: The migrations below are HIGH LEVEL EXAMPLES (main_table/legacy_table don't exist).
+# Adding a column and filling it in bounded batches, without one long-running UPDATE:
+#
+#   def _add_new_field(conn):
+#       conn.execute(text("ALTER TABLE main_table ADD COLUMN IF NOT EXISTS new_field TEXT"))
+#
+#   main_table = Table("main_table", MetaData(), autoload_with=get_engine())
+#   register_migration(10, "Add main_table.new_field", [
+#       ddl(_add_new_field),
+#       backfill(main_table, set_values(main_table, {"new_field": "default"},
+#                                       where=main_table.c.new_field.is_(None))),
+#   ])
+#
+# ⚠️ BREAKING CHANGE example: dropping a table permanently deletes its data. Deploy app code
+# that no longer reads the table first, take a backup, then run with --allow-destructive.
+#
+#   register_migration(11, "Drop legacy_table", [
+#       ddl(lambda conn: conn.execute(text("DROP TABLE IF EXISTS legacy_table")), "drop legacy_table"),
+#   ], destructive=True)
+
+# ==============================================================================
+# Runner
+# ==============================================================================
+
+def upgrade(target: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+            throttle: float = DEFAULT_THROTTLE_SECONDS, backup: bool = True,
+            allow_destructive: bool = False) -> List[int]:
+    """Apply pending migrations up to `target` (default: latest) and return the versions applied."""
+    engine = _require_engine()
+    migration_metadata.create_all(engine, checkfirst=True)
+
+    with _migration_lock(engine):
+        applied = get_applied_versions(engine)
+        pending = [
+            MIGRATIONS[version] for version in sorted(MIGRATIONS)
+            if version not in applied and (target is None or version <= target)
+        ]
+        if not pending:
+            print("✅ Database is up to date")
+            return []
+
+        blocked = [m.version for m in pending if m.destructive and not allow_destructive]
+        if blocked:
+            raise RuntimeError(f"⚠️ Destructive migrations {blocked} require --allow-destructive")
+
+        if backup:
+            # Exports the schema as it is now, before the pending migrations (see db/backup.py)
+            print(f"💾 Backup written to {backup_db('migration_backups')}")
+
+        for migration in pending:
+            print(f"⏫ {migration.version}: {migration.description}")
+            for index, step in enumerate(migration.steps):
+                _run_step(engine, migration, index, step, batch_size, throttle)
+            with engine.begin() as conn:
+                conn.execute(insert(schema_version).values(
+                    version=migration.version, description=migration.description, applied_at=datetime.utcnow()
+                ))
+        return [migration.version for migration in pending]
+
+
+def get_applied_versions(engine=None) -> set:
+    """Return the set of migration versions recorded in `schema_version`."""
+    engine = engine or _require_engine()
+    if not inspect(engine).has_table("schema_version"):
+        return set()
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def print_status() -> None:
+    """Print each registered migration with whether it has been applied."""
+    applied = get_applied_versions()
+    for version in sorted(MIGRATIONS):
+        migration = MIGRATIONS[version]
+        marker = "✅" if version in applied else "⏳"
+        warning = " ⚠️ destructive" if migration.destructive else ""
+        print(f"{marker} {version}: {migration.description}{warning}")
+
+
+def _run_step(engine, migration: Migration, index: int, step: Step, batch_size: int, throttle: float) -> None:
+    progress = _get_progress(engine, migration.version, index)
+    if progress and progress["completed"]:
+        print(f"   ↪ step {index + 1} already done: {step.description}")
+        return
+
+    if step.kind == "ddl":
+        if step.transactional:
+            with engine.begin() as conn:
+                step.apply(conn)
+                _save_progress(conn, migration.version, index, None, 0, completed=True)
+        else:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                step.apply(conn)
+            with engine.begin() as conn:
+                _save_progress(conn, migration.version, index, None, 0, completed=True)
+        print(f"   ✔ step {index + 1}: {step.description}")
+        return
+
+    _run_backfill(engine, migration, index, step, progress, step.batch_size or batch_size, throttle)
+
+
+def _run_backfill(engine, migration: Migration, index: int, step: Step, progress: Optional[Dict],
+                  batch_size: int, throttle: float) -> None:
+    """Process a backfill step range by range, resuming from saved progress."""
+    pk = _single_pk(step.table)
     with engine.connect() as conn:
-        conn.execute(text("ALTER TABLE main_table ADD COLUMN IF NOT EXISTS new_field TEXT"))
-        conn.commit()
+        min_key, max_key = conn.execute(select(func.min(pk), func.max(pk))).one()
+
+    if max_key is None:  # Empty table
+        with engine.begin() as conn:
+            _save_progress(conn, migration.version, index, None, 0, completed=True)
+        return
+
+    lo = progress["last_key"] if progress and progress["last_key"] is not None else min_key - 1
+    rows_done = progress["rows_done"] if progress else 0
+    if lo >= min_key:
+        print(f"   ↪ resuming {step.description} after key {lo}")
+
+    while lo < max_key:
+        hi = min(lo + batch_size, max_key)
+        rows = _run_batch(engine, migration.version, index, step, lo, hi, rows_done)
+        rows_done += rows
+        lo = hi
+        percent = 100 * (lo - min_key + 1) / (max_key - min_key + 1)
+        print(f"   … {step.description}: {rows_done} rows, {percent:.0f}%", end="\r")
+        if throttle:
+            time.sleep(throttle)
 
-def migration_drop_legacy():
-    # ⚠️ WARNING: This will permanently delete legacy tables
-    backup_db("migration_backups")
+    with engine.begin() as conn:
+        _save_progress(conn, migration.version, index, lo, rows_done, completed=True)
+    print(f"   ✔ step {index + 1}: {step.description} ({rows_done} rows)")
+
+
+def _run_batch(engine, version: int, index: int, step: Step, lo: int, hi: int, rows_done: int) -> int:
+    """Apply one key range and record progress atomically, retrying on lock timeouts."""
+    for attempt in range(BATCH_MAX_RETRIES):
+        try:
+            with engine.begin() as conn:
+                if conn.dialect.name == "postgresql":
+                    conn.execute(text(f"SET LOCAL lock_timeout = '{BATCH_LOCK_TIMEOUT}'"))
+                rows = step.apply(conn, lo, hi) or 0
+                _save_progress(conn, version, index, hi, rows_done + rows, completed=False)
+                return rows
+        except OperationalError:
+            if attempt == BATCH_MAX_RETRIES - 1:
+                raise
+            time.sleep(0.5 * 2 ** attempt)  # Back off and let app queries through
+    return 0
+
+
+def _get_progress(engine, version: int, index: int) -> Optional[Dict]:
     with engine.connect() as conn:
-        conn.execute(text("DROP TABLE IF EXISTS legacy_table"))
-        conn.commit()
+        row = conn.execute(
+            select(migration_progress).where(
+                migration_progress.c.version == version, migration_progress.c.step == index
+            )
+        ).mappings().first()
+    return dict(row) if row else None
+
+
+def _save_progress(conn, version: int, index: int, last_key, rows_done: int, completed: bool) -> None:
+    values = {"last_key": last_key, "rows_done": rows_done, "completed": completed, "updated_at": datetime.utcnow()}
+    updated = conn.execute(
+        update(migration_progress)
+        .where(migration_progress.c.version == version, migration_progress.c.step == index)
+        .values(**values)
+    ).rowcount
+    if not updated:
+        conn.execute(insert(migration_progress).values(version=version, step=index, **values))
+
+# ==============================================================================
+# Locking
+# ==============================================================================
+
+@contextmanager
+def _migration_lock(engine):
+    """Hold the migration lock for the duration of a `with` block.
+
+    PostgreSQL uses a session-level advisory lock, released automatically if the
+    process dies. Other backends insert a lock row, which `force-unlock` can clear
+    after a crash.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            if not conn.execute(select(func.pg_try_advisory_lock(ADVISORY_LOCK_KEY))).scalar():
+                raise RuntimeError("Another worker is running migrations")
+            try:
+                yield
+            finally:
+                conn.execute(select(func.pg_advisory_unlock(ADVISORY_LOCK_KEY)))
+                conn.commit()
+        return
+
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(migration_lock).values(
+                id=1, owner=f"{socket.gethostname()}:{os.getpid()}", acquired_at=datetime.utcnow()
+            ))
+    except IntegrityError:
+        with engine.connect() as conn:
+            holder = conn.execute(select(migration_lock)).mappings().first()
+        raise RuntimeError(
+            f"Another worker is running migrations ({holder['owner']} since {holder['acquired_at']}). "
+            "If it crashed, run `python -m db.migrations force-unlock`."
+        )
+    try:
+        yield
+    finally:
+        release_lock(engine)
+
+
+def release_lock(engine=None) -> None:
+    """Clear a stale lock row left behind by a crashed migration (non-PostgreSQL backends)."""
+    engine = engine or _require_engine()
+    with engine.begin() as conn:
+        conn.execute(migration_lock.delete())
+
+# ==============================================================================
+# Helpers
+# ==============================================================================
+
+def _require_engine():
+    engine = get_engine()
+    if engine is None:
+        raise ValueError("DATABASE_URL environment variable is required")
+    return engine
+
+
+def _single_pk(table: Table):
+    columns = list(table.primary_key.columns)
+    if len(columns) != 1:
+        raise ValueError(f"Backfills need a single-column primary key ({table.name} has {len(columns)})")
+    return columns[0]
+
+# TODO: maybe some function to close all open connections before a migration? not sure how aggressive to be
 
 # CLI interface
 if __name__ == "__main__":
     if not DB_URL:
         raise ValueError("DATABASE_URL environment variable is required")
-    print("Available migrations:\n1. Add new_field column\n2. Drop legacy tables")
-    choice = input("Select migration (1-2): ")
-    if choice == "1":
-        confirm = input("Add new_field column to main_table? (y/n): ")
-        if confirm.lower() == "y":
-            migration_add_column()
-            print("Added new column")
-        else:
-            print("Operation cancelled")
-    elif choice == "2":
-        confirm = input("⚠️ WARNING: This will delete tables. Type 'DROP' to confirm: ")
-        if confirm == "DROP":
-            migration_drop_legacy()
-            print("Dropped legacy tables")
-        else:
-            print("Operation cancelled")
\ No newline at end of file
+
+    parser = argparse.ArgumentParser(description="Run versioned database migrations.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="List migrations and whether they are applied")
+    upgrade_parser = subparsers.add_parser("upgrade", help="Apply pending migrations")
+    upgrade_parser.add_argument("--target", type=int, help="Stop after this version")
+    upgrade_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Primary-key range per backfill batch")
+    upgrade_parser.add_argument("--throttle", type=float, default=DEFAULT_THROTTLE_SECONDS, help="Seconds to sleep between batches")
+    upgrade_parser.add_argument("--no-backup", action="store_true", help="Skip the pre-migration backup")
+    upgrade_parser.add_argument("--allow-destructive", action="store_true", help="⚠️ Allow migrations that drop data")
+    subparsers.add_parser("force-unlock", help="Clear a stale migration lock after a crash")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print_status()
+    elif args.command == "upgrade":
+        applied = upgrade(args.target, args.batch_size, args.throttle, not args.no_backup, args.allow_destructive)
+        if applied:
+            print(f"✅ Applied migrations: {', '.join(map(str, applied))}")
+    elif args.command == "force-unlock":
+        release_lock()
+        print("🔓 Migration lock cleared")
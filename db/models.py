@@ -1,24 +1,111 @@
 # Database models and schema definitions
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Index
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, MetaData, Table, DDL, event, select, type_coerce
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 import os
+import threading
 
-from dotenv import load_dotenv
-load_dotenv(override=True)
+from db.types import PortableJSON
+
+from utils.env import load_env
+load_env()
 
 DB_URL = os.getenv('DATABASE_URL')
 
-# Only create engine and Session if database URL is provided
-# This is purely to allow for local dev until we have a database in place
-if DB_URL:
-    engine = create_engine(DB_URL)
-    Session = sessionmaker(bind=engine)
-else:
-    # engine = None
-    Session = None
+# The engine and Session factory are created lazily on first use so that importing
+# this module (e.g. for the models alone) doesn't pay for the DB driver and pool.
+_engine = None
+_session_factory = None
+_engine_lock = threading.Lock()
+
+
+def has_database() -> bool:
+    """Return True if a database is configured, without creating the engine."""
+    return bool(DB_URL)
+
+
+def get_engine():
+    """Return the process-wide engine, creating it on first use.
+
+    Returns None when no `DATABASE_URL` is configured. This is purely to allow for
+    local dev until we have a database in place.
+    """
+    global _engine
+    if _engine is None and DB_URL:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _build_engine(DB_URL)
+    return _engine
+
+
+def get_session_factory():
+    """Return the process-wide Session factory, or None if no database is configured.
+
+    Use this instead of comparing `Session` to None. Sessions are short-lived and
+    must be opened per unit of work (`with get_session_factory()() as session:`).
+    """
+    global _session_factory
+    if _session_factory is None and DB_URL:
+        from sqlalchemy.orm import sessionmaker
+        from db.routing import RoutingSession, get_replica_urls
+        engine = get_engine()
+        with _engine_lock:
+            if _session_factory is None:
+                if get_replica_urls():
+                    # Reads go to replicas, writes to the primary (see db/routing.py)
+                    _session_factory = sessionmaker(class_=RoutingSession)
+                else:
+                    _session_factory = sessionmaker(bind=engine)
+    return _session_factory
+
+
+def write_session():
+    """Open a session pinned to the primary database, for read-modify-write work.
+
+    Identical to `get_session_factory()()` when no read replicas are configured.
+    """
+    from db.routing import USE_PRIMARY
+    return get_session_factory()(info={USE_PRIMARY: True})
+
+
+def _build_engine(url: str, name: str = "primary"):
+    """Create an engine whose pool is sized from the environment and instrumented.
+
+    The engine (and the Session factory bound to it) is a process-wide singleton, so
+    every Streamlit session in the process shares the same pool.
+    """
+    from sqlalchemy import create_engine
+    from db.pool import InstrumentedQueuePool, get_pool_settings
+    from db.instrumentation import register_query_instrumentation
+    from db import sqlite
+
+    if sqlite.is_sqlite_url(url) and sqlite.is_memory_url(url):
+        # An in-memory database only exists on its one connection, so share it
+        from sqlalchemy.pool import StaticPool
+        engine = create_engine(url, poolclass=StaticPool, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(
+            url,
+            poolclass=InstrumentedQueuePool,
+            pool_logging_name=name,
+            **get_pool_settings(),
+        )
+
+    if sqlite.is_sqlite_url(url):
+        sqlite.register_sqlite_pragmas(engine)
+    register_query_instrumentation(engine)  # Per-rerun query stats (see db/instrumentation.py)
+    return engine
+
+
+def __getattr__(name):
+    # Backwards compatibility for `from db.models import engine, Session`; both are
+    # resolved lazily through the accessors above.
+    if name == "engine":
+        return get_engine()
+    if name == "Session":
+        return get_session_factory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 Base = declarative_base()
 
@@ -31,30 +118,107 @@ class User(Base):
     id = Column(Integer, primary_key=True)
     email = Column(String(255), nullable=False, unique=True, index=True, comment="User's email address from Auth0")
     auth0_user_id = Column(String(255), nullable=False, unique=True, index=True, comment="Auth0 user ID (e.g., auth0|123456)")
-    roles = Column(JSONB, nullable=False, default=list, server_default='[]', comment="List of user roles")
-    user_preferences = Column(JSONB, nullable=True, comment="User-specific preferences and settings")
+    roles = Column(PortableJSON, nullable=False, default=list, server_default='[]', comment="List of user roles")
+    user_preferences = Column(PortableJSON, nullable=True, comment="User-specific preferences and settings")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Role containment queries (@>, ?|) on PostgreSQL; SQLite uses the user_roles table below
+        Index('idx_users_roles_gin', 'roles', postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
+
     def has_role(self, role: str) -> bool:
-        """Check if user has a specific role."""
+        """Check if an already-loaded user has a specific role (see `get_users_with_role` for queries)."""
         return role in (self.roles or [])
 
     def has_any_role(self, roles: list[str]) -> bool:
-        """Check if user has any of the specified roles."""
+        """Check if an already-loaded user has any of the specified roles."""
         user_roles = self.roles or []
         return any(role in user_roles for role in roles)
 
+
+def get_users_with_role(session, role: str) -> list:
+    """Return all users that have the given role, using an indexed DB-side predicate."""
+    return get_users_with_any_role(session, [role])
+
+
+def get_users_with_any_role(session, roles: list[str]) -> list:
+    """Return all users that have any of the given roles, using an indexed DB-side predicate.
+
+    Cost scales with the number of matching users rather than the size of the table:
+    PostgreSQL uses the GIN index on `users.roles`, SQLite the `user_roles` index.
+    """
+    if not roles:
+        return []
+    dialect_name = session.get_bind(User).dialect.name
+    return list(session.scalars(select(User).where(users_with_any_role_clause(roles, dialect_name))))
+
+
+def users_with_any_role_clause(roles: list[str], dialect_name: str):
+    """Return a WHERE clause matching users with any of the roles, for the given dialect."""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import JSONB, array
+        roles_jsonb = type_coerce(User.roles, JSONB)
+        if len(roles) == 1:
+            return roles_jsonb.contains(roles)    # roles @> '["admin"]'
+        return roles_jsonb.has_any(array(roles))  # roles ?| array['admin', 'users']
+    return User.id.in_(select(user_roles.c.user_id).where(user_roles.c.role.in_(roles)))
+
+
+# Normalized role index for backends without JSONB/GIN (SQLite). It lives outside Base
+# because it is derived data: triggers on `users` keep it in sync for every write path
+# (ORM, core statements, restores), so it is never written or backed up directly.
+role_index_metadata = MetaData()
+
+user_roles = Table(
+    'user_roles', role_index_metadata,
+    Column('user_id', Integer, primary_key=True),
+    Column('role', String(100), primary_key=True),
+    Index('idx_user_roles_role', 'role', 'user_id'),
+)
+
+SQLITE_ROLE_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS trg_users_roles_insert AFTER INSERT ON users BEGIN
+        INSERT OR IGNORE INTO user_roles (user_id, role) SELECT NEW.id, value FROM json_each(NEW.roles);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_users_roles_update AFTER UPDATE OF roles ON users BEGIN
+        DELETE FROM user_roles WHERE user_id = OLD.id;
+        INSERT OR IGNORE INTO user_roles (user_id, role) SELECT NEW.id, value FROM json_each(NEW.roles);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_users_roles_delete AFTER DELETE ON users BEGIN
+        DELETE FROM user_roles WHERE user_id = OLD.id;
+    END""",
+]
+
+
+def create_sqlite_role_index(connection) -> None:
+    """Create the user_roles table and its sync triggers (SQLite only, idempotent)."""
+    user_roles.create(bind=connection, checkfirst=True)
+    for trigger in SQLITE_ROLE_TRIGGERS:
+        connection.execute(DDL(trigger))
+
+
+@event.listens_for(User.__table__, "after_create")
+def _create_role_index(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        create_sqlite_role_index(connection)
+
 class AppSettings(Base):
     """
     Generic settings table for storing application-wide configuration values.
     Each setting is stored as a key-value pair with metadata.
+
+    Read and write settings through `db.settings_store` rather than querying this
+    table directly; it handles encoding, compression, versioning and caching.
     """
     __tablename__ = 'app_settings'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     key = Column(String(100), nullable=False, comment="Setting name/identifier")
-    value = Column(String(1000), nullable=False, comment="Setting value stored as string or JSON")
+    value = Column(Text, nullable=False, comment="Setting value stored as JSON, optionally compressed (see encoding)")
+    encoding = Column(String(20), nullable=False, default="json", server_default="json", comment="How value is encoded: 'json' or 'json+zlib'")
+    version = Column(Integer, nullable=False, default=1, server_default="1", comment="Incremented on every write, used for cache invalidation")
     description = Column(String(500), nullable=True, comment="Optional description of what this setting does")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -65,6 +229,7 @@ class AppSettings(Base):
     )
 
 # NOTE: Database tables are not automatically created.
-# To create tables, set up a proper PostgreSQL database on Railway and run migrations:
-#    python -c "from db.models import Base, engine; Base.metadata.create_all(engine)"
+# To create tables, set up a proper PostgreSQL database on Railway (or point DATABASE_URL at
+# a SQLite file, e.g. sqlite:///app.db, for single-node deployments) and run migrations:
+#    python -m db.migrations upgrade
 # Removed automatic creation: Base.metadata.create_all(engine)
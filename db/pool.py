@@ -0,0 +1,173 @@
+"""
+Connection pool configuration and instrumentation for the SQLAlchemy engine.
+
+Pool sizing is read from the environment so it can be tuned per deployment
+without code changes. The instrumented pool records checkout latency, time spent
+waiting for a free connection, overflow events and timeouts so that checkout
+stalls under load can be diagnosed from `get_pool_stats()`.
+"""
+
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Dict, Optional
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from monitoring.metrics import histogram, register_collector
+
+# Number of recent checkout latencies kept per pool for percentile estimates
+_LATENCY_WINDOW = 1024
+
+_stats_lock = threading.Lock()
+_pool_stats: Dict[str, Dict] = {}
+_pools = weakref.WeakSet()  # Live instrumented pools, for the exported gauges
+
+POOL_CHECKOUT_SECONDS = histogram("db_pool_checkout_seconds", "Connection checkout latency", ["pool"])
+
+
+def get_pool_settings() -> Dict:
+    """Return `create_engine` pool keyword arguments from environment variables.
+
+    Defaults favour long-lived Streamlit processes behind a proxy that drops idle
+    connections: pre-ping is on and connections are recycled every 30 minutes.
+    """
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records checkout timings and overflow/timeout events."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _pools.add(self)
+
+    def connect(self):
+        # Every connection the pool may hold is checked out: this checkout has to block
+        exhausted = self._max_overflow > -1 and self.checkedout() >= self.size() + self._max_overflow
+        overflow_before = self.overflow()
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            _record_timeout(self._stats_name(), time.perf_counter() - start)
+            raise
+
+        elapsed = time.perf_counter() - start
+        # Opening a new connection below the pool's capacity is not a wait; its cost
+        # shows in the checkout latency. The count is approximate under races.
+        waited = exhausted
+        overflowed = self.overflow() > max(overflow_before, 0)
+        _record_checkout(self._stats_name(), elapsed, waited, overflowed)
+        POOL_CHECKOUT_SECONDS.observe(elapsed, pool=self._stats_name())
+        return connection
+
+    def _stats_name(self) -> str:
+        return self.logging_name or "default"
+
+
+def get_pool_stats(engine=None) -> Dict[str, Dict]:
+    """Return pool metrics keyed by pool name.
+
+    Counters accumulate for the lifetime of the process. When an engine is given,
+    live gauges (size, in-use and overflow connections) are added to its entry.
+    """
+    with _stats_lock:
+        snapshot = {name: _summarize(stats) for name, stats in _pool_stats.items()}
+
+    if engine is not None and isinstance(engine.pool, QueuePool):
+        pool = engine.pool
+        name = getattr(pool, "logging_name", None) or "default"
+        entry = snapshot.setdefault(name, _summarize(_new_stats()))
+        entry.update({
+            "pool_size": pool.size(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    return snapshot
+
+
+def reset_pool_stats(name: Optional[str] = None) -> None:
+    """Clear accumulated pool metrics for one pool, or for all pools."""
+    with _stats_lock:
+        if name is None:
+            _pool_stats.clear()
+        else:
+            _pool_stats.pop(name, None)
+
+
+def _collect_pool_metrics():
+    """Export accumulated pool counters and live gauges (see monitoring/metrics.py)."""
+    with _stats_lock:
+        stats = {name: dict(values) for name, values in _pool_stats.items()}
+    for name, values in stats.items():
+        for key in ("checkouts", "waits", "timeouts", "overflow_events"):
+            yield f"db_pool_{key}_total", "counter", f"Connection pool {key.replace('_', ' ')}", {"pool": name}, values[key]
+        yield "db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection", {"pool": name}, values["wait_seconds_total"]
+    for pool in list(_pools):
+        labels = {"pool": pool._stats_name()}
+        yield "db_pool_size", "gauge", "Configured pool size", labels, pool.size()
+        yield "db_pool_in_use", "gauge", "Connections checked out", labels, pool.checkedout()
+        yield "db_pool_idle", "gauge", "Idle connections in the pool", labels, pool.checkedin()
+        yield "db_pool_overflow", "gauge", "Overflow connections open", labels, max(pool.overflow(), 0)
+
+
+register_collector(_collect_pool_metrics)
+
+
+def _record_checkout(name: str, elapsed: float, waited: bool, overflowed: bool) -> None:
+    with _stats_lock:
+        stats = _pool_stats.setdefault(name, _new_stats())
+        stats["checkouts"] += 1
+        stats["checkout_seconds_total"] += elapsed
+        stats["checkout_seconds_max"] = max(stats["checkout_seconds_max"], elapsed)
+        stats["recent_latencies"].append(elapsed)
+        if waited:
+            stats["waits"] += 1
+            stats["wait_seconds_total"] += elapsed
+            stats["wait_seconds_max"] = max(stats["wait_seconds_max"], elapsed)
+        if overflowed:
+            stats["overflow_events"] += 1
+
+
+def _record_timeout(name: str, elapsed: float) -> None:
+    with _stats_lock:
+        stats = _pool_stats.setdefault(name, _new_stats())
+        stats["timeouts"] += 1
+        stats["waits"] += 1
+        stats["wait_seconds_total"] += elapsed
+        stats["wait_seconds_max"] = max(stats["wait_seconds_max"], elapsed)
+
+
+def _new_stats() -> Dict:
+    return {
+        "checkouts": 0,
+        "checkout_seconds_total": 0.0,
+        "checkout_seconds_max": 0.0,
+        "waits": 0,
+        "wait_seconds_total": 0.0,
+        "wait_seconds_max": 0.0,
+        "overflow_events": 0,
+        "timeouts": 0,
+        "recent_latencies": deque(maxlen=_LATENCY_WINDOW),
+    }
+
+
+def _summarize(stats: Dict) -> Dict:
+    latencies = sorted(stats["recent_latencies"])
+    summary = {key: value for key, value in stats.items() if key != "recent_latencies"}
+    for label, quantile in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+        summary[f"checkout_seconds_{label}"] = (
+            latencies[min(int(quantile * len(latencies)), len(latencies) - 1)] if latencies else 0.0
+        )
+    return summary
@@ -0,0 +1,335 @@
+"""
+Per-user preferences stored in `users.user_preferences`, with write-behind persistence.
+
+Pages read and write preferences through the current session's in-memory view, so
+neither reads nor writes add database latency to a rerun:
+
+    theme = get_preference("theme", "light")
+    set_preference("theme", "dark")
+
+The view is loaded with one query the first time a session of a logged-in user asks
+for it (and again after a different user logs in). Writes update the view right
+away and are queued process-wide: changes to the same user are coalesced, and a
+background thread flushes the queue once writes have been quiet for
+`PREFERENCES_FLUSH_DELAY_SECONDS` (at most `PREFERENCES_FLUSH_MAX_DELAY_SECONDS`
+after the oldest pending change). A flush writes all pending users with multi-row
+upserts of `PREFERENCES_FLUSH_BATCH_SIZE` rows, each sending only the changed keys:
+
+- PostgreSQL merges them into the stored JSONB (`||`, then removes deleted keys).
+- SQLite applies them with `json_patch`.
+- Other backends read, merge and write each user's row in the flush's session.
+
+Top-level keys are replaced (not deep-merged), and a value of None deletes the key.
+Preferences live on the user's `users` row, so the first preference write of a user
+without a row creates it: keyed by their Auth0 user ID, with their email and empty
+`roles` (roles are granted in Auth0 and read from the login token, not from this
+table). Changes that violate a
+constraint (e.g. an email already used by another Auth0 user) are logged as a
+warning and kept: they still show in the user's preferences, and are written again
+with the user's next change. Pending changes are flushed when the process exits
+normally (`atexit`); call `flush_preferences()` to write them synchronously, e.g. in
+scripts. Without `DATABASE_URL` preferences only live in the session.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, text
+
+from db.models import User, get_engine, get_session_factory, write_session
+from monitoring.metrics import counter, histogram
+
+SESSION_KEY = "user_preferences"
+UPSERT_DIALECTS = ("postgresql", "sqlite")  # Others use the read-merge-write path (_merge_rows)
+
+logger = logging.getLogger(__name__)
+
+# Metrics (see monitoring/metrics.py)
+PREFERENCES_FLUSH_SECONDS = histogram("preferences_flush_seconds", "Write-behind preference flush latency")
+PREFERENCES_ROWS = counter("preferences_rows_total", "Users' preference changes flushed, by result", ["result"])
+
+_condition = threading.Condition()
+_pending: Dict[str, Dict] = {}  # auth0_user_id -> {"email", "changes", "first_at", "last_at"}
+_in_flight: Dict[str, Dict] = {}  # Taken from _pending by the running flush, until written
+_conflicts: Dict[str, Dict] = {}  # Rejected by a constraint; retried with the user's next change
+_flush_lock = threading.Lock()  # One flush at a time keeps each user's writes in order
+_flusher: Optional[threading.Thread] = None
+
+
+# ==============================================================================
+# Session view
+# ==============================================================================
+
+def get_preferences() -> Dict[str, Any]:
+    """Return a copy of the current user's preferences ({} when logged out)."""
+    return dict(_session_view())
+
+
+def get_preference(key: str, default: Any = None) -> Any:
+    """Return one of the current user's preferences, or `default` if it isn't set."""
+    return _session_view().get(key, default)
+
+
+def set_preference(key: str, value: Any) -> None:
+    """Set (or with None, delete) one of the current user's preferences."""
+    update_preferences({key: value})
+
+
+def update_preferences(changes: Dict[str, Any]) -> None:
+    """Apply several changes to the current user's preferences (None deletes a key).
+
+    The session view is updated immediately and the changes are persisted in the
+    background. Values must be JSON-serializable. Logged-out sessions keep them in
+    the session only.
+    """
+    from auth.auth import get_current_user
+
+    values = _session_view()  # Updated in place
+    for key, value in changes.items():
+        if value is None:
+            values.pop(key, None)
+        else:
+            values[key] = value
+    user = get_current_user()
+    if user is not None and user.user_id:
+        queue_preferences(user.user_id, user.email, changes)
+
+
+def _session_view() -> Dict[str, Any]:
+    """Return the session's preference dict, loading it when the logged-in user changed."""
+    import streamlit as st
+    from auth.auth import get_current_user
+
+    user = get_current_user()
+    user_id = user.user_id if user is not None else None
+    view = st.session_state.get(SESSION_KEY)
+    if view is None or view["user_id"] != user_id:
+        view = {"user_id": user_id, "values": load_preferences(user_id) if user_id else {}}
+        st.session_state[SESSION_KEY] = view
+    return view["values"]
+
+
+# ==============================================================================
+# Storage
+# ==============================================================================
+
+def load_preferences(user_id: str) -> Dict[str, Any]:
+    """Read a user's stored preferences, with their not yet flushed changes applied."""
+    values = {}
+    if get_session_factory() is not None:
+        try:
+            with get_session_factory()() as session:
+                stored = session.execute(
+                    select(User.user_preferences).where(User.auth0_user_id == user_id)
+                ).scalar_one_or_none()
+            values = dict(stored or {})
+        except Exception as e:
+            logger.warning("Could not load preferences for %s: %s", user_id, e)
+
+    with _condition:
+        for queue in (_conflicts, _in_flight, _pending):
+            if entry := queue.get(user_id):
+                values.update(entry["changes"])
+    return {key: value for key, value in values.items() if value is not None}
+
+
+def queue_preferences(user_id: str, email: str, changes: Dict[str, Any]) -> bool:
+    """Queue changes to a user's stored preferences for the next flush.
+
+    Returns False (and queues nothing) when no database is configured.
+    """
+    if get_session_factory() is None:
+        return False
+    now = time.monotonic()
+    with _condition:
+        entry = _pending.setdefault(user_id, {"email": email, "changes": {}, "first_at": now})
+        if conflict := _conflicts.pop(user_id, None):
+            entry["changes"] = {**conflict["changes"], **entry["changes"]}  # Try the rejected changes again
+        entry["changes"].update(changes)
+        entry["email"] = email
+        entry["last_at"] = now
+        _condition.notify()
+    _ensure_flusher()
+    return True
+
+
+def flush_preferences() -> int:
+    """Write all pending changes now; return the number of users written.
+
+    Batches that fail are retried user by user. Changes that can't be written
+    because of a constraint are kept until the user's next change (see the module
+    docstring); other failures are re-queued for the next flush.
+    """
+    global _pending, _in_flight
+    if get_engine() is None:
+        return 0
+    with _flush_lock:
+        with _condition:
+            _in_flight, _pending = _pending, {}
+        if not _in_flight:
+            return 0
+
+        items = list(_in_flight.items())
+        batch_size = max(int(os.getenv("PREFERENCES_FLUSH_BATCH_SIZE", "500")), 1)
+        written = 0
+        try:
+            with PREFERENCES_FLUSH_SECONDS.time():
+                for start in range(0, len(items), batch_size):
+                    batch = items[start:start + batch_size]
+                    try:
+                        _write_batch(batch)
+                        written += len(batch)
+                        PREFERENCES_ROWS.inc(len(batch), result="written")
+                    except Exception:
+                        written += _write_rows(batch)
+        finally:
+            with _condition:
+                _in_flight = {}
+        return written
+
+
+def _write_rows(batch: List[Tuple[str, Dict]]) -> int:
+    from sqlalchemy.exc import IntegrityError
+
+    written = 0
+    for user_id, entry in batch:
+        try:
+            _write_batch([(user_id, entry)])
+            written += 1
+            PREFERENCES_ROWS.inc(result="written")
+        except IntegrityError as e:
+            logger.warning("Preference changes for %s rejected by the database, kept until their next change: %s",
+                           user_id, e.orig)
+            PREFERENCES_ROWS.inc(result="conflict")
+            with _condition:
+                _conflicts[user_id] = entry
+        except Exception as e:
+            logger.warning("Could not write preferences for %s, will retry: %s", user_id, e)
+            PREFERENCES_ROWS.inc(result="requeued")
+            _requeue(user_id, entry)
+    return written
+
+
+def _write_batch(batch: List[Tuple[str, Dict]]) -> None:
+    """Upsert one row per user, merging each user's changes into the stored preferences."""
+    now = datetime.utcnow()
+    rows = [
+        {
+            "email": entry["email"],
+            "auth0_user_id": user_id,
+            "roles": [],  # Only used when the row is created (see the module docstring)
+            "user_preferences": entry["changes"],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for user_id, entry in batch
+    ]
+    with write_session() as session:
+        dialect_name = session.get_bind(User).dialect.name
+        if dialect_name in UPSERT_DIALECTS:
+            session.execute(_upsert_statement(dialect_name, rows, now))
+        else:
+            _merge_rows(session, rows, now)
+        session.commit()
+
+
+def _merge_rows(session, rows: List[Dict], now: datetime) -> None:
+    """Portable fallback for backends without an upsert: read, merge and write each row."""
+    user_ids = [row["auth0_user_id"] for row in rows]
+    users = {
+        user.auth0_user_id: user
+        for user in session.execute(
+            select(User).where(User.auth0_user_id.in_(user_ids)).with_for_update()
+        ).scalars()
+    }
+    for row in rows:
+        user = users.get(row["auth0_user_id"])
+        if user is None:
+            user = User(**{**row, "user_preferences": {}})
+            session.add(user)
+        merged = {**(user.user_preferences or {}), **row["user_preferences"]}
+        user.user_preferences = {key: value for key, value in merged.items() if value is not None}
+        user.updated_at = now
+
+
+def _upsert_statement(dialect_name: str, rows: List[Dict], now: datetime):
+    table = User.__table__
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        merged = text(
+            f"(COALESCE({table.name}.user_preferences, '{{}}'::jsonb) || excluded.user_preferences)"
+            " - ARRAY(SELECT key FROM jsonb_each(excluded.user_preferences) WHERE value = 'null'::jsonb)"
+        )
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        # Null out the changed keys first, so object values replace (not merge into) the stored ones
+        merged = text(
+            f"json_patch(json_patch(COALESCE({table.name}.user_preferences, '{{}}'),"
+            " (SELECT json_group_object(key, NULL) FROM json_each(excluded.user_preferences))),"
+            " excluded.user_preferences)"
+        )
+
+    statement = insert(table).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.auth0_user_id],
+        set_={"user_preferences": merged, "updated_at": now},
+    )
+
+
+def _requeue(user_id: str, entry: Dict) -> None:
+    """Put failed changes back, beneath any newer changes queued meanwhile.
+
+    They count as new changes, so the retry waits for the flush delay again.
+    """
+    now = time.monotonic()
+    with _condition:
+        newer = _pending.get(user_id)
+        if newer is None:
+            _pending[user_id] = {**entry, "first_at": now, "last_at": now}
+        else:
+            newer["changes"] = {**entry["changes"], **newer["changes"]}
+        _condition.notify()
+
+
+# ==============================================================================
+# Background flushing
+# ==============================================================================
+
+def _ensure_flusher() -> None:
+    global _flusher
+    if _flusher is not None:
+        return
+    with _condition:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="preferences-flush", daemon=True)
+            _flusher.start()
+            atexit.register(flush_preferences)
+
+
+def _flush_loop() -> None:
+    while True:
+        delay = float(os.getenv("PREFERENCES_FLUSH_DELAY_SECONDS", "2"))
+        max_delay = float(os.getenv("PREFERENCES_FLUSH_MAX_DELAY_SECONDS", "10"))
+        with _condition:
+            while not _pending:
+                _condition.wait()
+            # Debounce: wait for writes to go quiet, but not beyond the oldest change's deadline
+            while _pending:
+                now = time.monotonic()
+                deadline = min(
+                    max(entry["last_at"] for entry in _pending.values()) + delay,
+                    min(entry["first_at"] for entry in _pending.values()) + max_delay,
+                )
+                if now >= deadline:
+                    break
+                _condition.wait(deadline - now)
+        try:
+            flush_preferences()
+        except Exception as e:
+            logger.warning("Preference flush failed: %s", e)
+            time.sleep(delay)
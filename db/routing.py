@@ -0,0 +1,91 @@
+"""
+Read-replica routing for the sync Session.
+
+When `DATABASE_REPLICA_URLS` is set (comma-separated), `db.models.get_session_factory()`
+returns sessions of `RoutingSession`, which send read-only work to a replica and
+everything else to the primary:
+
+- Flushes, INSERT/UPDATE/DELETE statements and sessions opened with
+  `db.models.write_session()` go to the primary. Once a session has written, it stays
+  on the primary so it can read its own uncommitted changes.
+- Reads pick one replica per session (round-robin, or the replica with the fewest
+  connections in use when `DB_REPLICA_STRATEGY=least_in_use`).
+- For `DB_READ_YOUR_WRITES_SECONDS` after any write commits in this process, all reads
+  go to the primary so a save is immediately visible despite replication lag.
+"""
+
+import itertools
+import os
+import threading
+import time
+from typing import List
+
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+USE_PRIMARY = "use_primary"
+
+_lock = threading.Lock()
+_replica_engines = None
+_round_robin = None
+_last_write_at = 0.0
+
+
+def get_replica_urls() -> List[str]:
+    """Return the configured replica URLs (empty if replicas are not used)."""
+    return [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+
+def get_replica_engines() -> list:
+    """Return the process-wide replica engines, creating them on first use."""
+    global _replica_engines, _round_robin
+    if _replica_engines is None:
+        from db.models import _build_engine
+        with _lock:
+            if _replica_engines is None:
+                engines = [_build_engine(url, name=f"replica{index}") for index, url in enumerate(get_replica_urls())]
+                _round_robin = itertools.cycle(range(len(engines))) if engines else None
+                _replica_engines = engines
+    return _replica_engines
+
+
+class RoutingSession(Session):
+    """Session that routes reads to replicas and writes to the primary engine."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        from db.models import get_engine
+
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info[USE_PRIMARY] = True
+        if self.info.get(USE_PRIMARY) or _in_read_your_writes_window():
+            return get_engine()
+
+        if "replica" not in self.info:
+            self.info["replica"] = _choose_replica()
+        return self.info["replica"] or get_engine()
+
+    def commit(self):
+        wrote = self.info.get(USE_PRIMARY, False) or bool(self.new or self.dirty or self.deleted)
+        super().commit()
+        if wrote:
+            _record_write()
+
+
+def _choose_replica():
+    engines = get_replica_engines()
+    if not engines:
+        return None
+    if os.getenv("DB_REPLICA_STRATEGY", "round_robin") == "least_in_use":
+        return min(engines, key=lambda engine: engine.pool.checkedout())
+    with _lock:
+        return engines[next(_round_robin)]
+
+
+def _record_write() -> None:
+    global _last_write_at
+    _last_write_at = time.monotonic()
+
+
+def _in_read_your_writes_window() -> bool:
+    window = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+    return time.monotonic() - _last_write_at < window
@@ -0,0 +1,183 @@
+"""
+Typed key/value settings API on top of the `AppSettings` table.
+
+Values are stored as compact JSON, compressed once they exceed a size threshold,
+and served from an in-process read-through cache. Each row carries a `version`
+that is bumped on every write: once a cached entry's TTL expires, only the
+versions are re-read, and values are re-fetched (and decoded) only for keys that
+actually changed. `get_many` resolves several keys with at most two queries.
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import select, update
+
+from db.models import AppSettings, get_session_factory, write_session
+
+ENCODING_JSON = "json"
+ENCODING_JSON_ZLIB = "json+zlib"
+
+# Marker cached for keys that have no row, so defaults don't cost a query each time
+_MISSING = object()
+
+_cache_lock = threading.Lock()
+_cache: Dict[str, tuple] = {}  # key -> (value, version, expires_at)
+
+
+def get_setting(key: str, default: Any = None, type_: Optional[type] = None) -> Any:
+    """Return a setting's decoded value, or `default` if it is not set.
+
+    Args:
+        key: Setting name.
+        default: Returned when the setting does not exist or no database is configured.
+        type_: Optional expected Python type; a stored value of another type raises TypeError.
+
+    Returns:
+        The decoded setting value.
+    """
+    value = get_many([key]).get(key, default)
+    if type_ is not None and value is not default and not isinstance(value, type_):
+        raise TypeError(f"Setting '{key}' is {type(value).__name__}, expected {type_.__name__}")
+    return value
+
+
+def get_many(keys: Iterable[str]) -> Dict[str, Any]:
+    """Return decoded values for several settings at once; missing keys are omitted."""
+    keys = list(dict.fromkeys(keys))
+    if get_session_factory() is None:
+        return {}
+
+    now = time.monotonic()
+    results, stale, uncached = {}, {}, []
+    with _cache_lock:
+        for key in keys:
+            entry = _cache.get(key)
+            if entry is None:
+                uncached.append(key)
+            elif entry[2] > now:
+                results[key] = entry[0]
+            else:
+                stale[key] = entry
+
+    if stale or uncached:
+        results.update(_load(uncached, stale))
+
+    return {key: value for key, value in results.items() if value is not _MISSING}
+
+
+def set_setting(key: str, value: Any, description: Optional[str] = None, compress: Optional[bool] = None) -> int:
+    """Create or update a setting and return its new version.
+
+    Args:
+        key: Setting name.
+        value: Any JSON-serializable value.
+        description: Optional description stored alongside new settings (and updated if given).
+        compress: Force compression on or off; by default values larger than
+            `APP_SETTINGS_COMPRESS_MIN_BYTES` are compressed.
+    """
+    if get_session_factory() is None:
+        raise RuntimeError("Cannot save setting: No database configured")
+
+    stored, encoding = _encode(value, compress)
+    with write_session() as session:
+        setting = session.execute(select(AppSettings).filter(AppSettings.key == key)).scalar_one_or_none()
+        if setting is None:
+            setting = AppSettings(key=key, value=stored, encoding=encoding, version=1, description=description)
+            session.add(setting)
+        else:
+            # Bump the version in SQL so concurrent writers never reuse a version number
+            session.execute(
+                update(AppSettings)
+                .where(AppSettings.id == setting.id)
+                .values(
+                    value=stored,
+                    encoding=encoding,
+                    version=AppSettings.version + 1,
+                    **({"description": description} if description is not None else {}),
+                )
+            )
+        session.commit()
+        session.refresh(setting)
+        version = setting.version
+
+    _store(key, value, version)
+    return version
+
+
+def delete_setting(key: str) -> None:
+    """Delete a setting if it exists."""
+    if get_session_factory() is None:
+        raise RuntimeError("Cannot delete setting: No database configured")
+
+    with write_session() as session:
+        session.query(AppSettings).filter(AppSettings.key == key).delete()
+        session.commit()
+    invalidate([key])
+
+
+def invalidate(keys: Optional[Iterable[str]] = None) -> None:
+    """Drop cached entries for the given keys (or all keys) so the next read hits the DB."""
+    with _cache_lock:
+        if keys is None:
+            _cache.clear()
+        else:
+            for key in keys:
+                _cache.pop(key, None)
+
+
+def _load(uncached: list, stale: Dict[str, tuple]) -> Dict[str, Any]:
+    """Refresh stale entries by version and fetch uncached or changed values in one query."""
+    results = {}
+    with get_session_factory()() as session:
+        to_fetch = list(uncached)
+        if stale:
+            versions = dict(session.execute(
+                select(AppSettings.key, AppSettings.version).filter(AppSettings.key.in_(stale))
+            ).all())
+            for key, (value, version, _) in stale.items():
+                if versions.get(key) == version or (key not in versions and value is _MISSING):
+                    _store(key, value, version)
+                    results[key] = value
+                else:
+                    to_fetch.append(key)
+
+        if to_fetch:
+            rows = session.execute(
+                select(AppSettings.key, AppSettings.value, AppSettings.encoding, AppSettings.version)
+                .filter(AppSettings.key.in_(to_fetch))
+            ).all()
+            found = {row.key: row for row in rows}
+            for key in to_fetch:
+                row = found.get(key)
+                value = _decode(row.value, row.encoding) if row else _MISSING
+                _store(key, value, row.version if row else None)
+                results[key] = value
+    return results
+
+
+def _store(key: str, value: Any, version: Optional[int]) -> None:
+    expires_at = time.monotonic() + float(os.getenv("APP_SETTINGS_CACHE_TTL", "30"))
+    with _cache_lock:
+        _cache[key] = (value, version, expires_at)
+
+
+def _encode(value: Any, compress: Optional[bool]) -> tuple:
+    text = json.dumps(value, separators=(",", ":"))
+    if compress is None:
+        compress = len(text) >= int(os.getenv("APP_SETTINGS_COMPRESS_MIN_BYTES", "2048"))
+    if not compress:
+        return text, ENCODING_JSON
+    packed = base64.b64encode(zlib.compress(text.encode("utf-8"), level=6)).decode("ascii")
+    return packed, ENCODING_JSON_ZLIB
+
+
+def _decode(stored: str, encoding: Optional[str]) -> Any:
+    if encoding == ENCODING_JSON_ZLIB:
+        stored = zlib.decompress(base64.b64decode(stored)).decode("utf-8")
+    return json.loads(stored)  # May raise JSONDecodeError
@@ -0,0 +1,57 @@
+"""
+SQLite backend support for single-node deployments, local benchmarking and tests.
+
+Set `DATABASE_URL=sqlite:///app.db` to run without a database server. Every new
+connection is put in WAL mode (readers don't block the writer) with a tuned
+`synchronous` level and a busy timeout, and any extra pragmas can be supplied via
+`DB_SQLITE_PRAGMAS` (e.g. "cache_size=-64000,temp_store=MEMORY").
+"""
+
+import os
+from typing import Dict
+
+from sqlalchemy import event
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    # NORMAL is durable in WAL mode except for the last transactions on power loss
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "busy_timeout": "5000",
+}
+
+
+def is_sqlite_url(url: str) -> bool:
+    """Return True if the database URL points at SQLite."""
+    return url.startswith("sqlite")
+
+
+def is_memory_url(url: str) -> bool:
+    """Return True for in-memory SQLite URLs, which need a single shared connection."""
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
+def get_sqlite_pragmas() -> Dict[str, str]:
+    """Return the pragmas applied to every SQLite connection, including env overrides."""
+    pragmas = dict(DEFAULT_PRAGMAS)
+    pragmas["synchronous"] = os.getenv("DB_SQLITE_SYNCHRONOUS", pragmas["synchronous"])
+    pragmas["busy_timeout"] = os.getenv("DB_SQLITE_BUSY_TIMEOUT_MS", pragmas["busy_timeout"])
+
+    for item in filter(None, os.getenv("DB_SQLITE_PRAGMAS", "").split(",")):
+        name, _, value = item.partition("=")
+        pragmas[name.strip()] = value.strip()
+    return pragmas
+
+
+def register_sqlite_pragmas(engine, pragmas: Dict[str, str] = None) -> None:
+    """Attach a connect hook that applies the pragmas to each new DBAPI connection."""
+    pragmas = pragmas if pragmas is not None else get_sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
@@ -0,0 +1,23 @@
+"""
+Column types that work across the database backends supported by db.models.
+"""
+
+from sqlalchemy.types import JSON, TypeDecorator
+
+
+class PortableJSON(TypeDecorator):
+    """JSON column stored as JSONB on PostgreSQL and as JSON text on other backends (e.g. SQLite).
+
+    The PostgreSQL dialect is only imported when a PostgreSQL connection actually
+    compiles or binds the type, so importing the models stays cheap.
+    """
+
+    impl = JSON
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        none_as_null = self.impl.none_as_null  # PortableJSON(none_as_null=True) stores None as SQL NULL
+        if dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import JSONB
+            return dialect.type_descriptor(JSONB(none_as_null=none_as_null))
+        return dialect.type_descriptor(JSON(none_as_null=none_as_null))
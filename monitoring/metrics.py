@@ -0,0 +1,360 @@
+"""
+In-process metrics registry with a Prometheus text exporter.
+
+Counters, gauges and histograms are registered once per process at module level and
+updated from the hot paths (RBAC, current user lookup, database pool and queries,
+Auth0 Management API calls):
+
+    RBAC_DECISIONS = counter("rbac_decisions_total", "Page access decisions", ["result"])
+    RBAC_DECISIONS.inc(result="allow")
+
+    with AUTH0_LATENCY.time(endpoint="/api/v2/users"):
+        ...
+
+Registration is idempotent, so modules that are re-executed (page scripts) get the
+existing metric back. Values can be exported in Prometheus text format:
+
+- `METRICS_PORT`: serve `/metrics` over HTTP from a background thread.
+- `METRICS_FILE`: rewrite the file every `METRICS_FLUSH_SECONDS` (e.g. for the
+  node_exporter textfile collector).
+- `METRICS_MULTIPROC_DIR`: with several worker processes, each process writes its
+  samples to `<dir>/<pid>.json` and the exporter sums counters and histograms
+  across processes. Gauges are exported per process with a `pid` label (a pool
+  size or a running count is a per-worker value; aggregate with `sum by`).
+  Files of exited workers, or not rewritten for `STALE_FLUSHES` flush intervals,
+  are skipped, so their gauges and counts drop out of the totals.
+
+Nothing is started unless one of these variables is set; `start_metrics()` is
+called from app.py and is a no-op after the first call.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; covers fast in-process checks up to slow Management API pages
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Flush intervals after which a worker's file is treated as abandoned
+STALE_FLUSHES = 3
+
+_registry_lock = threading.Lock()
+_metrics: Dict[str, "_Metric"] = {}
+_collectors: List[Callable[[], Iterable[Tuple]]] = []
+_started = False
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets (Prometheus semantics)."""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key + (("le", _format_value(bound)),), cumulative))
+            samples.append((f"{self.name}_count", key, cumulative))
+            samples.append((f"{self.name}_sum", key, total))
+        return samples
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Register (or return the already registered) counter."""
+    return _register(Counter, name, help, labelnames)
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+    """Register (or return the already registered) gauge."""
+    return _register(Gauge, name, help, labelnames)
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Register (or return the already registered) histogram."""
+    return _register(Histogram, name, help, labelnames, buckets=buckets)
+
+
+def register_collector(collect: Callable[[], Iterable[Tuple]]) -> None:
+    """Register a callback evaluated at export time.
+
+    It returns (name, type, help, labels_dict, value) tuples, for values that already
+    live elsewhere (e.g. connection pool gauges) and would be wasteful to mirror.
+    """
+    with _registry_lock:
+        if collect not in _collectors:
+            _collectors.append(collect)
+
+
+def render_prometheus() -> str:
+    """Return this node's metrics (all processes, in multiprocess mode) in Prometheus text format."""
+    families = _collect_local()
+    if os.getenv("METRICS_MULTIPROC_DIR"):
+        _write_process_file(families)
+        families = _read_process_files()
+    return _format(families)
+
+
+def start_metrics() -> None:
+    """Start the configured exporters (HTTP port, file dump, multiprocess flush) once."""
+    global _started
+    if _started:
+        return
+    with _registry_lock:
+        if _started:
+            return
+        _started = True
+
+    if port := os.getenv("METRICS_PORT"):
+        _start_http_server(int(port))
+    if os.getenv("METRICS_FILE") or os.getenv("METRICS_MULTIPROC_DIR"):
+        threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+
+
+# ==============================================================================
+# Collection and formatting
+# ==============================================================================
+
+def _register(cls, name: str, help: str, labelnames: Sequence[str], **kwargs):
+    with _registry_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = cls(name, help, labelnames, **kwargs)
+        elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {name} is already registered with a different type or labels")
+    return metric
+
+
+def _collect_local() -> Dict[str, Dict]:
+    """Return {family: {"type", "help", "samples": {(sample_name, labels): value}}}."""
+    with _registry_lock:
+        metrics = list(_metrics.values())
+        collectors = list(_collectors)
+
+    families: Dict[str, Dict] = {}
+    for metric in metrics:
+        family = families.setdefault(metric.name, {"type": metric.type, "help": metric.help, "samples": {}})
+        for sample_name, key, value in metric.samples():
+            labels = tuple(zip(metric.labelnames, key[:len(metric.labelnames)])) + tuple(key[len(metric.labelnames):])
+            family["samples"][(sample_name, labels)] = value
+
+    for collect in collectors:
+        try:
+            for name, type_, help, labels, value in collect():
+                family = families.setdefault(name, {"type": type_, "help": help, "samples": {}})
+                family["samples"][(name, tuple(sorted(labels.items())))] = value
+        except Exception as e:
+            print(f"Metrics collector failed: {e}")
+    return families
+
+
+def _format(families: Dict[str, Dict]) -> str:
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for (sample_name, labels), value in family["samples"].items():
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            lines.append(f"{sample_name}{{{label_text}}} {_format_value(value)}" if label_text
+                         else f"{sample_name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# ==============================================================================
+# Exporters
+# ==============================================================================
+
+def _write_process_file(families: Dict[str, Dict]) -> None:
+    directory = os.getenv("METRICS_MULTIPROC_DIR")
+    os.makedirs(directory, exist_ok=True)
+    payload = {
+        name: {"type": family["type"], "help": family["help"],
+               "samples": [[sample_name, list(map(list, labels)), value]
+                           for (sample_name, labels), value in family["samples"].items()]}
+        for name, family in families.items()
+    }
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(payload, f)
+    os.replace(f"{path}.tmp", path)  # Atomic, so readers never see a partial file
+
+
+def _read_process_files() -> Dict[str, Dict]:
+    """Merge the samples written by live worker processes (gauges: one series per `pid`)."""
+    directory = os.getenv("METRICS_MULTIPROC_DIR")
+    max_age = STALE_FLUSHES * float(os.getenv("METRICS_FLUSH_SECONDS", "15"))
+    files = []
+    for file_name in os.listdir(directory):
+        pid = file_name[:-len(".json")]
+        if not file_name.endswith(".json") or not pid.isdigit():
+            continue
+        path = os.path.join(directory, file_name)
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            continue
+        if _pid_alive(int(pid)) and time.time() - modified <= max_age:
+            files.append((pid, path))
+
+    families: Dict[str, Dict] = {}
+    for pid, path in sorted(files):
+        try:
+            with open(path) as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, family in payload.items():
+            merged = families.setdefault(name, {"type": family["type"], "help": family["help"], "samples": {}})
+            for sample_name, labels, value in family["samples"]:
+                labels = tuple(tuple(label) for label in labels)
+                if family["type"] == "gauge":
+                    merged["samples"][(sample_name, labels + (("pid", pid),))] = value
+                else:
+                    key = (sample_name, labels)
+                    merged["samples"][key] = merged["samples"].get(key, 0) + value
+    return families
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid() or os.name == "nt":
+        return True  # On Windows os.kill() would terminate the process; rely on the age check
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, owned by another user
+    return True
+
+
+def _flush_loop() -> None:
+    interval = float(os.getenv("METRICS_FLUSH_SECONDS", "15"))
+    while True:
+        try:
+            text = render_prometheus()
+            if path := os.getenv("METRICS_FILE"):
+                with open(f"{path}.tmp", "w") as f:
+                    f.write(text)
+                os.replace(f"{path}.tmp", path)
+        except Exception as e:
+            print(f"Metrics flush failed: {e}")
+        time.sleep(interval)
+
+
+def _start_http_server(port: int) -> None:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Don't log every scrape
+
+    try:
+        server = ThreadingHTTPServer((os.getenv("METRICS_HOST", "127.0.0.1"), port), MetricsHandler)
+    except OSError:
+        # Another worker on this node already serves the port; in multiprocess mode
+        # it exports this process's samples too
+        return
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
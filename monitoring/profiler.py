@@ -0,0 +1,207 @@
+"""
+Phase-level rerun profiler with per-page latency histograms.
+
+`app.py` wraps each rerun in `profile_rerun()` and each phase (loading the
+environment, the auth sidebar, RBAC navigation, the page body) in `phase()`.
+Timings are recorded into process-wide HDR-style histograms keyed by page and
+phase, so p50/p99 can be compared per phase without keeping every sample:
+
+    with profile_rerun() as profile:
+        with profile.phase("auth"):
+            render_auth_sidebar()
+        ...
+        profile.page = pg.title
+        with profile.phase("page"):
+            pg.run()
+
+Optionally, a sampled fraction of reruns (`PROFILE_SAMPLE_RATE`) runs under
+cProfile; those slower than `PROFILE_SLOW_MS` are dumped to `PROFILE_DUMP_DIR`
+for `python -m pstats` or snakeviz. With sampling off (the default) the overhead
+is a few `perf_counter()` calls per rerun.
+"""
+
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Histogram resolution: values below 2**_SUB_BITS are exact, larger values are
+# bucketed with a relative error of at most 1 / 2**(_SUB_BITS - 1) (~1.6%)
+_SUB_BITS = 7
+_SUB_COUNT = 1 << _SUB_BITS
+_HALF_COUNT = _SUB_COUNT // 2
+
+_histograms_lock = threading.Lock()
+_histograms: Dict[Tuple[str, str], "LatencyHistogram"] = {}
+
+
+class LatencyHistogram:
+    """Log-linear (HDR-style) histogram of durations, recorded in microseconds.
+
+    Memory grows with the number of distinct buckets in use (a few hundred at most),
+    not with the number of samples. Not thread-safe on its own; callers hold a lock.
+    """
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+
+    def record(self, value_us: int) -> None:
+        value_us = max(0, int(value_us))
+        index = _bucket_index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum_us += value_us
+        self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+        self.max_us = max(self.max_us, value_us)
+
+    def percentile(self, percent: float) -> int:
+        """Return the upper bound (in microseconds) of the bucket holding the given percentile."""
+        if not self.total:
+            return 0
+        rank = max(1, round(self.total * percent / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(_bucket_upper(index), self.max_us)
+        return self.max_us
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum_us += other.sum_us
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+        self.max_us = max(self.max_us, other.max_us)
+
+    def summary(self) -> Dict:
+        """Return count, mean and percentiles in milliseconds."""
+        return {
+            "count": self.total,
+            "mean_ms": round(self.sum_us / self.total / 1000, 2) if self.total else 0.0,
+            "p50_ms": self.percentile(50) / 1000,
+            "p90_ms": self.percentile(90) / 1000,
+            "p99_ms": self.percentile(99) / 1000,
+            "max_ms": self.max_us / 1000,
+        }
+
+
+class RerunProfile:
+    """Phase timings for one rerun; recorded into the histograms when the rerun ends."""
+
+    def __init__(self, page: Optional[str] = None):
+        self.page = page
+        self.phases: Dict[str, float] = {}
+        self.started = time.perf_counter()
+        self.profiler = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block as one phase of this rerun (repeated phases are summed)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+
+@contextmanager
+def profile_rerun(page: Optional[str] = None):
+    """Profile one rerun: yields a `RerunProfile` whose phases and total are recorded on exit.
+
+    Reruns interrupted by `st.rerun()`/`st.stop()` are recorded too; their timings
+    are real time spent by the session.
+    """
+    profile = RerunProfile(page)
+    if _should_sample():
+        import cProfile
+        profile.profiler = cProfile.Profile()
+        profile.profiler.enable()
+    try:
+        yield profile
+    finally:
+        total = time.perf_counter() - profile.started
+        if profile.profiler is not None:
+            profile.profiler.disable()
+            if total * 1000 >= float(os.getenv("PROFILE_SLOW_MS", "1000")):
+                _dump_profile(profile, total)
+        _record(profile.page or "(no page)", {**profile.phases, "total": total})
+
+
+def get_latency_summary() -> List[Dict]:
+    """Return per-page, per-phase latency percentiles, slowest p99 first."""
+    with _histograms_lock:
+        rows = [{"page": page, "phase": phase, **histogram.summary()}
+                for (page, phase), histogram in _histograms.items()]
+    return sorted(rows, key=lambda row: row["p99_ms"], reverse=True)
+
+
+def get_histogram(page: str, phase: str = "total") -> Optional[LatencyHistogram]:
+    """Return a copy of one page/phase histogram, or None if nothing was recorded."""
+    with _histograms_lock:
+        histogram = _histograms.get((page, phase))
+        if histogram is None:
+            return None
+        copy = LatencyHistogram()
+        copy.merge(histogram)
+    return copy
+
+
+def reset_latency_stats() -> None:
+    """Clear all histograms."""
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def _record(page: str, phases: Dict[str, float]) -> None:
+    with _histograms_lock:
+        for phase, seconds in phases.items():
+            histogram = _histograms.get((page, phase))
+            if histogram is None:
+                histogram = _histograms[(page, phase)] = LatencyHistogram()
+            histogram.record(seconds * 1_000_000)
+
+
+def _should_sample() -> bool:
+    rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    return rate > 0 and random.random() < rate
+
+
+def _dump_profile(profile: RerunProfile, total: float) -> None:
+    """Write a slow rerun's cProfile stats, keeping at most PROFILE_MAX_DUMPS files."""
+    dump_dir = Path(os.getenv("PROFILE_DUMP_DIR", "profiles"))
+    try:
+        dump_dir.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", profile.page or "no_page").strip("_").lower()
+        file_name = f"{time.strftime('%Y%m%d_%H%M%S')}_{slug}_{total * 1000:.0f}ms.prof"
+        profile.profiler.dump_stats(dump_dir / file_name)
+
+        dumps = sorted(dump_dir.glob("*.prof"), key=lambda path: path.stat().st_mtime)
+        for old in dumps[:-int(os.getenv("PROFILE_MAX_DUMPS", "100"))]:
+            old.unlink(missing_ok=True)
+    except OSError as e:
+        print(f"Failed to write profile dump: {e}")
+
+
+def _bucket_index(value: int) -> int:
+    if value < _SUB_COUNT:
+        return value
+    magnitude = value.bit_length() - _SUB_BITS
+    return magnitude * _HALF_COUNT + (value >> magnitude)
+
+
+def _bucket_upper(index: int) -> int:
+    if index < _SUB_COUNT:
+        return index
+    magnitude = (index - _HALF_COUNT) // _HALF_COUNT
+    sub_bucket = index - magnitude * _HALF_COUNT
+    return ((sub_bucket + 1) << magnitude) - 1
@@ -0,0 +1,329 @@
+"""
+Session-state memory accounting and offload of large values.
+
+Every Streamlit session keeps its own `st.session_state` in the server process, so
+a few sessions holding large results (exports, listings, DataFrames) can exhaust a
+worker's memory. `app.py` wraps each rerun in `track_session_memory()`, which on exit:
+
+1. Estimates the size of every key in the session's state and records a per-session
+   snapshot for the node-wide report shown on the Monitoring page. Built-in mutable
+   containers are re-measured every time (they grow in place); other values are
+   re-measured only when their identity or length changes.
+2. If the session exceeds `SESSION_MEMORY_BUDGET_MB`, moves its largest
+   *offloadable* values out of the process: they are pickled to `SESSION_OFFLOAD_DIR`
+   and only a small placeholder stays in session state. Files are content-addressed
+   and reference-counted, so sessions holding equal values share one file, and the
+   directory is bounded by `SESSION_OFFLOAD_MAX_MB` (over it, values stay in memory).
+3. Forgets sessions idle for `SESSION_IDLE_SECONDS` and deletes the offloaded
+   values only they referenced.
+
+Only keys registered with `mark_offloadable()` are ever moved (widget-bound keys
+must stay in session state), and they must be read through `get_state()`, which
+loads an offloaded value back from disk for the current rerun only:
+
+    mark_offloadable("report_rows")
+    rows = get_state("report_rows", [])
+
+If an offloaded value was evicted, `get_state()` returns the default and
+`is_evicted()` is True, so the page can fetch it again. Values shared by every
+session (e.g. the Auth0 user list) belong in a process-wide cache instead; see
+auth/auth0_management.py and utils/cache.py.
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+# Items measured per container; larger containers are extrapolated from this sample
+_SAMPLE_ITEMS = 100
+_MAX_DEPTH = 8
+_EVICTION_INTERVAL_SECONDS = 60
+# Grow in place under the same id, so a memoized size would go stale
+_MUTABLE_CONTAINERS = (list, dict, set, deque, bytearray)
+
+_lock = threading.Lock()
+_sessions: Dict[str, Dict] = {}  # session_id -> {"sizes", "total", "last_seen", "tokens"}
+_store: Dict[str, "_StoreEntry"] = {}  # token -> offloaded value on disk
+_offloadable: Set[str] = set()
+_last_eviction = 0.0
+
+
+class OffloadedValue:
+    """Placeholder left in session state for a value moved to disk."""
+    __slots__ = ("token", "size")
+
+    def __init__(self, token: str, size: int):
+        self.token = token
+        self.size = size
+
+    def __repr__(self):
+        return f"<offloaded {self.size} bytes>"
+
+
+class _StoreEntry:
+    __slots__ = ("path", "size", "refs")
+
+    def __init__(self, path: Path, size: int):
+        self.path = path
+        self.size = size
+        self.refs = 0
+
+
+def mark_offloadable(*keys: str) -> None:
+    """Allow these session-state keys to be offloaded when a session is over budget."""
+    _offloadable.update(keys)
+
+
+def get_state(key: str, default: Any = None) -> Any:
+    """Return a session-state value, loading it back from disk if it was offloaded."""
+    import streamlit as st
+
+    value = st.session_state.get(key, default)
+    if not isinstance(value, OffloadedValue):
+        return value
+    with _lock:
+        entry = _store.get(value.token)
+    if entry is None:
+        return default  # Evicted
+    try:
+        return pickle.loads(entry.path.read_bytes())
+    except (OSError, pickle.UnpicklingError):
+        return default
+
+
+def is_evicted(key: str) -> bool:
+    """Return True if the key was offloaded and its value has since been evicted."""
+    import streamlit as st
+
+    value = st.session_state.get(key)
+    if not isinstance(value, OffloadedValue):
+        return False
+    with _lock:
+        return value.token not in _store
+
+
+@contextmanager
+def track_session_memory():
+    """Account (and if needed offload) this session's state when the rerun ends."""
+    try:
+        yield
+    finally:
+        try:
+            account_session()
+        except Exception as e:
+            # Accounting must never break a page
+            print(f"Session memory accounting failed: {e}")
+
+
+def account_session(session_id: Optional[str] = None, state=None) -> Dict[str, int]:
+    """Measure a session's state, offload over-budget values and return sizes by key."""
+    if state is None:
+        import streamlit as st
+        state = st.session_state
+    session_id = session_id or _get_session_id()
+    if session_id is None:
+        return {}
+
+    with _lock:
+        record = _sessions.setdefault(session_id, {"sizes": {}, "total": 0, "last_seen": 0.0, "tokens": set()})
+    previous_sizes = record["sizes"]
+
+    sizes, memo, tokens = {}, {}, set()
+    for key in list(state.keys()):
+        value = state[key]
+        if isinstance(value, OffloadedValue):
+            tokens.add(value.token)
+            sizes[key] = 0
+            memo[key] = (id(value), 0)
+            continue
+        identity = _identity(value)
+        cached = previous_sizes.get(key)
+        size = cached[1] if identity is not None and cached and cached[0] == identity else estimate_size(value)
+        sizes[key] = size
+        memo[key] = (identity, size)
+
+    budget = float(os.getenv("SESSION_MEMORY_BUDGET_MB", "50")) * 1024 * 1024
+    min_size = int(os.getenv("SESSION_OFFLOAD_MIN_BYTES", str(256 * 1024)))
+    total = sum(sizes.values())
+    if total > budget:
+        candidates = sorted(
+            (key for key in sizes if key in _offloadable and sizes[key] >= min_size),
+            key=lambda key: sizes[key], reverse=True,
+        )
+        for key in candidates:
+            if total <= budget:
+                break
+            token = _offload(state[key])
+            if token is None:
+                continue  # Not picklable, or the offload directory is full
+            state[key] = OffloadedValue(token, sizes[key])
+            tokens.add(token)
+            total -= sizes[key]
+            sizes[key], memo[key] = 0, (id(state[key]), 0)
+    if total > budget and not record.get("over_budget"):
+        largest = ", ".join(key for key in sorted(sizes, key=sizes.get, reverse=True)[:3])
+        print(f"Session {session_id[:8]} holds {total / 1024 / 1024:.1f} MB of session state "
+              f"(budget {budget / 1024 / 1024:.0f} MB) after offloading; largest keys: {largest}")
+
+    with _lock:
+        # Offloaded values are reference-counted per session, not per key
+        for token in tokens - record["tokens"]:
+            if token in _store:
+                _store[token].refs += 1
+        for token in record["tokens"] - tokens:
+            _release(token)
+        record.update(sizes=memo, total=total, last_seen=time.time(), tokens=tokens, over_budget=total > budget)
+
+    _maybe_evict_idle_sessions()
+    return sizes
+
+
+def get_memory_report(top: int = 10) -> Dict:
+    """Return node-wide session-state totals, the largest sessions and keys, and the offload store size."""
+    with _lock:
+        sessions = {session_id: dict(record) for session_id, record in _sessions.items()}
+        offloaded = [entry.size for entry in _store.values()]
+
+    by_key: Dict[str, int] = {}
+    for record in sessions.values():
+        for key, (_, size) in record["sizes"].items():
+            by_key[key] = by_key.get(key, 0) + size
+    now = time.time()
+    return {
+        "sessions": len(sessions),
+        "session_state_mb": round(sum(r["total"] for r in sessions.values()) / 1024 / 1024, 2),
+        "budget_mb": float(os.getenv("SESSION_MEMORY_BUDGET_MB", "50")),
+        "over_budget_sessions": sum(1 for record in sessions.values() if record.get("over_budget")),
+        "largest_sessions": [
+            {"session": session_id[:8], "mb": round(record["total"] / 1024 / 1024, 2),
+             "idle_s": round(now - record["last_seen"]), "offloaded": len(record["tokens"]),
+             "over_budget": bool(record.get("over_budget"))}
+            for session_id, record in sorted(sessions.items(), key=lambda item: item[1]["total"], reverse=True)[:top]
+        ],
+        "largest_keys_mb": {
+            key: round(size / 1024 / 1024, 2)
+            for key, size in sorted(by_key.items(), key=lambda item: item[1], reverse=True)[:top]
+        },
+        "offloaded": {"values": len(offloaded), "disk_mb": round(sum(offloaded) / 1024 / 1024, 2)},
+    }
+
+
+def evict_idle_sessions(idle_seconds: Optional[float] = None) -> int:
+    """Forget sessions idle for longer than `idle_seconds` and release their offloaded values."""
+    idle_seconds = idle_seconds if idle_seconds is not None else float(os.getenv("SESSION_IDLE_SECONDS", "900"))
+    cutoff = time.time() - idle_seconds
+    with _lock:
+        idle = [session_id for session_id, record in _sessions.items() if record["last_seen"] < cutoff]
+        for session_id in idle:
+            for token in _sessions.pop(session_id)["tokens"]:
+                _release(token)
+    return len(idle)
+
+
+def estimate_size(value: Any) -> int:
+    """Estimate the deep size of a value in bytes (containers are sampled)."""
+    seen: Set[int] = set()
+
+    def size_of(obj, depth: int) -> int:
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+
+        memory_usage = getattr(obj, "memory_usage", None)
+        if callable(memory_usage) and hasattr(obj, "columns"):  # pandas DataFrame
+            try:
+                return int(memory_usage(deep=True).sum())
+            except Exception:
+                pass
+
+        size = sys.getsizeof(obj, 0)
+        if depth >= _MAX_DEPTH or isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+            return size
+        if isinstance(obj, dict):
+            sample = list(islice(obj.items(), _SAMPLE_ITEMS))
+            children = sum(size_of(k, depth + 1) + size_of(v, depth + 1) for k, v in sample)
+            return size + (children * len(obj) // len(sample) if sample else 0)
+        if isinstance(obj, (list, tuple, set, frozenset, deque)):
+            sample = list(islice(obj, _SAMPLE_ITEMS))
+            children = sum(size_of(item, depth + 1) for item in sample)
+            return size + (children * len(obj) // len(sample) if sample else 0)
+        if hasattr(obj, "__dict__"):
+            return size + size_of(vars(obj), depth + 1)
+        return size
+
+    return size_of(value, 0)
+
+
+def _identity(value: Any) -> Optional[tuple]:
+    """Key under which a value's measured size is reused, or None to always re-measure."""
+    if isinstance(value, _MUTABLE_CONTAINERS):
+        return None
+    try:
+        return id(value), len(value)
+    except TypeError:
+        return id(value), None
+
+
+def _offload(value: Any) -> Optional[str]:
+    """Pickle a value to the offload directory (deduplicated by content) and return its token.
+
+    The caller's session takes its reference in `account_session`.
+    """
+    try:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return None
+    token = hashlib.sha256(data).hexdigest()[:32]
+    with _lock:
+        if token in _store:
+            return token
+        if sum(entry.size for entry in _store.values()) + len(data) > \
+                float(os.getenv("SESSION_OFFLOAD_MAX_MB", "1024")) * 1024 * 1024:
+            return None
+        # One directory per process: another worker's files are not ours to delete
+        offload_dir = Path(os.getenv("SESSION_OFFLOAD_DIR", ".session_offload")) / str(os.getpid())
+        path = offload_dir / f"{token}.pkl"
+        try:
+            offload_dir.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+        except OSError as e:
+            print(f"Could not offload session state to {path}: {e}")
+            return None
+        _store[token] = _StoreEntry(path, len(data))
+    return token
+
+
+def _release(token: str) -> None:
+    """Drop one reference to an offloaded value, deleting it with the last one (caller holds the lock)."""
+    entry = _store.get(token)
+    if entry is None:
+        return
+    entry.refs -= 1
+    if entry.refs <= 0:
+        del _store[token]
+        entry.path.unlink(missing_ok=True)
+
+
+def _maybe_evict_idle_sessions() -> None:
+    global _last_eviction
+    now = time.time()
+    if now - _last_eviction >= _EVICTION_INTERVAL_SECONDS:
+        _last_eviction = now
+        evict_idle_sessions()
+
+
+def _get_session_id() -> Optional[str]:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        return ctx.session_id if ctx else None
+    except Exception:
+        return None
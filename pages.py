@@ -3,33 +3,199 @@ Page definitions for the application.
 
 This module contains the single source of truth for all pages in the application.
 Both app.py and the RBAC system import from here.
+
+Pages are discovered from `views/`: every module there (except `_private.py` ones)
+is a page, and declares its metadata in a module-level `PAGE_META` dict literal:
+
+    PAGE_META = {"title": "Reports", "icon": "📊", "order": 20, "roles": ["admin", "users"]}
+
+Keys: `title` (default: from the file name), `icon`, `order` (navigation position,
+then title), `default` (the landing page), and the default access rule: `access`
+("public", "authenticated" or "deny") or `roles`, plus optional admission limits
+`max_concurrent` and `queue_timeout` (see utils/admission.py). Rules saved from the
+admin page take precedence over these defaults.
+
+The metadata is read statically (parsed, never imported), and cached in a manifest
+file (`PAGE_MANIFEST_PATH`, default `.page_manifest.json`) so a process only
+re-parses pages whose modification time or size changed. Importing this module has
+no side effects: the manifest is only rewritten when app.py builds the navigation
+(`get_all_pages(write_manifest=True)`) or by `python pages.py`, which precomputes it
+at build time. Within a process the page list is re-checked at most
+every `PAGE_MANIFEST_CHECK_SECONDS`, so pages added during development show up on
+the next rerun.
 """
 
-# Define all pages in the application
-ALL_PAGES = [
-    {"file": "views/home.py", "title": "Home", "icon": "🏠", "default": True},
-    {"file": "views/state_scenarios.py", "title": "State Scenarios", "icon": "🔁"},
-    {"file": "views/user_admin.py", "title": "User Admin", "icon": "🔐"},
-]
+import ast
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+VIEWS_DIR = "views"
+META_NAME = "PAGE_META"
+DEFAULT_ICON = "📄"
+RULE_KEYS = ("access", "roles", "max_concurrent", "queue_timeout")  # Copied into the page access rules
+MANIFEST_VERSION = 1
+
+_lock = threading.Lock()
+_pages: Optional[List[Dict]] = None
+_checked_at = 0.0
+_unsaved = None  # (path, files) scanned by a call that didn't write the manifest
+
+
+def get_all_pages(write_manifest: bool = False) -> List[Dict]:
+    """
+    Return page definitions ({"file", "title", "icon", "default", ...}) in navigation order.
+
+    With `write_manifest`, new or changed page metadata is saved to the manifest file.
+    """
+    global _pages, _checked_at, _unsaved
+    interval = float(os.getenv("PAGE_MANIFEST_CHECK_SECONDS", "5"))
+    if _pages is not None and time.monotonic() - _checked_at < interval and not (write_manifest and _unsaved):
+        return _pages
+    with _lock:
+        if _pages is None or time.monotonic() - _checked_at >= interval:
+            _pages = build_manifest(write=write_manifest)
+            _checked_at = time.monotonic()
+        elif write_manifest and _unsaved:
+            _write_manifest(*_unsaved)
+            _unsaved = None
+    return _pages
+
+
+def build_manifest(write: bool = True) -> List[Dict]:
+    """Scan `views/`, re-parse new or changed pages and (with `write`) update the manifest file."""
+    global _unsaved
+    manifest_path = Path(os.getenv("PAGE_MANIFEST_PATH", PROJECT_ROOT / ".page_manifest.json"))
+    cached = _read_manifest(manifest_path)
+
+    files, changed = {}, False
+    for entry in sorted(os.scandir(PROJECT_ROOT / VIEWS_DIR), key=lambda e: e.name):
+        if not entry.name.endswith(".py") or entry.name.startswith("_") or not entry.is_file():
+            continue
+        path = f"{VIEWS_DIR}/{entry.name}"
+        stat = entry.stat()
+        record = cached.get(path)
+        if record is None or record["mtime"] != stat.st_mtime or record["size"] != stat.st_size:
+            record = {"mtime": stat.st_mtime, "size": stat.st_size, "meta": read_page_meta(Path(entry.path))}
+            changed = True
+        files[path] = record
+
+    if changed or files.keys() != cached.keys():
+        if write:
+            _write_manifest(manifest_path, files)
+        _unsaved = None if write else (manifest_path, files)
+    else:
+        _unsaved = None
+
+    pages = [_page_definition(path, record["meta"]) for path, record in files.items()]
+    pages.sort(key=lambda page: (page["order"], page["title"]))
+    if pages and not any(page["default"] for page in pages):
+        pages[0]["default"] = True
+    return pages
+
+
+def read_page_meta(path: Path) -> Dict:
+    """Return the `PAGE_META` dict literal of a page module without importing it."""
+    try:
+        tree = ast.parse(path.read_text(encoding="utf-8"), str(path))
+    except (OSError, SyntaxError, ValueError) as e:
+        print(f"Could not read page metadata from {path}: {e}")
+        return {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets, value = [node.target], node.value
+        else:
+            continue
+        if any(isinstance(target, ast.Name) and target.id == META_NAME for target in targets):
+            try:
+                meta = ast.literal_eval(value)
+            except ValueError:
+                print(f"{path}: {META_NAME} must be a literal dict")
+                return {}
+            return meta if isinstance(meta, dict) else {}
+    return {}
 
 
 def get_default_page_access_config():
     """
-    Returns the minimal default page access configuration.
+    Returns the default page access configuration.
 
-    This provides a fallback configuration with minimal access:
+    Each page's rule comes from its declared `access` or `roles` (see the module
+    docstring); pages declaring neither fall back to `default_access`:
     - Home page is public
     - User Admin is admin-only
     - All other pages use the default access level
     """
+    rules = {}
+    for page in get_all_pages():
+        # IMPORTANT: make sure the roles match the ones defined in rbac.py > AVAILABLE_ROLES
+        rule = {}
+        if "roles" in page:
+            rule["roles"] = list(page["roles"])
+        elif "access" in page:
+            rule["access"] = page["access"]
+        for key in ("max_concurrent", "queue_timeout"):
+            if key in page:
+                rule[key] = page[key]
+        if rule:
+            rules[page["file"]] = rule
     return {
         "version": "1.0",
         "default_access": "authenticated",  # Options: "public", "authenticated", "deny"
-        # IMPORTANT: make sure the roles match the ones defined in rbac.py > AVAILABLE_ROLES
-        "pages": {
-            "views/home.py": {"access": "public"},  # Landing page is public
-            "views/state_scenarios.py": {"access": "authenticated"},
-            # "views/other_page.py": {"roles": ["admin", "users"]},
-            "views/user_admin.py": {"roles": ["admin"]},  # Admin only
-        }
-    }
\ No newline at end of file
+        "role_priorities": {"admin": 10},  # Admission queue order for limited pages (see utils/admission.py)
+        "pages": rules,
+    }
+
+
+def _page_definition(path: str, meta: Dict) -> Dict:
+    page = {
+        "file": path,
+        "title": meta.get("title") or Path(path).stem.replace("_", " ").title(),
+        "icon": meta.get("icon", DEFAULT_ICON),
+        "default": bool(meta.get("default", False)),
+        "order": meta.get("order", 100),
+    }
+    for key in RULE_KEYS:
+        if key in meta:
+            page[key] = meta[key]
+    return page
+
+
+def _read_manifest(path: Path) -> Dict[str, Dict]:
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("files", {})
+
+
+def _write_manifest(path: Path, files: Dict[str, Dict]) -> None:
+    try:
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temp_path.write_text(json.dumps({"version": MANIFEST_VERSION, "files": files}, indent=2, ensure_ascii=False),
+                             encoding="utf-8")
+        os.replace(temp_path, path)  # Atomic, so other workers never read a partial file
+    except OSError as e:
+        # Read-only deployments still work; they just re-parse pages on startup
+        print(f"Could not write page manifest {path}: {e}")
+
+
+def __getattr__(name: str):
+    # `ALL_PAGES` is resolved on access rather than at import, which would scan views/
+    if name == "ALL_PAGES":
+        return get_all_pages()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    for page in build_manifest():
+        rule = page.get("roles") or page.get("access", "default")
+        print(f"{page['icon']} {page['title']:<30} {page['file']:<40} {rule}")
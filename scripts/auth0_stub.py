@@ -0,0 +1,255 @@
+"""
+Local stand-in for the Auth0 endpoints this app calls, for load tests and offline development.
+
+Serves an in-memory tenant with generated users:
+- POST /oauth/token (client credentials)
+- GET /api/v2/users (`field:"value"` searches joined by AND, paged), GET/PATCH /api/v2/users/{id}
+- POST /api/v2/users, GET /api/v2/users-by-email
+- POST /dbconnections/change_password, POST /api/v2/tickets/password-change
+- GET /.well-known/openid-configuration, GET /.well-known/jwks.json (OIDC discovery,
+  see auth/oidc_metadata.py; the keys are placeholders, not usable for signing)
+
+Point the app at it with AUTH0_BASE_URL (see auth/auth0_management.py). Responses can
+be slowed down (`--latency-ms`) and a share of them rejected with 429 (`--rate-limit`)
+to see how pages behave against a slow or throttled tenant.
+
+Usage:
+    python scripts/auth0_stub.py [--port 8999] [--users 500] [--latency-ms 50] [--rate-limit 0.05]
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+CONNECTION = "Username-Password-Authentication"
+
+_USER_PATH = re.compile(r"^/api/v2/users/([^/]+)$")
+_PHRASE = r'"(?:[^"\\]|\\.)*"'  # A quoted value, with \" and \\ escapes
+_QUERY_CLAUSE = re.compile(rf'([\w.]+):(\((?:\s*{_PHRASE}\s*(?:OR)?)*\)|{_PHRASE})')
+
+
+class StubTenant:
+    """In-memory users, shared by all request threads."""
+
+    def __init__(self, user_count: int, connection: str = CONNECTION, roles=("admin", "users")):
+        self.lock = threading.Lock()
+        self.connection = connection
+        self.base_url = ""  # Set once the server is bound (start_stub)
+        self.users: Dict[str, Dict] = {}
+        self.signing_keys: List[Dict] = []
+        self.rotate_signing_key()
+        for index in range(user_count):
+            self.add_user(
+                f"user{index}@example.com",
+                app_metadata={"roles": [roles[index % len(roles)]]},
+                email_verified=index % 3 != 0,
+            )
+
+    def add_user(self, email: str, app_metadata: Optional[Dict] = None, email_verified: bool = False) -> Dict:
+        user_id = f"auth0|{uuid.uuid4().hex[:24]}"
+        user = {
+            "user_id": user_id,
+            "email": email,
+            "name": email,
+            "email_verified": email_verified,
+            "app_metadata": app_metadata or {},
+            "last_login": None,
+            "logins_count": 0,
+            "identities": [{"connection": self.connection, "provider": "auth0", "user_id": user_id.split("|")[1]}],
+        }
+        with self.lock:
+            self.users[user_id] = user
+        return user
+
+    def rotate_signing_key(self) -> str:
+        """Publish a new signing key (replacing the previous one) and return its key ID."""
+        kid = uuid.uuid4().hex[:16]
+        modulus = bytearray(os.urandom(256))
+        modulus[0] |= 0x80  # A 2048-bit, odd modulus, so JWK libraries accept the key
+        modulus[-1] |= 1
+        modulus = base64.urlsafe_b64encode(bytes(modulus)).rstrip(b"=").decode("ascii")
+        with self.lock:
+            self.signing_keys = [{"kty": "RSA", "use": "sig", "alg": "RS256", "kid": kid, "n": modulus, "e": "AQAB"}]
+        return kid
+
+
+def make_handler(tenant: StubTenant, latency_ms: float = 0, rate_limit: float = 0):
+    """Build a request handler class bound to a tenant."""
+
+    class Auth0StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def do_PATCH(self):
+            self._handle("PATCH")
+
+        def log_message(self, format, *args):
+            pass  # Load tests make thousands of requests
+
+        def _handle(self, method: str):
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            if rate_limit and random.random() < rate_limit:
+                self._send(429, {"statusCode": 429, "error": "Too Many Requests", "message": "Global limit has been reached"})
+                return
+
+            url = urlparse(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+            status, payload = route(tenant, method, url.path, query, body)
+            self._send(status, payload)
+
+        def _send(self, status: int, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Auth0StubHandler
+
+
+def route(tenant: StubTenant, method: str, path: str, query: Dict, body: Dict) -> Tuple[int, object]:
+    """Return (status, payload) for a request."""
+    if method == "GET" and path == "/.well-known/openid-configuration":
+        base_url = tenant.base_url
+        return 200, {
+            "issuer": f"{base_url}/",
+            "authorization_endpoint": f"{base_url}/authorize",
+            "token_endpoint": f"{base_url}/oauth/token",
+            "userinfo_endpoint": f"{base_url}/userinfo",
+            "jwks_uri": f"{base_url}/.well-known/jwks.json",
+            "response_types_supported": ["code"],
+            "id_token_signing_alg_values_supported": ["RS256"],
+            "code_challenge_methods_supported": ["S256", "plain"],
+        }
+
+    if method == "GET" and path == "/.well-known/jwks.json":
+        with tenant.lock:
+            return 200, {"keys": list(tenant.signing_keys)}
+
+    if method == "POST" and path == "/oauth/token":
+        return 200, {"access_token": f"stub-{uuid.uuid4().hex}", "token_type": "Bearer", "expires_in": 86400}
+
+    if method == "GET" and path == "/api/v2/users":
+        return 200, _list_users(tenant, query)
+
+    if method == "POST" and path == "/api/v2/users":
+        email = body.get("email")
+        with tenant.lock:
+            exists = any(user["email"] == email for user in tenant.users.values())
+        if exists:
+            return 409, {"statusCode": 409, "message": "The user already exists."}
+        return 201, tenant.add_user(email, body.get("app_metadata"), body.get("email_verified", False))
+
+    if method == "GET" and path == "/api/v2/users-by-email":
+        with tenant.lock:
+            return 200, [user for user in tenant.users.values() if user["email"] == query.get("email")]
+
+    if match := _USER_PATH.match(path):
+        with tenant.lock:
+            user = tenant.users.get(unquote(match.group(1)))
+            if user is None:
+                return 404, {"statusCode": 404, "message": "The user does not exist."}
+            if method == "PATCH":
+                for field, value in body.items():
+                    if isinstance(value, dict) and isinstance(user.get(field), dict):
+                        user[field] = {**user[field], **value}
+                    else:
+                        user[field] = value
+            return 200, user
+
+    if method == "POST" and path == "/dbconnections/change_password":
+        return 200, "We've just sent you an email to reset your password."
+
+    if method == "POST" and path == "/api/v2/tickets/password-change":
+        return 201, {"ticket": f"https://stub.invalid/lo/reset?ticket={uuid.uuid4().hex}"}
+
+    return 404, {"statusCode": 404, "message": f"No stub for {method} {path}"}
+
+
+def _list_users(tenant: StubTenant, query: Dict):
+    clauses = _parse_query(query.get("q", ""))
+    with tenant.lock:
+        users: List[Dict] = [user for user in tenant.users.values() if _matches(user, clauses)]
+    per_page = min(int(query.get("per_page", 50)), 100)
+    page = int(query.get("page", 0))
+    batch = users[page * per_page:(page + 1) * per_page]
+    if fields := query.get("fields"):
+        wanted = set(fields.split(","))
+        batch = [{key: value for key, value in user.items() if key in wanted} for user in batch]
+    if query.get("include_totals") == "true":
+        return {"start": page * per_page, "limit": per_page, "length": len(batch), "total": len(users), "users": batch}
+    return batch
+
+
+def _parse_query(q: str) -> List[Tuple[str, set]]:
+    """Parse the subset of user search syntax the app uses: `field:"v"` and `field:("a" OR "b")` joined by AND."""
+    clauses = []
+    for field, values in _QUERY_CLAUSE.findall(q):
+        phrases = re.findall(r'"((?:[^"\\]|\\.)*)"', values)
+        clauses.append((field, {re.sub(r"\\(.)", r"\1", phrase).lower() for phrase in phrases}))
+    return clauses
+
+
+def _matches(user: Dict, clauses: List[Tuple[str, set]]) -> bool:
+    for field, values in clauses:
+        found = [user]
+        for part in field.split("."):
+            found = [
+                item.get(part) for value in found
+                for item in (value if isinstance(value, list) else [value]) if isinstance(item, dict)
+            ]
+        flat = {str(item).lower() for value in found for item in (value if isinstance(value, list) else [value])}
+        if not flat & values:
+            return False
+    return True
+
+
+def start_stub(port: int = 0, users: int = 200, latency_ms: float = 0, rate_limit: float = 0,
+               host: str = "127.0.0.1") -> Tuple[ThreadingHTTPServer, str]:
+    """Serve a stub tenant from a background thread; return the server and its base URL."""
+    tenant = StubTenant(users)
+    server = ThreadingHTTPServer((host, port), make_handler(tenant, latency_ms, rate_limit))
+    server.tenant = tenant
+    tenant.base_url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, name="auth0-stub", daemon=True).start()
+    return server, tenant.base_url
+
+
+def main():
+    """Main script execution."""
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Auth0 API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--users", type=int, default=200, help="Generated users in the tenant")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Added delay per request")
+    parser.add_argument("--rate-limit", type=float, default=0, help="Share of requests answered with 429")
+    args = parser.parse_args()
+
+    server, base_url = start_stub(args.port, args.users, args.latency_ms, args.rate_limit, args.host)
+    print(f"🧪 Auth0 stub with {args.users} users at {base_url}")
+    print(f"   Set AUTH0_BASE_URL={base_url} (and AUTH0_DATABASE_CONNECTION_NAME={CONNECTION})")
+    print(f"   OIDC discovery: {base_url}/.well-known/openid-configuration")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
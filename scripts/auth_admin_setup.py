@@ -1,16 +1,38 @@
 """
 Create the first admin user for the application.
 Run once after initial authentication setup to bootstrap the first admin account.
+
+Batch mode provisions many users non-interactively, and can be re-run safely:
+
+    python scripts/auth_admin_setup.py --file users.csv [--concurrency 8] [--exact] [--dry-run] [--report report.json]
+
+The file is a CSV with `email,roles` columns (roles separated by `;`), or a JSON list
+of {"email": ..., "roles": [...]} objects. Existing users of the connection are looked
+up with server-side searches (a chunk of emails per query, paging fully), the desired
+state is diffed against them, and only the needed creates and role updates are sent,
+at most `--concurrency` at a time. Roles are added to a user's current roles, or
+replaced with `--exact`. A JSON report of every user's action is written to
+`--report` (default: stdout); re-running with the same file changes nothing.
 """
 
+import argparse
+import csv
+import json
 import os
 import sys
 import secrets
-import requests
-from dotenv import load_dotenv
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from auth.auth0_management import auth0_request, get_management_token, search_phrase, search_users
+from utils.env import load_env
 
 # Load environment variables
-load_dotenv(override=True)
+load_env()
 
 # Required environment variables
 AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
@@ -19,6 +41,10 @@ AUTH0_M2M_CLIENT_SECRET = os.getenv("AUTH0_M2M_CLIENT_SECRET")
 AUTH0_DATABASE_CONNECTION_NAME = os.getenv("AUTH0_DATABASE_CONNECTION_NAME")
 STREAMLIT_AUTH_CLIENT_ID = os.getenv("STREAMLIT_AUTH_CLIENT_ID")
 
+# Emails per search query; keeps the query string well under Auth0's length limit
+SEARCH_CHUNK_SIZE = 40
+BATCH_USER_FIELDS = "user_id,email,email_verified,app_metadata"
+
 # Validate environment
 missing = [var for var in ["AUTH0_DOMAIN", "AUTH0_M2M_CLIENT_ID", "AUTH0_M2M_CLIENT_SECRET", "AUTH0_DATABASE_CONNECTION_NAME", "STREAMLIT_AUTH_CLIENT_ID"]
            if not os.getenv(var)]
@@ -29,68 +55,43 @@ if missing:
 
 def get_m2m_token():
     """Fetch M2M access token from Auth0."""
-    response = requests.post(
-        f'https://{AUTH0_DOMAIN}/oauth/token',
-        json={
-            "grant_type": "client_credentials",
-            "client_id": AUTH0_M2M_CLIENT_ID,
-            "client_secret": AUTH0_M2M_CLIENT_SECRET,
-            "audience": f'https://{AUTH0_DOMAIN}/api/v2/'
-        }
-    )
-    response.raise_for_status()
-    return response.json()["access_token"]
+    return get_management_token(AUTH0_DOMAIN, AUTH0_M2M_CLIENT_ID, AUTH0_M2M_CLIENT_SECRET)
 
 
 def get_existing_admins(token):
     """Get list of existing admin emails in the specified database connection."""
-    # Auth0 API doesn't support direct connection filtering, so we need to filter after fetching
-    response = requests.get(
-        f'https://{AUTH0_DOMAIN}/api/v2/users',
-        headers={"Authorization": f"Bearer {token}"},
-        params={"per_page": 100, "fields": "email,app_metadata,identities", "include_fields": "true"}
+    # Server-side search on connection and role, following pagination
+    users, _ = search_users(
+        AUTH0_DOMAIN, token,
+        f'identities.connection:{search_phrase(AUTH0_DATABASE_CONNECTION_NAME)} AND app_metadata.roles:"admin"',
+        fields="email",
     )
-    response.raise_for_status()
-    data = response.json()
-    users = data if isinstance(data, list) else data.get('users', [])
-
-    # Filter users by connection and admin role
-    admin_users = []
-    for user in users:
-        # Check if user has admin role
-        if 'admin' not in user.get('app_metadata', {}).get('roles', []):
-            continue
-
-        # Check if user belongs to our database connection
-        for identity in user.get('identities', []):
-            if identity.get('connection') == AUTH0_DATABASE_CONNECTION_NAME:
-                admin_users.append(user['email'])
-                break
+    return [user['email'] for user in users]
 
-    return admin_users
 
-
-def send_password_email(email):
+def send_password_email(email, verbose=True):
     """Send password setup email."""
-    response = requests.post(
-        f'https://{AUTH0_DOMAIN}/dbconnections/change_password',
+    response = auth0_request(
+        "POST", '/dbconnections/change_password', AUTH0_DOMAIN,
         json={
             "client_id": STREAMLIT_AUTH_CLIENT_ID,
             "email": email,
             "connection": AUTH0_DATABASE_CONNECTION_NAME
         }
     )
-    if response.ok:
-        print(f"📧 Password setup email sent to {email}")
-    else:
-        print(f"⚠️  Could not send password email (status: {response.status_code})")
+    if verbose:
+        if response.ok:
+            print(f"📧 Password setup email sent to {email}")
+        else:
+            print(f"⚠️  Could not send password email (status: {response.status_code})")
+    return response.ok
 
 
 def create_or_update_admin(token, email):
     """Create admin user or update existing user with admin role."""
     # Try to create new user
-    response = requests.post(
-        f'https://{AUTH0_DOMAIN}/api/v2/users',
+    response = auth0_request(
+        "POST", '/api/v2/users', AUTH0_DOMAIN,
         headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
         json={
             "email": email,
@@ -111,22 +112,15 @@ def create_or_update_admin(token, email):
         print(f"User exists, updating with admin role...")
 
         # Get user ID
-        response = requests.get(
-            f'https://{AUTH0_DOMAIN}/api/v2/users-by-email',
-            headers={"Authorization": f"Bearer {token}"},
-            params={"email": email}
-        )
-        response.raise_for_status()
-        users = response.json()
-
+        users = get_users_by_email(token, email)
         if not users:
             print(f"❌ User {email} not found")
             return False
 
         # Update with admin role
         user_id = users[0]['user_id']
-        response = requests.patch(
-            f'https://{AUTH0_DOMAIN}/api/v2/users/{user_id}',
+        response = auth0_request(
+            "PATCH", f'/api/v2/users/{user_id}', AUTH0_DOMAIN,
             headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
             json={"app_metadata": {"roles": ["admin"], "invited": True}}
         )
@@ -146,8 +140,179 @@ def create_or_update_admin(token, email):
     return False
 
 
-def main():
-    """Main script execution."""
+def get_users_by_email(token, email):
+    """Look up users by exact email (unlike search, not subject to indexing delay)."""
+    response = auth0_request(
+        "GET", '/api/v2/users-by-email', AUTH0_DOMAIN,
+        headers={"Authorization": f"Bearer {token}"},
+        params={"email": email, "fields": BATCH_USER_FIELDS + ",identities", "include_fields": "true"}
+    )
+    response.raise_for_status()
+    # The same email can exist in other connections; only ours may be changed
+    return [
+        user for user in response.json()
+        if any(identity.get('connection') == AUTH0_DATABASE_CONNECTION_NAME for identity in user.get('identities', []))
+    ]
+
+
+# ==============================================================================
+# Batch provisioning
+# ==============================================================================
+
+def load_desired_users(path: str) -> Dict[str, List[str]]:
+    """Read `email -> roles` from a CSV (email,roles with `;`-separated roles) or JSON file."""
+    text = Path(path).read_text(encoding="utf-8-sig")
+    if path.lower().endswith(".json"):
+        rows = [(entry["email"], entry.get("roles", [])) for entry in json.loads(text)]
+    else:
+        rows = [
+            (row["email"], [role for role in (row.get("roles") or "").split(";")])
+            for row in csv.DictReader(text.splitlines())
+        ]
+
+    desired: Dict[str, List[str]] = {}
+    for email, roles in rows:
+        email = (email or "").strip().lower()
+        if not email or "@" not in email:
+            raise ValueError(f"Invalid email in {path}: {email!r}")
+        merged = desired.setdefault(email, [])
+        merged.extend(role.strip() for role in roles if role.strip() and role.strip() not in merged)
+    return desired
+
+
+def fetch_existing_users(token, emails: List[str], concurrency: int) -> Dict[str, Dict]:
+    """Return existing users of the connection among `emails`, keyed by lowercase email."""
+    chunks = [emails[i:i + SEARCH_CHUNK_SIZE] for i in range(0, len(emails), SEARCH_CHUNK_SIZE)]
+
+    def search(chunk):
+        # Quoted and escaped: emails may legally contain characters with a meaning in the query syntax
+        emails_clause = " OR ".join(search_phrase(email) for email in chunk)
+        users, _ = search_users(
+            AUTH0_DOMAIN, token,
+            f'identities.connection:{search_phrase(AUTH0_DATABASE_CONNECTION_NAME)} AND email:({emails_clause})',
+            fields=BATCH_USER_FIELDS,
+        )
+        return users
+
+    existing = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for users in executor.map(search, chunks):
+            for user in users:
+                existing[user["email"].lower()] = user
+    return existing
+
+
+def plan_changes(desired: Dict[str, List[str]], existing: Dict[str, Dict], exact: bool) -> List[Dict]:
+    """Diff the desired roles against existing users; one change record per email."""
+    changes = []
+    for email, roles in desired.items():
+        user = existing.get(email)
+        if user is None:
+            changes.append({"email": email, "action": "create", "user_id": None,
+                            "roles_before": None, "roles_after": roles})
+            continue
+        current = user.get("app_metadata", {}).get("roles", [])
+        target = roles if exact else current + [role for role in roles if role not in current]
+        action = "unchanged" if sorted(target) == sorted(current) else "update"
+        changes.append({"email": email, "action": action, "user_id": user["user_id"],
+                        "roles_before": current, "roles_after": target})
+    return changes
+
+
+def apply_change(token, change: Dict, send_email: bool, exact: bool = False) -> Dict:
+    """Apply one planned create or role update; return the change with its outcome."""
+    result = dict(change, status="ok", error=None)
+    try:
+        if change["action"] == "create":
+            response = auth0_request(
+                "POST", '/api/v2/users', AUTH0_DOMAIN,
+                headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+                json={
+                    "email": change["email"],
+                    "connection": AUTH0_DATABASE_CONNECTION_NAME,
+                    "password": secrets.token_urlsafe(48),
+                    "email_verified": False,
+                    "verify_email": False,
+                    "app_metadata": {"invited": True, "roles": change["roles_after"]}
+                }
+            )
+            if response.status_code == 409:
+                # Created since the search index was last updated (e.g. a quick re-run)
+                users = get_users_by_email(token, change["email"])
+                if not users:
+                    response.raise_for_status()
+                replanned = plan_changes({change["email"]: change["roles_after"]},
+                                         {change["email"]: users[0]}, exact)[0]
+                return apply_change(token, replanned, send_email, exact) if replanned["action"] == "update" \
+                    else dict(replanned, status="ok", error=None)
+            response.raise_for_status()
+            result["user_id"] = response.json().get("user_id")
+            if send_email and not send_password_email(change["email"], verbose=False):
+                result["error"] = "created, but the password setup email could not be sent"
+
+        elif change["action"] == "update":
+            response = auth0_request(
+                "PATCH", f'/api/v2/users/{change["user_id"]}', AUTH0_DOMAIN,
+                headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+                json={"app_metadata": {"roles": change["roles_after"]}}
+            )
+            response.raise_for_status()
+    except Exception as e:
+        result.update(status="failed", error=str(e))
+    return result
+
+
+def run_batch(args) -> bool:
+    """Provision the users in `args.file`; write the report and return True if nothing failed."""
+    start = time.perf_counter()
+    desired = load_desired_users(args.file)
+    token = get_m2m_token()
+
+    existing = fetch_existing_users(token, list(desired), args.concurrency)
+    changes = plan_changes(desired, existing, args.exact)
+    pending = [change for change in changes if change["action"] != "unchanged"]
+    _log(f"{len(desired)} users: {len(desired) - len(existing)} to create, "
+         f"{sum(c['action'] == 'update' for c in changes)} to update, "
+         f"{len(changes) - len(pending)} unchanged")
+
+    outcomes = {change["email"]: dict(change, status="ok", error=None) for change in changes}
+    if args.dry_run:
+        for change in pending:
+            outcomes[change["email"]]["status"] = "planned"
+    else:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for result in executor.map(lambda change: apply_change(token, change, not args.no_email, args.exact),
+                                       pending):
+                outcomes[result["email"]] = result
+    results = list(outcomes.values())
+
+    summary = {action: sum(r["action"] == action for r in results) for action in ("create", "update", "unchanged")}
+    summary["failed"] = sum(r["status"] == "failed" for r in results)
+    report = {
+        "connection": AUTH0_DATABASE_CONNECTION_NAME,
+        "dry_run": args.dry_run,
+        "exact": args.exact,
+        "elapsed_seconds": round(time.perf_counter() - start, 2),
+        "summary": summary,
+        "users": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.report and args.report != "-":
+        Path(args.report).write_text(text, encoding="utf-8")
+        _log(f"Report written to {args.report}")
+    else:
+        print(text)
+    _log(("❌" if summary["failed"] else "✅") + f" {summary} in {report['elapsed_seconds']} s")
+    return not summary["failed"]
+
+
+def _log(message: str) -> None:
+    # Progress goes to stderr so a report on stdout stays valid JSON
+    print(message, file=sys.stderr)
+
+
+def run_interactive():
+    """Interactively create (or promote) one admin user."""
     print("🚀 Auth0 Admin User Setup\n")
     print(f"Database Connection: {AUTH0_DATABASE_CONNECTION_NAME}\n")
 
@@ -186,5 +351,28 @@ def main():
         sys.exit(1)
 
 
+def main():
+    """Main script execution."""
+    parser = argparse.ArgumentParser(description="Create admin users, interactively or in batch from a file.")
+    parser.add_argument("--file", help="CSV (email,roles) or JSON file of users to provision; omit for interactive mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum concurrent Auth0 requests")
+    parser.add_argument("--exact", action="store_true", help="Replace users' roles instead of adding to them")
+    parser.add_argument("--dry-run", action="store_true", help="Report the changes without applying them")
+    parser.add_argument("--no-email", action="store_true", help="Don't send password setup emails to created users")
+    parser.add_argument("--report", default="-", help="Where to write the JSON report (default: stdout)")
+    args = parser.parse_args()
+
+    if not args.file:
+        run_interactive()
+        return
+    try:
+        ok = run_batch(args)
+    except Exception as e:
+        _log(f"❌ Batch provisioning failed: {e}")
+        sys.exit(1)
+    if not ok:
+        sys.exit(1)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
+"""
+Generate `.streamlit/secrets.toml` from the STREAMLIT_AUTH_* environment variables.
 
+With `--prefetch-oidc` (or STREAMLIT_AUTH_PREFETCH_METADATA=true) the provider's
+discovery document and JWKS are also downloaded into the OIDC metadata cache, so
+logins don't fetch them from the identity provider (see auth/oidc_metadata.py).
+"""
+
+import argparse
 import os
 import json
+import sys
 import toml
 from pathlib import Path
 from typing import Dict, Any, Optional
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
 SUPPORTED_PROVIDERS = ["auth0", "google", "microsoft"]
 
 def validate_required_env_vars() -> None:
@@ -74,10 +85,29 @@ def write_secrets_file(secrets: Dict[str, Any]) -> None:
     print(f"Using auth provider: {os.getenv('STREAMLIT_AUTH_PROVIDER')}")
     print(f"Using redirect_uri: {secrets['auth']['redirect_uri']}")
 
+def prefetch_provider_metadata(secrets: Dict[str, Any]) -> None:
+    """Download the discovery metadata and JWKS of the configured providers into the cache file."""
+    from auth.oidc_metadata import get_cache_path, prefetch_oidc_metadata
+
+    urls = [section["server_metadata_url"] for section in secrets["auth"].values()
+            if isinstance(section, dict) and section.get("server_metadata_url")]
+    entries = prefetch_oidc_metadata(urls)
+    print(f"✅ Cached OIDC metadata of {len(urls)} provider(s) in {get_cache_path()}")
+    for url in urls:
+        keys = (entries[url].get("jwks") or {}).get("keys", [])
+        print(f"   {url}: {len(keys)} signing key(s)")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate .streamlit/secrets.toml from environment variables.")
+    parser.add_argument("--prefetch-oidc", action="store_true",
+                        default=os.getenv("STREAMLIT_AUTH_PREFETCH_METADATA", "").lower() in ("1", "true", "yes"),
+                        help="Also cache the provider's OIDC discovery metadata and JWKS")
+    args = parser.parse_args()
     try:
         secrets = generate_secrets()
         write_secrets_file(secrets)
+        if args.prefetch_oidc:
+            prefetch_provider_metadata(secrets)
     except Exception as e:
         print(f"❌ Error generating secrets file: {str(e)}")
         exit(1)
\ No newline at end of file
@@ -0,0 +1,319 @@
+"""
+Concurrent-session load test of the app, driven through Streamlit's AppTest.
+
+Runs `--sessions` simulated browser sessions in one process, the way one Streamlit
+server process runs every session's script thread. Each session logs in as a user
+with one of the `--roles` (a mocked `st.user` carrying the roles claim, or
+`anonymous`), then repeatedly walks through app.py: every page of the registry in
+pages.py it may open, plus the scripted interactions in `INTERACTIONS` (button
+clicks, the `state_scenarios` stream, waiting for the admin user list job).
+
+The app runs against a throwaway SQLite database (migrated with db/migrations.py)
+and a local Auth0 stub (scripts/auth0_stub.py), so nothing external is touched.
+
+Reported:
+- rerun latency percentiles per page/step and overall, measured around `AppTest.run()`
+- throughput in reruns per second across all sessions
+- session-state memory per session (from monitoring/session_memory.py) and peak RSS
+- failed steps (exceptions shown by the page, timeouts)
+
+With `--max-p90-ms`, `--min-rps` or `--max-errors` the script exits with status 1
+when a budget is missed, so it can gate performance work in CI.
+
+Usage:
+    python scripts/load_test.py [--sessions 10] [--iterations 5] [--roles admin,users,anonymous]
+                                [--auth0-users 500] [--auth0-latency-ms 50] [--max-p90-ms 800]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# Page-specific interactions run after a page is opened: (step name, action)
+# Actions: ("click", button label), ("wait_job", session_state key holding a job id)
+INTERACTIONS: Dict[str, List[tuple]] = {
+    "views/state_scenarios.py": [
+        ("stream", ("click", "Stream Data")),
+        ("rerun", ("click", "Rerun")),
+    ],
+    "views/user_admin.py": [
+        ("load users", ("wait_job", "auth0_users_job_id")),
+        ("refresh users", ("click", "Refresh Users")),
+        ("reload users", ("wait_job", "auth0_users_job_id")),
+    ],
+}
+
+JOB_POLL_SECONDS = 0.2
+JOB_WAIT_SECONDS = 30
+
+_session = threading.local()  # The simulated user and session id of the current thread
+
+
+def main():
+    """Main script execution."""
+    parser = argparse.ArgumentParser(description="Load test the app with concurrent AppTest sessions.")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent sessions")
+    parser.add_argument("--iterations", type=int, default=3, help="Walks through the app per session")
+    parser.add_argument("--roles", default="admin,users,anonymous",
+                        help="Comma-separated roles assigned to sessions in turn ('anonymous' = logged out)")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds allowed per rerun")
+    parser.add_argument("--auth0-users", type=int, default=200, help="Users in the Auth0 stub tenant")
+    parser.add_argument("--auth0-latency-ms", type=float, default=0, help="Added latency per Auth0 stub request")
+    parser.add_argument("--max-p90-ms", type=float, default=None, help="Fail if the overall p90 rerun latency exceeds this")
+    parser.add_argument("--min-rps", type=float, default=None, help="Fail if throughput is below this many reruns/s")
+    parser.add_argument("--max-errors", type=int, default=None, help="Fail if more steps than this fail")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="load_test_")
+    base_url = _setup_environment(work_dir, args.auth0_users, args.auth0_latency_ms)
+    _install_session_runner()
+
+    from monitoring.profiler import LatencyHistogram
+
+    roles = [role.strip() for role in args.roles.split(",") if role.strip()]
+    print(f"🏋️ {args.sessions} sessions × {args.iterations} iterations (roles: {', '.join(roles)}; Auth0 stub at {base_url})")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions, thread_name_prefix="load-session") as executor:
+        futures = [
+            executor.submit(run_session, index, roles[index % len(roles)], args.iterations, args.timeout)
+            for index in range(args.sessions)
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    by_step: Dict[str, LatencyHistogram] = {}
+    overall = LatencyHistogram()
+    errors = []
+    for result in results:
+        for step, duration_us in result["timings"]:
+            by_step.setdefault(step, LatencyHistogram()).record(duration_us)
+            overall.record(duration_us)
+        errors.extend(result["errors"])
+
+    print(f"\n⏱️  Rerun latency (ms)\n")
+    print(f"{'step':<40} {'count':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    for step in sorted(by_step):
+        _print_row(step, by_step[step].summary())
+    _print_row("all reruns", overall.summary())
+
+    throughput = overall.total / elapsed if elapsed else 0.0
+    print(f"\n🚀 Throughput: {throughput:.1f} reruns/s ({overall.total} reruns in {elapsed:.1f} s)")
+    _print_memory([result["state_bytes"] for result in results])
+    _print_admission()
+    _print_cache()
+
+    if errors:
+        print(f"\n❌ {len(errors)} failed step(s):")
+        for error in errors[:10]:
+            print(f"  └ {error}")
+
+    over_budget = []
+    if args.max_p90_ms is not None and overall.percentile(90) / 1000 > args.max_p90_ms:
+        over_budget.append(f"p90 {overall.percentile(90) / 1000:.0f} ms > {args.max_p90_ms:.0f} ms")
+    if args.min_rps is not None and throughput < args.min_rps:
+        over_budget.append(f"throughput {throughput:.1f} < {args.min_rps} reruns/s")
+    if args.max_errors is not None and len(errors) > args.max_errors:
+        over_budget.append(f"{len(errors)} errors > {args.max_errors}")
+    if over_budget:
+        print(f"\n❌ Over budget: {'; '.join(over_budget)}")
+        sys.exit(1)
+
+
+def run_session(index: int, role: str, iterations: int, timeout: float) -> Dict:
+    """Drive one simulated session and return its step timings and errors."""
+    from streamlit.testing.v1 import AppTest
+    from auth.auth import User, _get_roles_claim_namespace
+    from auth.rbac import filter_pages_by_access
+    from monitoring.session_memory import estimate_size
+    from pages import get_all_pages
+
+    _session.id = f"load-test-{index}"
+    _session.user_info = {"is_logged_in": False} if role == "anonymous" else {
+        "is_logged_in": True,
+        "email": f"load{index}@example.com",
+        "email_verified": True,
+        _get_roles_claim_namespace(): [role],
+    }
+    # The pages this user's navigation offers, per the app's own access rules
+    user = User(_session.user_info["email"], True, _session.user_info) if role != "anonymous" else None
+    pages = filter_pages_by_access(get_all_pages(), user)
+    timings, errors = [], []
+
+    def step(name: str, action: Callable[[], None]) -> None:
+        start = time.perf_counter()
+        try:
+            action()
+        except Exception as e:
+            errors.append(f"session {index} ({role}) {name}: {type(e).__name__}: {e}")
+            return
+        timings.append((name, int((time.perf_counter() - start) * 1_000_000)))
+        if at.exception:
+            errors.append(f"session {index} ({role}) {name}: {at.exception[0].value}")
+
+    at = AppTest.from_file(str(PROJECT_ROOT / "app.py"), default_timeout=timeout)
+    step("app.py", at.run)
+    for _ in range(iterations):
+        for page in pages:
+            step(f"{page['file']}", lambda: at.switch_page(page["file"]).run())
+            for name, (kind, target) in INTERACTIONS.get(page["file"], []):
+                if kind == "click":
+                    step(f"{page['file']} · {name}", lambda: _click(at, target))
+                elif kind == "wait_job":
+                    step(f"{page['file']} · {name}", lambda: _wait_job(at, target))
+
+    state_bytes = estimate_size(at.session_state.filtered_state)
+    return {"timings": timings, "errors": errors, "state_bytes": state_bytes}
+
+
+def _click(at, label: str) -> None:
+    button = next((button for button in at.button if button.label == label), None)
+    if button is None:
+        raise LookupError(f"No button labelled {label!r}")
+    button.click().run()
+
+
+def _wait_job(at, key: str) -> None:
+    """Rerun until the background job stored under `key` has finished (fragments don't auto-run in AppTest)."""
+    deadline = time.monotonic() + JOB_WAIT_SECONDS
+    while key in at.session_state and at.session_state[key]:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Job in {key} still running after {JOB_WAIT_SECONDS} s")
+        time.sleep(JOB_POLL_SECONDS)
+        at.run()
+
+
+# ==============================================================================
+# Setup
+# ==============================================================================
+
+def _setup_environment(work_dir: str, auth0_users: int, auth0_latency_ms: float) -> str:
+    """Point the app at a throwaway SQLite database and a local Auth0 stub."""
+    from utils.env import load_env
+    from scripts.auth0_stub import CONNECTION, start_stub
+
+    # Load .env first, so it doesn't override the settings below on the app's next load_env()
+    load_env()
+
+    _, base_url = start_stub(users=auth0_users, latency_ms=auth0_latency_ms)
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{Path(work_dir) / 'load_test.db'}",
+        "DATABASE_REPLICA_URLS": "",
+        "AUTH0_BASE_URL": base_url,
+        "AUTH0_DOMAIN": "stub.auth0.local",
+        "AUTH0_M2M_CLIENT_ID": "load-test",
+        "AUTH0_M2M_CLIENT_SECRET": "load-test",
+        "AUTH0_DATABASE_CONNECTION_NAME": CONNECTION,
+        "STREAMLIT_AUTH_CLIENT_ID": "load-test",
+        "PROFILE_SAMPLE_RATE": "0",
+        "SESSION_OFFLOAD_DIR": str(Path(work_dir) / "session_offload"),
+    })
+
+    from db import migrations
+    migrations.upgrade(backup=False, throttle=0)
+    return base_url
+
+
+def _install_session_runner() -> None:
+    """Let AppTest sessions run concurrently, each with its own user and session id.
+
+    AppTest is built for one app at a time: every run installs (and afterwards clears)
+    a global mock Runtime, compiles the scripts into a fresh cache and uses the same
+    session id and user for every script run. Give all sessions one shared mock Runtime
+    and script cache instead, like the real server, and let each thread's runner take
+    its session's id and `st.user` from `_session`.
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    config.set_option("global.appTest", True)
+    # Session threads call into the app (RBAC) outside a script run; that's expected here
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+    # One cache also serializes compilation (concurrent ast.parse calls can fail on 3.11)
+    script_cache = ScriptCache()
+
+    class _PerSessionRuntime(Runtime):
+        """Absorbs AppTest's per-run `Runtime._instance` assignments."""
+
+    class SessionScriptRunner(LocalScriptRunner):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._session_id = getattr(_session, "id", self._session_id)
+            self._user_info = dict(getattr(_session, "user_info", self._user_info))
+
+    app_test.Runtime = _PerSessionRuntime
+    app_test.LocalScriptRunner = SessionScriptRunner
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+
+# ==============================================================================
+# Reporting
+# ==============================================================================
+
+def _print_row(step: str, summary: Dict) -> None:
+    print(f"{step:<40} {summary['count']:>6} {summary['p50_ms']:>8.1f} {summary['p90_ms']:>8.1f} "
+          f"{summary['p99_ms']:>8.1f} {summary['max_ms']:>8.1f}")
+
+
+def _print_memory(state_bytes: List[int]) -> None:
+    """Print session-state size per session (at the end of its run) and the process peak RSS."""
+    if state_bytes:
+        print(f"🧠 Session state: {sum(state_bytes) / len(state_bytes) / 1024:.1f} KB/session on average, "
+              f"{max(state_bytes) / 1024:.1f} KB max")
+    if rss_mb := _peak_rss_mb():
+        print(f"   Peak process RSS: {rss_mb:.0f} MB ({rss_mb / max(len(state_bytes), 1):.1f} MB/session incl. shared)")
+
+
+def _print_admission() -> None:
+    """Print how concurrency-limited pages held up (see utils/admission.py)."""
+    from utils.admission import get_admission_stats
+
+    for stats in get_admission_stats():
+        print(f"🚦 {stats['page']}: limit {stats['limit']}, longest queue {stats['peak_queued']}, "
+              f"{stats['rejected']} rerun(s) turned away as busy")
+
+
+def _print_cache() -> None:
+    """Print the shared cache's hit rates (see utils/cache.py)."""
+    from utils.cache import get_cache_stats
+
+    for stats in get_cache_stats():
+        if stats["hit_rate"] is not None:
+            print(f"🗃️  cache {stats['namespace']}: {stats['hit_rate']:.0%} hits "
+                  f"({stats['hits'] + stats['disk_hits']}/{stats['hits'] + stats['disk_hits'] + stats['misses']}), "
+                  f"{stats['loads']} load(s), {stats['evictions']} eviction(s)")
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource  # Not available on Windows
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Measure cold-start import time of the app's modules and time to first render.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, so the
+numbers reflect what a newly started (autoscaled) worker pays on boot. Time to first
+render runs `app.py` once with Streamlit's AppTest in a fresh interpreter, which
+covers the app's imports plus its first script run (not the Streamlit server boot).
+
+With `--max-import-ms` / `--max-render-ms` (or STARTUP_BUDGET_IMPORT_MS /
+STARTUP_BUDGET_RENDER_MS) the script exits with status 1 when a median exceeds its
+budget, so it can guard against regressions in CI.
+
+Usage:
+    python scripts/startup_benchmark.py [module ...] [--runs 5] [--max-import-ms 300] [--max-render-ms 1500]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = ["pages", "auth.auth", "auth.rbac", "db.models", "db.instrumentation", "monitoring.profiler"]
+
+# Run in a fresh interpreter; the clock starts after the test harness itself is imported
+_FIRST_RENDER_SCRIPT = """
+import json, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=120)
+at.run()
+print(json.dumps({"ms": (time.perf_counter() - start) * 1000, "exceptions": len(at.exception)}))
+"""
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def main():
+    """Main script execution."""
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of app modules.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--top", type=int, default=5, help="Slowest dependencies to list per module")
+    parser.add_argument("--max-import-ms", type=float, default=_env_float("STARTUP_BUDGET_IMPORT_MS"),
+                        help="Fail if any module's median import time exceeds this")
+    parser.add_argument("--max-render-ms", type=float, default=_env_float("STARTUP_BUDGET_RENDER_MS"),
+                        help="Fail if the median time to first render exceeds this")
+    parser.add_argument("--skip-render", action="store_true", help="Only measure import times")
+    args = parser.parse_args()
+
+    # Modules the bare interpreter already imports (site, encodings, ...) are not ours
+    baseline = set(measure_import_time("sys"))
+
+    over_budget = []
+    print(f"⏱️  Import time over {args.runs} cold runs (median)\n")
+    for module in args.modules:
+        median_ms = report_import_time(module, args.runs, args.top, baseline)
+        if median_ms is None or (args.max_import_ms is not None and median_ms > args.max_import_ms):
+            over_budget.append(module)
+
+    if not args.skip_render:
+        render_ms = report_first_render(args.runs)
+        if render_ms is None or (args.max_render_ms is not None and render_ms > args.max_render_ms):
+            over_budget.append("first render")
+
+    if over_budget:
+        print(f"\n❌ Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+def report_import_time(module: str, runs: int, top: int, baseline: set):
+    """Print the median cumulative import time of a module and its slowest dependencies.
+
+    Returns the median in milliseconds, or None if the import failed.
+    """
+    totals = []
+    last_timings = {}
+    for _ in range(runs):
+        timings = measure_import_time(module)
+        if module not in timings:
+            print(f"❌ {module}: import failed")
+            return None
+        totals.append(timings[module])
+        last_timings = timings
+
+    median_ms = statistics.median(totals) / 1000
+    print(f"{module:<20} {median_ms:8.1f} ms")
+    dependencies = sorted(
+        ((name, us) for name, us in last_timings.items() if name != module and "." not in name and name not in baseline),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    for name, us in dependencies[:top]:
+        print(f"  └ {name:<28} {us / 1000:8.1f} ms")
+    return median_ms
+
+
+def report_first_render(runs: int):
+    """Print the median time for a cold interpreter to run app.py once; return it in ms."""
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", _FIRST_RENDER_SCRIPT],
+            cwd=PROJECT_ROOT,
+            env={**os.environ, "PYTHONPATH": str(PROJECT_ROOT)},
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            print(f"\n❌ First render failed:\n{result.stderr[-2000:]}")
+            return None
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    median_ms = statistics.median(sample["ms"] for sample in samples)
+    print(f"\n{'first render (app.py)':<20} {median_ms:8.1f} ms")
+    if exceptions := samples[-1]["exceptions"]:
+        print(f"  ⚠️ app.py raised {exceptions} exception(s) under AppTest (e.g. no logged-in st.user)")
+    return median_ms
+
+
+def measure_import_time(module: str) -> dict:
+    """Import a module in a fresh interpreter and return cumulative import times in µs."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        env={**os.environ, "PYTHONPATH": str(PROJECT_ROOT)},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return {}
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if match := _IMPORTTIME_LINE.match(line):
+            timings[match.group(4)] = int(match.group(2))
+    return timings
+
+
+def _env_float(name: str):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Shared fixtures. Run the tests from the project root with `python -m pytest`.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# The schema created by the original db/models.py, before any migration
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    auth0_user_id VARCHAR(255) NOT NULL UNIQUE,
+    roles JSON NOT NULL DEFAULT '[]',
+    user_preferences JSON,
+    created_at DATETIME,
+    updated_at DATETIME
+);
+CREATE TABLE app_settings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key VARCHAR(100) NOT NULL,
+    value VARCHAR(1000) NOT NULL,
+    description VARCHAR(500),
+    created_at DATETIME,
+    updated_at DATETIME
+);
+CREATE UNIQUE INDEX idx_app_settings_key ON app_settings (key);
+INSERT INTO users (email, auth0_user_id, roles, user_preferences, created_at) VALUES
+    ('ada@example.com', 'auth0|1', '["admin"]', '{"theme": "dark"}', '2025-01-02 03:04:05'),
+    ('bob@example.com', 'auth0|2', '["users"]', NULL, '2025-01-02 03:04:05');
+INSERT INTO app_settings (key, value, description) VALUES ('page_access', '{"pages": {}}', 'Page access');
+"""
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """Point db.models at an empty SQLite file and return its engine."""
+    from db import models
+
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    monkeypatch.setenv("DATABASE_URL", url)
+    monkeypatch.setattr(models, "DB_URL", url)
+    monkeypatch.setattr(models, "_engine", None)
+    monkeypatch.setattr(models, "_session_factory", None)
+    engine = models.get_engine()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def baseline_db(sqlite_db):
+    """An SQLite database with the pre-migration schema and a few rows."""
+    with sqlite_db.begin() as conn:
+        for statement in BASELINE_SCHEMA.split(";"):
+            if statement.strip():
+                conn.execute(text(statement))
+    return sqlite_db
@@ -0,0 +1,79 @@
+import threading
+import time
+
+from utils import admission
+
+
+def _in_thread(fn):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    return thread, result
+
+
+def _queued(page):
+    return next(stats["queued"] for stats in admission.get_admission_stats() if stats["page"] == page)
+
+
+def _wait_for_queue(page, length):
+    deadline = time.monotonic() + 5
+    while _queued(page) < length:
+        assert time.monotonic() < deadline, "waiter never queued"
+        time.sleep(0.005)
+
+
+def test_acquire_holds_one_slot_per_thread_until_released():
+    """A rerun holds one slot however often it acquires; other threads get it after release_held()."""
+    page = "test/acquire"
+    assert admission.acquire(page, 1) and admission.acquire(page, 1)
+
+    thread, result = _in_thread(lambda: admission.acquire(page, 1, timeout=0))
+    thread.join()
+    assert result == [False]
+
+    def acquire_and_release():
+        admitted = admission.acquire(page, 1, timeout=0)
+        admission.release_held()
+        return admitted
+
+    admission.release_held()
+    thread, result = _in_thread(acquire_and_release)
+    thread.join()
+    assert result == [True]
+
+
+def test_queue_timeout_rejects():
+    """A rerun that gets no slot within its queue timeout is rejected and counted."""
+    page = "test/timeout"
+    assert admission.acquire(page, 1)
+    try:
+        thread, result = _in_thread(lambda: admission.acquire(page, 1, timeout=0.05))
+        thread.join()
+    finally:
+        admission.release_held()
+    stats = next(stats for stats in admission.get_admission_stats() if stats["page"] == page)
+    assert result == [False] and stats["rejected"] == 1 and stats["queued"] == 0
+
+
+def test_freed_slots_go_to_the_highest_priority_waiter():
+    """The higher-priority waiter is admitted first even though it queued last."""
+    page = "test/priority"
+    admitted = []
+
+    def wait_for_slot(name, priority):
+        assert admission.acquire(page, 1, priority=priority, timeout=5)
+        admitted.append(name)
+        admission.release_held()
+
+    assert admission.acquire(page, 1)
+    low = threading.Thread(target=wait_for_slot, args=("low", 0))
+    low.start()
+    _wait_for_queue(page, 1)
+    high = threading.Thread(target=wait_for_slot, args=("high", 10))
+    high.start()
+    _wait_for_queue(page, 2)
+
+    admission.release_held()
+    low.join()
+    high.join()
+    assert admitted == ["high", "low"]
@@ -0,0 +1,26 @@
+from sqlalchemy import text
+
+from db.backup import backup_db, restore_db
+
+
+def _dump(engine):
+    with engine.connect() as conn:
+        return {
+            "users": conn.execute(text(
+                "SELECT id, email, auth0_user_id, roles, user_preferences, datetime(created_at) FROM users ORDER BY id"
+            )).all(),
+            "app_settings": conn.execute(text("SELECT id, key, value, description FROM app_settings ORDER BY id")).all(),
+        }
+
+
+def test_backup_restore_round_trip_on_baseline_schema(baseline_db, tmp_path):
+    """A backup of a not yet migrated database restores exactly the rows it was taken from."""
+    before = _dump(baseline_db)
+    path = backup_db(tmp_path / "backups", workers=2)
+
+    with baseline_db.begin() as conn:
+        conn.execute(text("DELETE FROM users WHERE id = 2"))
+        conn.execute(text("UPDATE app_settings SET value = '{}'"))
+
+    assert restore_db(path) == {"users": 2, "app_settings": 1}
+    assert _dump(baseline_db) == before
@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+from utils import cache
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _invalidate_in_other_process(tag, env):
+    subprocess.run(
+        [sys.executable, "-c", f"from utils.cache import invalidate_tag; invalidate_tag({tag!r})"],
+        cwd=PROJECT_ROOT, env=env, check=True,
+    )
+
+
+def test_tag_invalidation_reaches_other_processes(tmp_path, monkeypatch):
+    """Invalidating a tag in another worker process makes this process's tagged entries misses."""
+    monkeypatch.setenv("CACHE_DISK_PATH", str(tmp_path / "cache.db"))
+    monkeypatch.setenv("CACHE_TAG_CHECK_SECONDS", "0")
+    monkeypatch.setattr(cache, "_disk_failed", False)
+    settings = cache.get_cache("test_settings", disk=True)
+
+    cache.invalidate_tag("test_tag")  # This process bumps first, then another one does
+    settings.set("config", "old", tags=["test_tag"])
+    assert settings.get("config") == "old"
+
+    _invalidate_in_other_process("test_tag", dict(os.environ))
+    assert settings.get("config") is None
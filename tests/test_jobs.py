@@ -0,0 +1,36 @@
+import threading
+import time
+
+from utils.jobs import FAILED, SUCCEEDED, get_job, submit_job
+
+
+def _wait(job):
+    for _ in range(500):
+        if job.done:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job.name} did not finish")
+
+
+def test_submitting_a_running_key_returns_that_job():
+    """A second submit with the same key returns the running job; after it finishes a new one starts."""
+    release = threading.Event()
+    first = submit_job("test slow", lambda job: release.wait(5) and "first", key="test:dedupe")
+    second = submit_job("test slow again", lambda job: "second", key="test:dedupe")
+    assert second is first
+
+    release.set()
+    assert _wait(first).status == SUCCEEDED and first.result == "first"
+    third = submit_job("test slow", lambda job: "third", key="test:dedupe")
+    assert third is not first and _wait(third).result == "third"
+
+
+def test_job_errors_and_progress_are_recorded():
+    """A failing job records its error; progress reports are clamped fractions."""
+    def failing(job):
+        job.report(5, 4, message="almost")
+        raise RuntimeError("listing failed")
+
+    job = _wait(submit_job("test failing", failing))
+    assert get_job(job.id) is job
+    assert (job.status, job.error, job.progress, job.message) == (FAILED, "listing failed", 1.0, "almost")
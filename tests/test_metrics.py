@@ -0,0 +1,37 @@
+import json
+import os
+import subprocess
+import sys
+
+from monitoring import metrics
+
+
+def _write_worker_file(directory, pid, families):
+    payload = {
+        name: {"type": kind, "help": name, "samples": [[name, [], value]]}
+        for name, (kind, value) in families.items()
+    }
+    (directory / f"{pid}.json").write_text(json.dumps(payload))
+
+
+def test_multiprocess_merge_skips_exited_workers(tmp_path, monkeypatch):
+    """Counters sum over live workers, gauges are reported per worker, and exited workers drop out."""
+    monkeypatch.setenv("METRICS_MULTIPROC_DIR", str(tmp_path))
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    live = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        _write_worker_file(tmp_path, exited.pid, {"requests_total": ("counter", 5), "pool_in_use": ("gauge", 9)})
+        _write_worker_file(tmp_path, live.pid, {"requests_total": ("counter", 2), "pool_in_use": ("gauge", 1)})
+        _write_worker_file(tmp_path, os.getpid(), {"requests_total": ("counter", 3), "pool_in_use": ("gauge", 4)})
+
+        families = metrics._read_process_files()
+    finally:
+        live.kill()
+        live.wait()
+
+    assert families["requests_total"]["samples"][("requests_total", ())] == 5
+    assert families["pool_in_use"]["samples"] == {
+        ("pool_in_use", (("pid", str(live.pid)),)): 1,
+        ("pool_in_use", (("pid", str(os.getpid())),)): 4,
+    }
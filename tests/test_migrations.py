@@ -0,0 +1,20 @@
+from pathlib import Path
+
+from sqlalchemy import text
+
+from db.migrations import upgrade
+
+
+def test_upgrade_from_baseline_schema(baseline_db, tmp_path, monkeypatch):
+    """A database created by the original models upgrades through migrations 1-3, backup included."""
+    monkeypatch.chdir(tmp_path)  # The pre-migration backup goes to ./migration_backups
+
+    assert upgrade(target=3, throttle=0) == [1, 2, 3]
+    assert len(list(Path("migration_backups").iterdir())) == 1
+
+    with baseline_db.connect() as conn:
+        settings = conn.execute(text("SELECT key, encoding, version FROM app_settings")).all()
+        roles = conn.execute(text("SELECT user_id, role FROM user_roles ORDER BY user_id")).all()
+    assert settings == [("page_access", "json", 1)]
+    assert roles == [(1, "admin"), (2, "users")]
+    assert upgrade(target=3) == []
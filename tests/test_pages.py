@@ -0,0 +1,38 @@
+import json
+import os
+
+import pages
+
+
+def test_read_page_meta_parses_the_literal_without_importing(tmp_path):
+    """PAGE_META is read from the source; the module's code never runs."""
+    page = tmp_path / "reports.py"
+    page.write_text('raise SystemExit("imported")\nPAGE_META = {"title": "Reports", "roles": ["admin"]}\n')
+    assert pages.read_page_meta(page) == {"title": "Reports", "roles": ["admin"]}
+
+    page.write_text("PAGE_META = dict(title=compute())\n")
+    assert pages.read_page_meta(page) == {}
+
+
+def test_manifest_is_rebuilt_when_a_view_changes(tmp_path, monkeypatch):
+    """New and edited views are picked up on the next build; the manifest file is written only when asked."""
+    views = tmp_path / pages.VIEWS_DIR
+    views.mkdir()
+    (views / "home.py").write_text('PAGE_META = {"title": "Home", "order": 0}\n')
+    (views / "_helpers.py").write_text("")
+    manifest = tmp_path / "manifest.json"
+    monkeypatch.setattr(pages, "PROJECT_ROOT", tmp_path)
+    monkeypatch.setenv("PAGE_MANIFEST_PATH", str(manifest))
+
+    assert [page["title"] for page in pages.build_manifest(write=False)] == ["Home"]
+    assert not manifest.exists()
+    pages.build_manifest()
+    assert list(json.loads(manifest.read_text())["files"]) == ["views/home.py"]
+
+    report = views / "reports.py"
+    report.write_text('PAGE_META = {"title": "Reports", "order": 10}\n')
+    (views / "home.py").write_text('PAGE_META = {"title": "Start", "order": 20}\n')
+    os.utime(views / "home.py", (0, 1))  # A different mtime even on coarse-grained filesystems
+
+    assert [page["title"] for page in pages.build_manifest()] == ["Reports", "Start"]
+    assert set(json.loads(manifest.read_text())["files"]) == {"views/home.py", "views/reports.py"}
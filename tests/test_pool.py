@@ -0,0 +1,23 @@
+import threading
+
+from sqlalchemy import create_engine
+
+from db.pool import InstrumentedQueuePool, get_pool_stats
+
+
+def test_only_checkouts_that_block_count_as_waits(tmp_path):
+    """Opening connections below capacity is not a wait; blocking on an exhausted pool is."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool,
+                           pool_size=1, max_overflow=1, pool_timeout=5, pool_logging_name="test_waits")
+    try:
+        first, second = engine.connect(), engine.connect()  # Both opened new connections
+        assert get_pool_stats()["test_waits"]["waits"] == 0
+
+        threading.Timer(0.1, first.close).start()
+        engine.connect().close()  # Blocks until the timer returns a connection
+        second.close()
+
+        stats = get_pool_stats()["test_waits"]
+        assert stats["checkouts"] == 3 and stats["waits"] == 1 and stats["wait_seconds_total"] >= 0.05
+    finally:
+        engine.dispose()
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import text
+
+from db import preferences
+from db.migrations import upgrade
+
+
+@pytest.fixture
+def preferences_db(sqlite_db, monkeypatch):
+    """A migrated SQLite database, with background flushing effectively off (tests flush explicitly)."""
+    monkeypatch.setenv("PREFERENCES_FLUSH_DELAY_SECONDS", "3600")
+    monkeypatch.setenv("PREFERENCES_FLUSH_MAX_DELAY_SECONDS", "3600")
+    upgrade(backup=False, throttle=0)
+    return sqlite_db
+
+
+@pytest.mark.parametrize("upsert_dialects", [preferences.UPSERT_DIALECTS, ()], ids=["upsert", "read-merge-write"])
+def test_changes_merge_into_stored_preferences(preferences_db, monkeypatch, upsert_dialects):
+    """Flushed changes replace top-level keys, delete keys set to None and keep the others."""
+    monkeypatch.setattr(preferences, "UPSERT_DIALECTS", upsert_dialects)
+    preferences.queue_preferences("auth0|merge", "merge@example.com", {"theme": "dark", "layout": {"a": 1}, "lang": "en"})
+    assert preferences.flush_preferences() == 1
+    preferences.queue_preferences("auth0|merge", "merge@example.com", {"layout": {"b": 2}, "theme": None})
+    assert preferences.flush_preferences() == 1
+
+    assert preferences.load_preferences("auth0|merge") == {"layout": {"b": 2}, "lang": "en"}
+
+
+def test_conflicting_changes_are_kept(preferences_db):
+    """Changes rejected by a constraint stay visible and are retried with the user's next change."""
+    with preferences_db.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO users (email, auth0_user_id, roles) VALUES ('taken@example.com', 'auth0|old', '[]')"
+        ))
+    preferences.queue_preferences("auth0|new", "taken@example.com", {"theme": "dark"})
+    assert preferences.flush_preferences() == 0
+    assert preferences.load_preferences("auth0|new") == {"theme": "dark"}
+
+    with preferences_db.begin() as conn:
+        conn.execute(text("UPDATE users SET email = 'moved@example.com' WHERE auth0_user_id = 'auth0|old'"))
+    preferences.queue_preferences("auth0|new", "taken@example.com", {"lang": "en"})
+    assert preferences.flush_preferences() == 1
+    assert "auth0|new" not in preferences._conflicts
+    assert preferences.load_preferences("auth0|new") == {"theme": "dark", "lang": "en"}
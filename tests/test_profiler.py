@@ -0,0 +1,27 @@
+import random
+
+from monitoring.profiler import _HALF_COUNT, _SUB_COUNT, LatencyHistogram, _bucket_index, _bucket_upper
+
+
+def test_bucket_bounds_hold_every_value_within_the_relative_error():
+    """Each value falls in the bucket whose bounds enclose it, at most 1/_HALF_COUNT above it."""
+    values = list(range(4 * _SUB_COUNT)) + [random.Random(0).randrange(1, 10**12) for _ in range(2000)]
+    for value in values:
+        index = _bucket_index(value)
+        assert (_bucket_upper(index - 1) if index else -1) < value <= _bucket_upper(index)
+        assert _bucket_upper(index) - value <= value // _HALF_COUNT
+
+
+def test_bucket_index_round_trips_through_upper_bounds():
+    """A bucket's upper bound maps back to it, and the next value starts the next bucket."""
+    for index in range(20 * _SUB_COUNT):
+        assert _bucket_index(_bucket_upper(index)) == index
+        assert _bucket_index(_bucket_upper(index) + 1) == index + 1
+
+
+def test_percentiles_are_exact_for_small_values():
+    """Values below _SUB_COUNT microseconds are recorded exactly."""
+    histogram = LatencyHistogram()
+    for value in range(1, 101):
+        histogram.record(value)
+    assert histogram.percentile(50) == 50 and histogram.percentile(99) == 99
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+from auth import rbac
+from db import models
+from db.migrations import upgrade
+from utils import cache
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAVE_IN_OTHER_PROCESS = """
+from auth.rbac import load_page_access_config, save_page_access_config
+config = dict(load_page_access_config())
+config["pages"] = {**config["pages"], "views/home.py": {"roles": ["admin"]}}
+assert save_page_access_config(config)
+"""
+
+
+def test_saved_page_access_reaches_other_processes(sqlite_db, tmp_path, monkeypatch):
+    """A page-access change saved by another worker applies here within CACHE_TAG_CHECK_SECONDS."""
+    monkeypatch.setenv("CACHE_DISK_PATH", str(tmp_path / "cache.db"))
+    monkeypatch.setenv("CACHE_TAG_CHECK_SECONDS", "0")
+    monkeypatch.setenv("RBAC_CONFIG_CACHE_TTL", "3600")
+    monkeypatch.setenv("APP_SETTINGS_CACHE_TTL", "3600")
+    monkeypatch.setattr(cache, "_disk_failed", False)
+    upgrade(backup=False, throttle=0)
+    rbac.save_page_access_config({"version": "1.0", "default_access": "authenticated", "pages": {}})
+    assert rbac.load_page_access_config()["pages"]["views/home.py"] == {"access": "public"}  # Declared default
+
+    subprocess.run([sys.executable, "-c", SAVE_IN_OTHER_PROCESS], cwd=PROJECT_ROOT, env=dict(os.environ), check=True)
+
+    assert rbac.load_page_access_config()["pages"]["views/home.py"] == {"roles": ["admin"]}
+
+
+def test_database_check_follows_db_models(monkeypatch):
+    """RBAC sees a database exactly when db.models has a URL, whatever the environment says."""
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///unused.db")
+    monkeypatch.setattr(models, "DB_URL", None)
+    assert not rbac._has_database()
+    monkeypatch.setattr(models, "DB_URL", "sqlite:///configured.db")
+    monkeypatch.setattr(models, "_engine", None)
+    assert rbac._has_database() and models._engine is None  # Checked without creating the engine
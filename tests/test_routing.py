@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import create_engine, select
+
+from db import models, routing
+from db.models import AppSettings, Base, get_session_factory, write_session
+
+
+def _where(session):
+    return session.scalar(select(AppSettings.value).where(AppSettings.key == "test_where"))
+
+
+@pytest.fixture
+def replicated_db(sqlite_db, tmp_path, monkeypatch):
+    """A primary and a replica SQLite file, each holding a row that names its database."""
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    replica = create_engine(replica_url)
+    for engine, name in ((sqlite_db, "primary"), (replica, "replica")):
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(AppSettings.__table__.insert().values(key="test_where", value=name))
+    replica.dispose()
+    monkeypatch.setenv("DATABASE_REPLICA_URLS", replica_url)
+    monkeypatch.setenv("DB_READ_YOUR_WRITES_SECONDS", "0")
+    monkeypatch.setattr(routing, "_replica_engines", None)
+    monkeypatch.setattr(routing, "_last_write_at", float("-inf"))
+    yield sqlite_db
+    for engine in routing.get_replica_engines():
+        engine.dispose()
+
+
+def test_reads_go_to_the_replica_and_writes_to_the_primary(replicated_db):
+    """Plain reads use the replica; writes and write_session() use the primary."""
+    with get_session_factory()() as session:
+        assert _where(session) == "replica"
+    with write_session() as session:
+        assert _where(session) == "primary"
+
+    with get_session_factory()() as session:
+        session.add(AppSettings(key="test_written", value="1"))
+        session.commit()
+        assert session.scalar(select(AppSettings.value).where(AppSettings.key == "test_written")) == "1"
+    with models.get_engine().connect() as conn:
+        assert conn.scalar(select(AppSettings.value).where(AppSettings.key == "test_written")) == "1"
+
+
+def test_reads_stay_on_the_primary_after_a_write(replicated_db, monkeypatch):
+    """Within DB_READ_YOUR_WRITES_SECONDS of a commit, new sessions read from the primary."""
+    monkeypatch.setenv("DB_READ_YOUR_WRITES_SECONDS", "60")
+    with write_session() as session:
+        session.add(AppSettings(key="test_written", value="1"))
+        session.commit()
+
+    with get_session_factory()() as session:
+        assert _where(session) == "primary"
+    monkeypatch.setenv("DB_READ_YOUR_WRITES_SECONDS", "0")
+    with get_session_factory()() as session:
+        assert _where(session) == "replica"
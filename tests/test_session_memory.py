@@ -0,0 +1,34 @@
+import pickle
+
+from monitoring import session_memory
+
+
+def test_over_budget_values_are_offloaded_shared_and_released(tmp_path, monkeypatch):
+    """Large offloadable values of over-budget sessions go to one shared file, deleted when the sessions go idle."""
+    monkeypatch.setenv("SESSION_MEMORY_BUDGET_MB", "0.01")
+    monkeypatch.setenv("SESSION_OFFLOAD_MIN_BYTES", "1000")
+    monkeypatch.setenv("SESSION_OFFLOAD_DIR", str(tmp_path))
+    session_memory.mark_offloadable("test_rows")
+    rows = [f"row {i}" * 20 for i in range(500)]
+    first, second = {"test_rows": list(rows), "test_small": 1}, {"test_rows": list(rows)}
+
+    session_memory.account_session("test-session-1", first)
+    session_memory.account_session("test-session-2", second)
+
+    placeholder = first["test_rows"]
+    assert isinstance(placeholder, session_memory.OffloadedValue) and first["test_small"] == 1
+    assert second["test_rows"].token == placeholder.token  # Equal values share one file
+    path = session_memory._store[placeholder.token].path
+    assert pickle.loads(path.read_bytes()) == rows
+
+    session_memory.evict_idle_sessions(idle_seconds=-1)
+    assert placeholder.token not in session_memory._store and not path.exists()
+
+
+def test_containers_growing_in_place_are_remeasured():
+    """A list that grows in place under the same id is re-measured on the next rerun."""
+    state = {"test_log": ["entry"] * 10}
+    small = session_memory.account_session("test-session-growth", state)["test_log"]
+    state["test_log"].extend(["entry"] * 10_000)
+
+    assert session_memory.account_session("test-session-growth", state)["test_log"] > small * 10
@@ -0,0 +1,39 @@
+import pytest
+
+from utils.streaming import coalesce_stream
+
+
+def _words(count=200):
+    for index in range(count):
+        yield f"word{index} "
+
+
+async def _async_words(count=200):
+    for word in _words(count):
+        yield word
+
+
+@pytest.mark.parametrize("source", [_words, _async_words], ids=["sync", "async"])
+def test_coalesced_text_is_unchanged(source):
+    """Joined output equals the source text, in fewer chunks, with the first chunk on its own."""
+    chunks = list(coalesce_stream(source(), window_ms=1000, max_bytes=256))
+    assert "".join(chunks) == "".join(_words())
+    assert chunks[0] == "word0 " and len(chunks) < 200
+
+
+def test_non_text_chunks_pass_through_in_order():
+    """A non-string chunk flushes the buffered text and is yielded unchanged."""
+    marker = {"table": 1}
+    assert list(coalesce_stream(iter(["a", "b", marker, "c"]), window_ms=1000)) == ["a", "b", marker, "c"]
+
+
+def test_producer_errors_reach_the_consumer():
+    """An exception raised by the source is re-raised after the text before it."""
+    def failing():
+        yield "partial "
+        raise ValueError("upstream failed")
+
+    stream = coalesce_stream(failing(), window_ms=1000)
+    assert next(stream) == "partial "
+    with pytest.raises(ValueError, match="upstream failed"):
+        next(stream)
@@ -0,0 +1,177 @@
+"""
+Process-wide admission control for expensive pages.
+
+A page rule in the page access config (see auth/rbac.py) can cap how many reruns of
+the page run at once in this process, and how long a rerun may wait for a slot:
+
+    "views/user_admin.py": {"roles": ["admin"], "max_concurrent": 4, "queue_timeout": 2}
+
+and the config's top-level `role_priorities` (e.g. {"admin": 10}) orders the queue:
+when a slot frees up it goes to the waiting session with the highest priority (its
+best role's), then to the longest waiting. A rerun that gets no slot within the
+queue timeout is rejected right away, so the page can show a "busy, retry" message
+instead of piling more work onto a saturated node.
+
+`require_page_access` acquires the slot, and app.py runs each rerun in
+`admission_scope()`, whose `finally` releases everything the rerun holds, also when
+it is stopped or interrupted by a newer rerun. Slots are tracked per script thread,
+so a page acquiring twice in one rerun holds one slot. A `max_concurrent` of 0 (or
+none) means no limit.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from monitoring.metrics import counter, histogram, register_collector
+
+# Metrics (see monitoring/metrics.py)
+ADMISSION_DECISIONS = counter("admission_decisions_total", "Page admission decisions", ["page", "result"])
+ADMISSION_WAIT_SECONDS = histogram("admission_wait_seconds", "Time queued for a page slot", ["page"])
+
+
+class _Waiter:
+    __slots__ = ("priority", "event", "granted")
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.event = threading.Event()
+        self.granted = False
+
+
+class _PageSlots:
+    """Running reruns of a page and the queue waiting for a slot (guarded by _lock)."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters: List[tuple] = []  # Heap of (-priority, arrival, waiter)
+        self.rejected = 0
+        self.peak_queue = 0
+
+
+_lock = threading.Lock()
+_pages: Dict[str, _PageSlots] = {}
+_arrivals = itertools.count()
+_held = threading.local()  # Pages the current script thread holds slots of
+
+
+def acquire(page: str, limit: int, priority: int = 0, timeout: Optional[float] = None) -> bool:
+    """Take one of a page's `limit` slots, queueing up to `timeout` seconds for it.
+
+    Returns True once admitted (then call `release`, or `release_held` at the end of
+    the rerun), False if the queue timeout passed first. A timeout of 0 never waits.
+    """
+    if timeout is None:
+        timeout = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "3"))
+    held = _held_pages()
+    if page in held:
+        return True
+
+    start = time.perf_counter()
+    with _lock:
+        slots = _pages.get(page)
+        if slots is None:
+            slots = _pages[page] = _PageSlots(limit)
+        slots.limit = limit
+        _grant_waiters(slots)  # The limit may have been raised
+        if slots.active < limit and not slots.waiters:
+            slots.active += 1
+            held.append(page)
+            ADMISSION_DECISIONS.inc(page=page, result="admitted")
+            return True
+        if timeout <= 0:
+            slots.rejected += 1
+            ADMISSION_DECISIONS.inc(page=page, result="rejected")
+            return False
+        waiter = _Waiter(priority)
+        heapq.heappush(slots.waiters, (-priority, next(_arrivals), waiter))
+        slots.peak_queue = max(slots.peak_queue, len(slots.waiters))
+
+    waiter.event.wait(timeout)
+    with _lock:
+        # Checked under the lock: a slot handed over just after the timeout is still taken
+        if not waiter.granted:
+            slots.waiters = [entry for entry in slots.waiters if entry[2] is not waiter]
+            heapq.heapify(slots.waiters)
+            slots.rejected += 1
+    ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, page=page)
+    if not waiter.granted:
+        ADMISSION_DECISIONS.inc(page=page, result="rejected")
+        return False
+    held.append(page)
+    ADMISSION_DECISIONS.inc(page=page, result="queued")
+    return True
+
+
+def release(page: str) -> None:
+    """Give back a slot of the page, handing it to the first waiter if any."""
+    held = _held_pages()
+    if page in held:
+        held.remove(page)
+    with _lock:
+        slots = _pages.get(page)
+        if slots is None or slots.active == 0:
+            return
+        slots.active -= 1
+        _grant_waiters(slots)
+
+
+def release_held() -> None:
+    """Release every slot the current script thread holds (called when a rerun ends)."""
+    for page in list(_held_pages()):
+        release(page)
+
+
+@contextmanager
+def admission_scope():
+    """Release the slots taken during the enclosed rerun when it ends, however it ends."""
+    try:
+        yield
+    finally:
+        release_held()
+
+
+def get_priority(roles: List[str], role_priorities: Dict[str, int]) -> int:
+    """Return the queue priority of a user: that of their highest-priority role, else 0."""
+    return max((int(role_priorities.get(role, 0)) for role in roles), default=0)
+
+
+def get_admission_stats() -> List[Dict]:
+    """Return per-page limits, running and queued reruns and rejections, for display."""
+    with _lock:
+        return [
+            {"page": page, "limit": slots.limit, "running": slots.active, "queued": len(slots.waiters),
+             "peak_queued": slots.peak_queue, "rejected": slots.rejected}
+            for page, slots in sorted(_pages.items())
+        ]
+
+
+def _grant_waiters(slots: _PageSlots) -> None:
+    """Hand free slots to the highest-priority waiters (caller holds the lock)."""
+    while slots.waiters and slots.active < slots.limit:
+        _, _, waiter = heapq.heappop(slots.waiters)
+        slots.active += 1
+        waiter.granted = True
+        waiter.event.set()
+
+
+def _held_pages() -> List[str]:
+    if not hasattr(_held, "pages"):
+        _held.pages = []
+    return _held.pages
+
+
+def _collect_admission_metrics():
+    """Export live slot usage and queue depth (see monitoring/metrics.py)."""
+    for stats in get_admission_stats():
+        labels = {"page": stats["page"]}
+        yield "admission_running", "gauge", "Page reruns holding a slot", labels, stats["running"]
+        yield "admission_queue_depth", "gauge", "Page reruns waiting for a slot", labels, stats["queued"]
+
+
+register_collector(_collect_admission_metrics)
@@ -0,0 +1,417 @@
+"""
+Process-wide tiered cache shared by auth, RBAC and admin code.
+
+Code asks for a namespace once at import time and reads through it:
+
+    token_cache = get_cache("auth0_m2m_token", ttl=43200, disk=True)
+    token = token_cache.get_or_load(domain, lambda: get_management_token(...))
+
+Tiers:
+- Memory: one LRU for all namespaces, bounded by the estimated size of the values
+  (`CACHE_MEMORY_MB`, default 64); the least recently used entries are evicted first.
+- Disk (optional): a SQLite file (`CACHE_DISK_PATH`, unset = disabled) for namespaces
+  created with `disk=True`. It survives restarts and is shared by the worker
+  processes of a node; values are pickled, and the file is only readable by its
+  owner. Memory misses fall through to it and promote what they find.
+
+Each namespace has a default TTL (None: no expiry), overridable per entry. Entries
+can carry tags; `invalidate_tag(tag)` bumps the tag's version, which makes every
+entry stored under the old version a miss, in all namespaces at once. With the disk
+tier enabled, tag versions live in the file, so other processes see the bump within
+`CACHE_TAG_CHECK_SECONDS`.
+
+`get_or_load` is single-flight: concurrent misses on one key wait for one loader
+call instead of all running it. A loader that raises caches nothing and the error
+reaches every waiter. Hits, misses, loads and evictions are counted per namespace
+(`get_cache_stats()`, and the `cache_*` metrics).
+
+Cached values are shared by every session in the process: treat them as read-only.
+"""
+
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from monitoring.metrics import register_collector
+from monitoring.session_memory import estimate_size
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+_MISSING = object()
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: Optional[float]  # time.time(), comparable across processes
+    tags: Tuple[Tuple[str, int], ...]  # (tag, version) at the time the value was loaded
+    size: int
+
+
+@dataclass
+class _Stats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    loads: int = 0
+    load_errors: int = 0
+    evictions: int = 0
+
+
+class _Flight:
+    """A load that concurrent callers wait on instead of loading again."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+_lock = threading.RLock()
+_memory: "OrderedDict[Tuple[str, Hashable], _Entry]" = OrderedDict()
+_memory_bytes = 0
+_caches: Dict[str, "Cache"] = {}
+_tag_versions: Dict[str, int] = {}
+_tags_checked_at = 0.0
+
+
+@dataclass
+class Cache:
+    """A namespace of the shared cache. Create it with `get_cache`."""
+    namespace: str
+    ttl: Optional[float] = None
+    disk: bool = False
+    stats: _Stats = field(default_factory=_Stats, repr=False)
+    _flights: Dict[Hashable, _Flight] = field(default_factory=dict, repr=False)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or `default` on a miss."""
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = _MISSING, tags: Iterable[str] = ()) -> None:
+        """Store a value (`ttl` defaults to the namespace's; None never expires)."""
+        self._store(key, value, ttl, _current_versions(tags))
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = _MISSING,
+                    tags: Iterable[str] = ()) -> Any:
+        """Return the cached value, calling `loader()` once on a miss (single-flight)."""
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+
+        with _lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            # Versions before loading: an invalidation during the load makes the result stale
+            versions = _current_versions(tags)
+            with _lock:
+                self.stats.loads += 1
+            flight.value = loader()
+            self._store(key, flight.value, ttl, versions)
+            return flight.value
+        except BaseException as e:
+            with _lock:
+                self.stats.load_errors += 1
+            flight.error = e
+            raise
+        finally:
+            with _lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def delete(self, key: Hashable) -> None:
+        with _lock:
+            _drop((self.namespace, key))
+        if self._disk_enabled():
+            _disk_execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, repr(key)))
+
+    def clear(self) -> None:
+        """Drop every entry of the namespace (in both tiers)."""
+        with _lock:
+            for memory_key in [memory_key for memory_key in _memory if memory_key[0] == self.namespace]:
+                _drop(memory_key)
+        if self._disk_enabled():
+            _disk_execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+    def _lookup(self, key: Hashable) -> Any:
+        memory_key = (self.namespace, key)
+        with _lock:
+            entry = _memory.get(memory_key)
+        if entry is not None:
+            if _is_fresh(entry):
+                with _lock:
+                    if memory_key in _memory:
+                        _memory.move_to_end(memory_key)
+                    self.stats.hits += 1
+                return entry.value
+            with _lock:
+                if _memory.get(memory_key) is entry:
+                    _drop(memory_key)
+
+        if self._disk_enabled() and (entry := _disk_get(self.namespace, key)) is not None and _is_fresh(entry):
+            with _lock:
+                _put(memory_key, entry)
+                self.stats.disk_hits += 1
+            return entry.value
+
+        with _lock:
+            self.stats.misses += 1
+        return _MISSING
+
+    def _store(self, key: Hashable, value: Any, ttl: Optional[float], versions: Tuple[Tuple[str, int], ...]) -> None:
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        entry = _Entry(value, expires_at, versions, estimate_size(value))
+        if _is_fresh(entry):  # Skip values whose tags were invalidated while loading
+            with _lock:
+                _put((self.namespace, key), entry)
+            if self._disk_enabled():
+                _disk_put(self.namespace, key, entry)
+
+    def _disk_enabled(self) -> bool:
+        return self.disk and _disk_path() is not None
+
+
+def get_cache(namespace: str, ttl: Optional[float] = None, disk: bool = False) -> Cache:
+    """Return the namespace's cache, creating it on first use (later arguments are ignored)."""
+    with _lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = _caches[namespace] = Cache(namespace, ttl, disk)
+        return cache
+
+
+def invalidate_tag(tag: str) -> None:
+    """Make every entry stored under the tag's current version a miss, in all namespaces."""
+    if _disk_path() is not None:
+        rows = _disk_execute(
+            "INSERT INTO cache_tags (tag, version) VALUES (?, 1) "
+            "ON CONFLICT (tag) DO UPDATE SET version = version + 1 RETURNING version",
+            (tag,),
+        )
+        if rows:
+            # Exactly the shared version: a local one ahead of it would miss the next bump by another process
+            with _lock:
+                _tag_versions[tag] = rows[0][0]
+            return
+    with _lock:
+        _tag_versions[tag] = _tag_versions.get(tag, 0) + 1
+
+
+def get_cache_stats() -> List[Dict]:
+    """Return per-namespace hit/miss counts and memory use, for display."""
+    with _lock:
+        usage: Dict[str, List[int]] = {}
+        for (namespace, _), entry in _memory.items():
+            counts = usage.setdefault(namespace, [0, 0])
+            counts[0] += 1
+            counts[1] += entry.size
+        # Copied under the lock that guards their updates, so each row is consistent
+        caches = [(cache, _Stats(**vars(cache.stats))) for cache in _caches.values()]
+    rows = []
+    for cache, stats in sorted(caches, key=lambda item: item[0].namespace):
+        lookups = stats.hits + stats.disk_hits + stats.misses
+        entries, size = usage.get(cache.namespace, [0, 0])
+        rows.append({
+            "namespace": cache.namespace,
+            "ttl_s": cache.ttl,
+            "disk": cache._disk_enabled(),
+            "entries": entries,
+            "memory_kb": round(size / 1024, 1),
+            "hit_rate": round((stats.hits + stats.disk_hits) / lookups, 3) if lookups else None,
+            "hits": stats.hits,
+            "disk_hits": stats.disk_hits,
+            "misses": stats.misses,
+            "loads": stats.loads,
+            "load_errors": stats.load_errors,
+            "evictions": stats.evictions,
+        })
+    return rows
+
+
+# ==============================================================================
+# Memory tier (caller holds _lock)
+# ==============================================================================
+
+def _put(memory_key: Tuple[str, Hashable], entry: _Entry) -> None:
+    global _memory_bytes
+    _drop(memory_key)
+    _memory[memory_key] = entry
+    _memory_bytes += entry.size
+    budget = float(os.getenv("CACHE_MEMORY_MB", "64")) * 1024 * 1024
+    while _memory_bytes > budget and len(_memory) > 1:
+        evicted_key, _ = next(iter(_memory.items()))
+        _drop(evicted_key)
+        if cache := _caches.get(evicted_key[0]):
+            cache.stats.evictions += 1
+
+
+def _drop(memory_key: Tuple[str, Hashable]) -> None:
+    global _memory_bytes
+    entry = _memory.pop(memory_key, None)
+    if entry is not None:
+        _memory_bytes -= entry.size
+
+
+def _is_fresh(entry: _Entry) -> bool:
+    if entry.expires_at is not None and entry.expires_at <= time.time():
+        return False
+    if entry.tags:
+        _refresh_tag_versions()
+        with _lock:
+            return all(_tag_versions.get(tag, 0) == version for tag, version in entry.tags)
+    return True
+
+
+def _current_versions(tags: Iterable[str]) -> Tuple[Tuple[str, int], ...]:
+    tags = tuple(tags)
+    if not tags:
+        return ()
+    _refresh_tag_versions()
+    with _lock:
+        return tuple((tag, _tag_versions.get(tag, 0)) for tag in tags)
+
+
+# ==============================================================================
+# Disk tier
+# ==============================================================================
+
+_local = threading.local()  # One SQLite connection per thread
+_disk_failed = False
+_disk_writes = 0
+
+
+def _disk_path() -> Optional[Path]:
+    path = os.getenv("CACHE_DISK_PATH")
+    if not path or _disk_failed:
+        return None
+    path = Path(path)
+    return path if path.is_absolute() else PROJECT_ROOT / path
+
+
+def _connection() -> Optional[sqlite3.Connection]:
+    global _disk_failed
+    path = _disk_path()
+    if path is None:
+        return None
+    connection = getattr(_local, "connection", None)
+    if connection is not None and getattr(_local, "path", None) == path:
+        return connection
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))  # Owner-only: values may be tokens
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")  # Readers in other workers don't block writers
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries (namespace TEXT NOT NULL, key TEXT NOT NULL, "
+            "value BLOB NOT NULL, expires_at REAL, tags TEXT NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        connection.execute("CREATE TABLE IF NOT EXISTS cache_tags (tag TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+    except (OSError, sqlite3.Error) as e:
+        # Keep working from memory rather than failing every lookup
+        print(f"Disabling the disk cache tier ({path}): {e}")
+        _disk_failed = True
+        return None
+    _local.connection, _local.path = connection, path
+    return connection
+
+
+def _disk_execute(sql: str, params: tuple = ()) -> List[tuple]:
+    connection = _connection()
+    if connection is None:
+        return []
+    try:
+        return connection.execute(sql, params).fetchall()
+    except sqlite3.Error as e:
+        print(f"Disk cache error: {e}")
+        return []
+
+
+def _disk_get(namespace: str, key: Hashable) -> Optional[_Entry]:
+    rows = _disk_execute(
+        "SELECT value, expires_at, tags FROM cache_entries WHERE namespace = ? AND key = ?",
+        (namespace, repr(key)),
+    )
+    if not rows:
+        return None
+    blob, expires_at, tags = rows[0]
+    try:
+        value = pickle.loads(blob)
+    except Exception:
+        return None  # Written by an incompatible version of the code; reload it
+    versions = tuple((tag, version) for tag, version in json.loads(tags))
+    return _Entry(value, expires_at, versions, len(blob))
+
+
+def _disk_put(namespace: str, key: Hashable, entry: _Entry) -> None:
+    global _disk_writes
+    try:
+        blob = pickle.dumps(entry.value, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return  # Not picklable: memory tier only
+    _disk_execute(
+        "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, tags) VALUES (?, ?, ?, ?, ?)",
+        (namespace, repr(key), blob, entry.expires_at, json.dumps(entry.tags)),
+    )
+    _disk_writes += 1
+    if _disk_writes % 100 == 1:
+        _prune_disk()
+
+
+def _prune_disk() -> None:
+    """Delete expired entries, then the soonest-expiring beyond CACHE_DISK_MAX_ENTRIES."""
+    _disk_execute("DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+    max_entries = int(os.getenv("CACHE_DISK_MAX_ENTRIES", "10000"))
+    _disk_execute(
+        "DELETE FROM cache_entries WHERE rowid IN (SELECT rowid FROM cache_entries "
+        "ORDER BY expires_at IS NULL, expires_at LIMIT max(0, (SELECT count(*) FROM cache_entries) - ?))",
+        (max_entries,),
+    )
+
+
+def _refresh_tag_versions(force: bool = False) -> None:
+    """Re-read tag versions from the disk tier, at most every CACHE_TAG_CHECK_SECONDS."""
+    global _tags_checked_at
+    if _disk_path() is None:
+        return
+    now = time.monotonic()
+    if not force and now - _tags_checked_at < float(os.getenv("CACHE_TAG_CHECK_SECONDS", "1")):
+        return
+    _tags_checked_at = now
+    rows = _disk_execute("SELECT tag, version FROM cache_tags")
+    with _lock:
+        for tag, version in rows:
+            # Never go back: a local bump (made while the file couldn't be written) may be ahead
+            _tag_versions[tag] = max(_tag_versions.get(tag, 0), version)
+
+
+def _collect_cache_metrics():
+    """Export per-namespace cache counters and sizes (see monitoring/metrics.py)."""
+    for stats in get_cache_stats():
+        labels = {"namespace": stats["namespace"]}
+        yield "cache_hits_total", "counter", "Cache hits", {**labels, "tier": "memory"}, stats["hits"]
+        yield "cache_hits_total", "counter", "Cache hits", {**labels, "tier": "disk"}, stats["disk_hits"]
+        yield "cache_misses_total", "counter", "Cache misses", labels, stats["misses"]
+        yield "cache_evictions_total", "counter", "Entries evicted from the memory tier", labels, stats["evictions"]
+        yield "cache_entries", "gauge", "Entries in the memory tier", labels, stats["entries"]
+
+
+register_collector(_collect_cache_metrics)
@@ -0,0 +1,44 @@
+"""
+Process-wide environment loading.
+
+Modules and pages used to call `load_dotenv(override=True)` on import and on every
+rerun, re-reading and re-parsing `.env` each time. `load_env()` reads it once per
+process and afterwards only checks the file's modification time, so edits made
+during development are still picked up on the next rerun without a restart.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+_lock = threading.Lock()
+_loaded_mtimes: Dict[Path, float] = {}
+
+
+def load_env(path: Optional[os.PathLike] = None) -> bool:
+    """Load `.env` into os.environ (overriding existing values) if it is new or changed.
+
+    Args:
+        path: Env file to load; defaults to `.env` in the project root.
+
+    Returns:
+        True if the file was (re)loaded by this call.
+    """
+    env_file = Path(path) if path else PROJECT_ROOT / ".env"
+    try:
+        mtime = env_file.stat().st_mtime
+    except OSError:
+        return False  # No .env file; rely on the real environment
+    if _loaded_mtimes.get(env_file) == mtime:
+        return False
+
+    with _lock:
+        if _loaded_mtimes.get(env_file) == mtime:
+            return False
+        from dotenv import load_dotenv  # Deferred: only needed when the file changed
+        load_dotenv(env_file, override=True)
+        _loaded_mtimes[env_file] = mtime
+    return True
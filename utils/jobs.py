@@ -0,0 +1,131 @@
+"""
+Process-wide background job runner for long admin operations.
+
+Work submitted here runs on a bounded thread pool instead of the Streamlit script
+thread, so a slow Auth0 listing or a bulk operation neither freezes the page nor
+restarts when a widget is clicked. Jobs live in a module-level registry (this module
+is imported once per process, unlike page scripts), so they survive reruns: a page
+keeps the job id in `st.session_state` and polls it from a fragment.
+
+    job = submit_job("List users", lambda job: list_users(..., progress=job.report),
+                     key="list_users:my-connection")
+    st.session_state.list_job_id = job.id
+    ...
+    job = get_job(st.session_state.list_job_id)
+
+Submitting a job whose `key` matches a pending or running job returns that job
+instead of starting a duplicate. Job functions run without a script context, so they
+must not call `st.*`: return a result or raise, and report progress via `job.report`.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_jobs: Dict[str, "Job"] = {}
+_active_keys: Dict[str, str] = {}  # dedupe key -> id of its pending/running job
+
+
+@dataclass
+class Job:
+    """A unit of background work and its current state."""
+    id: str
+    name: str
+    key: Optional[str] = None
+    status: str = PENDING
+    progress: float = 0.0
+    message: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def report(self, done: float, total: Optional[float] = None, message: Optional[str] = None) -> None:
+        """Update progress from inside the job, as a fraction or as `done` of `total`."""
+        fraction = done / total if total else done
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+
+def submit_job(name: str, fn: Callable[[Job], Any], key: Optional[str] = None) -> Job:
+    """Run fn(job) in the background and return its Job (or the active job with the same key).
+
+    Args:
+        name: Human-readable description shown in the UI.
+        fn: Callable receiving the Job; its return value becomes `job.result` and
+            any exception is recorded in `job.error`.
+        key: Optional dedupe key; at most one pending or running job exists per key.
+    """
+    with _lock:
+        if key is not None and key in _active_keys:
+            return _jobs[_active_keys[key]]
+        _prune()
+        job = Job(id=uuid.uuid4().hex, name=name, key=key)
+        _jobs[job.id] = job
+        if key is not None:
+            _active_keys[key] = job.id
+        executor = _get_executor()
+    executor.submit(_run, job, fn)
+    return job
+
+
+def get_job(job_id: Optional[str]) -> Optional[Job]:
+    """Return a job by id, or None if it is unknown (or has been pruned)."""
+    if job_id is None:
+        return None
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def list_jobs() -> List[Job]:
+    """Return all retained jobs, newest first."""
+    with _lock:
+        return sorted(_jobs.values(), key=lambda job: job.submitted_at, reverse=True)
+
+
+def _run(job: Job, fn: Callable[[Job], Any]) -> None:
+    job.status, job.started_at = RUNNING, time.time()
+    status = FAILED
+    try:
+        job.result = fn(job)
+        job.progress, status = 1.0, SUCCEEDED
+    except Exception as e:
+        job.error = str(e) or type(e).__name__
+    finally:
+        # Done and key released together: a job seen as done is never returned for its key
+        with _lock:
+            job.finished_at, job.status = time.time(), status
+            if job.key is not None and _active_keys.get(job.key) == job.id:
+                del _active_keys[job.key]
+
+
+def _prune() -> None:
+    """Drop finished jobs older than JOB_RETENTION_SECONDS (caller holds the lock)."""
+    cutoff = time.time() - float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+    for job_id in [job_id for job_id, job in _jobs.items() if job.done and job.finished_at < cutoff]:
+        del _jobs[job_id]
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Return the shared pool, created on first use (caller holds the lock)."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=int(os.getenv("JOB_WORKERS", "4")), thread_name_prefix="job")
+    return _executor
@@ -0,0 +1,163 @@
+"""
+Coalescing stream pipeline for `st.write_stream`.
+
+Every chunk passed to `st.write_stream` becomes a UI delta sent over the
+websocket, so streaming an LLM response token by token costs one message (and one
+markdown re-render) per token and per session. `coalesce_stream` wraps a sync or
+async generator and joins its text chunks, emitting at most one chunk per time
+window or whenever the buffered text reaches a byte budget:
+
+    response = placeholder.write_stream(coalesce_stream(stream_data()))
+
+The joined text is identical to the original stream, so `write_stream` still
+returns the full response. The first chunk is emitted immediately so time to first
+token is unchanged.
+
+The producer runs in its own thread and hands chunks over through a bounded queue:
+when rendering falls behind, the queue fills and the producer blocks (backpressure)
+instead of buffering an unbounded response in memory. If the consumer stops early
+(e.g. `st.rerun()` or the session ends), the producer is stopped and closed.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from typing import Any, AsyncIterable, Iterable, Iterator, Optional, Union
+
+_DONE = object()
+
+
+class _Failure:
+    """Wraps an exception raised by the producer so it is re-raised in the consumer."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def coalesce_stream(
+    source: Union[Iterable, AsyncIterable],
+    window_ms: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+    queue_size: Optional[int] = None,
+) -> Iterator[Any]:
+    """Yield the source's text chunks joined per time window or byte budget.
+
+    Args:
+        source: Sync or async iterable of chunks. Non-string chunks (e.g. DataFrames)
+            flush the buffered text and are passed through unchanged.
+        window_ms: Maximum time text is buffered before it is emitted
+            (default `STREAM_COALESCE_MS`, 100).
+        max_bytes: Emit as soon as the buffered text reaches this many UTF-8 bytes
+            (default `STREAM_MAX_BYTES`, 4096).
+        queue_size: Chunks the producer may run ahead of rendering before it blocks
+            (default `STREAM_QUEUE_SIZE`, 256).
+    """
+    window = (window_ms if window_ms is not None else float(os.getenv("STREAM_COALESCE_MS", "100"))) / 1000
+    max_bytes = max_bytes if max_bytes is not None else int(os.getenv("STREAM_MAX_BYTES", "4096"))
+    queue_size = queue_size if queue_size is not None else int(os.getenv("STREAM_QUEUE_SIZE", "256"))
+
+    chunks = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce, args=(source, chunks, stop), name="stream-producer", daemon=True)
+    _attach_script_run_ctx(producer)
+    producer.start()
+
+    buffer, size, deadline, emitted = [], 0, None, False
+    try:
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = chunks.get(timeout=timeout)
+            except queue.Empty:  # Window elapsed while the producer was quiet
+                yield "".join(buffer)
+                buffer, size, deadline = [], 0, None
+                continue
+
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            if not isinstance(item, str):
+                if buffer:
+                    yield "".join(buffer)
+                    buffer, size, deadline = [], 0, None
+                yield item
+                emitted = True
+                continue
+
+            buffer.append(item)
+            size += len(item.encode("utf-8"))
+            if deadline is None:
+                deadline = time.monotonic() + window
+            if not emitted or size >= max_bytes or time.monotonic() >= deadline:
+                yield "".join(buffer)
+                buffer, size, deadline, emitted = [], 0, None, True
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        stop.set()
+        _drain(chunks)  # Unblock a producer waiting on a full queue
+
+
+def _produce(source, chunks: queue.Queue, stop: threading.Event) -> None:
+    """Run the source to completion (or until stopped), putting chunks on the queue."""
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        if hasattr(source, "__aiter__"):
+            asyncio.run(_pump_async(source, put))
+        else:
+            iterator = iter(source)
+            try:
+                for item in iterator:
+                    if not put(item):
+                        break
+            finally:
+                if hasattr(iterator, "close"):
+                    iterator.close()
+        put(_DONE)
+    except BaseException as e:
+        put(_Failure(e))
+
+
+async def _pump_async(source: AsyncIterable, put) -> None:
+    # put() blocks this thread's own event loop while the queue is full, which is the
+    # backpressure we want: the async producer is not resumed until there is room
+    iterator = source.__aiter__()
+    try:
+        async for item in iterator:
+            if not put(item):
+                break
+    finally:
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
+
+
+def _drain(chunks: queue.Queue) -> None:
+    try:
+        while True:
+            chunks.get_nowait()
+    except queue.Empty:
+        pass
+
+
+def _attach_script_run_ctx(thread: threading.Thread) -> None:
+    """Let producers that read st.session_state run on the producer thread."""
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            add_script_run_ctx(thread, ctx)
+    except Exception:
+        pass
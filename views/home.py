@@ -1,10 +1,13 @@
 import os
 import streamlit as st
-from dotenv import load_dotenv
 from auth.rbac import require_page_access
+from utils.env import load_env
 
-# Load environment variables
-load_dotenv(override=True)
+# Page registry metadata (read statically by pages.py)
+PAGE_META = {"title": "Home", "icon": "🏠", "order": 0, "default": True, "access": "public"}
+
+# Load environment variables (once per process, see utils/env.py)
+load_env()
 
 # Get auth provider
 auth_provider = os.getenv("STREAMLIT_AUTH_PROVIDER", "auth0")
@@ -0,0 +1,106 @@
+import streamlit as st
+
+from auth.rbac import require_page_access
+from db.instrumentation import get_page_summary, get_recent_reruns, reset_query_stats
+from db.models import get_engine
+from db.pool import get_pool_stats
+from monitoring.profiler import get_latency_summary, reset_latency_stats
+from monitoring.session_memory import get_memory_report
+from utils.admission import get_admission_stats
+from utils.cache import get_cache_stats
+from utils.env import load_env
+
+# Page registry metadata (read statically by pages.py)
+PAGE_META = {"title": "Monitoring", "icon": "📈", "order": 95, "roles": ["admin"]}  # Admin only
+
+load_env()
+
+# Check authentication first
+require_page_access("views/monitoring.py")
+
+st.title("📈 Monitoring")
+st.caption("Process-wide statistics for this server process, shared by all sessions.")
+
+
+# Database connection pool metrics (process-wide, shared by all sessions)
+st.header("🗄️ Database Pool")
+if engine := get_engine():
+    st.caption("Checkout latency, waits and overflow events since this process started.")
+    st.json(get_pool_stats(engine), expanded=False)
+else:
+    st.info("No database configured (`DATABASE_URL` is not set).")
+
+
+# Rerun latency per page and phase (process-wide histograms, see monitoring/profiler.py)
+@st.fragment
+def latency_section():
+    st.header("⏱️ Rerun Latency")
+    if latency_summary := get_latency_summary():
+        st.caption(
+            "Per-page phase timings since this process started, slowest p99 first: "
+            "`load_env`, `auth` (sidebar), `rbac` (navigation pages), `navigation`, `page` (body) and `total`."
+        )
+        st.dataframe(latency_summary, use_container_width=True, hide_index=True)
+        if st.button("Reset latency stats"):
+            reset_latency_stats()
+            st.rerun(scope="fragment")
+    else:
+        st.info("No reruns recorded yet.")
+
+latency_section()
+
+
+# Session state memory across all sessions in this process
+st.header("🧠 Session Memory")
+st.caption(
+    "Estimated `st.session_state` size per session and key, for the sessions active in the last "
+    "`SESSION_IDLE_SECONDS`. Sessions over `SESSION_MEMORY_BUDGET_MB` have their large offloadable "
+    "values moved to disk (`SESSION_OFFLOAD_DIR`, shared by sessions holding equal values)."
+)
+st.json(get_memory_report(), expanded=False)
+
+
+# Page admission control (process-wide, see utils/admission.py)
+st.header("🚦 Page Admission")
+if admission_stats := get_admission_stats():
+    st.caption(
+        "Concurrency-limited pages in this process: reruns running and queued now, the longest "
+        "queue seen and reruns turned away with a busy message. Limits are set per page on the User Admin page."
+    )
+    st.dataframe(admission_stats, use_container_width=True, hide_index=True)
+else:
+    st.info("No concurrency-limited page has been opened yet.")
+
+
+# Shared cache (process-wide, see utils/cache.py)
+st.header("🗃️ Cache")
+if cache_stats := get_cache_stats():
+    st.caption(
+        "Namespaces of the shared cache in this process: entries and memory held now, and lookups "
+        "since startup. `disk_hits` were served from the on-disk tier (`CACHE_DISK_PATH`)."
+    )
+    st.dataframe(cache_stats, use_container_width=True, hide_index=True)
+else:
+    st.info("Nothing has been cached yet.")
+
+
+# SQL queries per rerun (process-wide, last QUERY_STATS_HISTORY reruns)
+@st.fragment
+def query_stats_section():
+    st.header("🔎 Queries per Page")
+    if page_summary := get_page_summary():
+        st.caption(
+            "Worst pages first, by average query time per rerun. `redundant_per_rerun` counts "
+            "identical statements re-run with the same parameters; `top_repeated` is the most "
+            "frequently repeated statement (a likely N+1 or duplicate read)."
+        )
+        st.dataframe(page_summary, use_container_width=True, hide_index=True)
+        with st.expander("Recent reruns"):
+            st.json(get_recent_reruns(limit=20), expanded=False)
+        if st.button("Reset query stats"):
+            reset_query_stats()
+            st.rerun(scope="fragment")
+    else:
+        st.info("No queries recorded yet.")
+
+query_stats_section()
@@ -2,10 +2,19 @@ import time
 import streamlit as st
 
 from auth.rbac import require_page_access
+from monitoring.session_memory import get_state, mark_offloadable
+from utils.streaming import coalesce_stream
+
+# Page registry metadata (read statically by pages.py)
+PAGE_META = {"title": "State Scenarios", "icon": "🔁", "order": 10, "access": "authenticated",
+             "max_concurrent": 16}  # Streams hold their rerun open
 
 # Check authentication first
 require_page_access("views/state_scenarios.py")
 
+# Streamed responses can be large; let sessions over budget move them to disk
+mark_offloadable("streamed_response")
+
 def stream_data():
     LOREM_IPSUM = """
     Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor
@@ -25,11 +34,13 @@ Scenario where I want to make a request and receive a stream of data from a serv
 stream_btn = st.button("Stream Data")
 editable_response_placeholder = st.empty()
 if stream_btn:
-    response = editable_response_placeholder.write_stream(stream_data())
-    st.session_state["data"] = response
+    # Coalesce word-by-word chunks into a few UI updates; the returned text is unchanged
+    response = editable_response_placeholder.write_stream(coalesce_stream(stream_data()))
+    st.session_state["streamed_response"] = response
 
+# Not bound to a key: the widget keeps the user's edits until a new response changes its value
 editable_response_placeholder.text_area(
     "Data",
-    key='data'
+    value=get_state("streamed_response", "")
 )
 st.button("Rerun")
\ No newline at end of file
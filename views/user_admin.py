@@ -1,10 +1,10 @@
 import os
 import secrets
+import weakref
 import requests
 
-import pandas as pd
-from dotenv import load_dotenv
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 from auth.rbac import (
     require_page_access,
@@ -12,10 +12,18 @@ from auth.rbac import (
     save_page_access_config,
     AVAILABLE_ROLES,
 )
-from pages import ALL_PAGES
+from pages import get_all_pages
+from auth.auth0_management import auth0_request, get_cached_user_list, get_management_token, get_user_list, patch_cached_user
+from utils.cache import get_cache
+from utils.env import load_env
+from utils.jobs import get_job, submit_job
 
+# Page registry metadata (read statically by pages.py)
+PAGE_META = {"title": "User Admin", "icon": "🔐", "order": 90, "roles": ["admin"],  # Admin only
+             "max_concurrent": 4, "queue_timeout": 5}  # Heavy: Auth0 listings
 
-load_dotenv(override=True)
+
+load_env()
 
 AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
 AUTH0_M2M_CLIENT_ID = os.getenv("AUTH0_M2M_CLIENT_ID")
@@ -23,6 +31,25 @@ AUTH0_M2M_CLIENT_SECRET = os.getenv("AUTH0_M2M_CLIENT_SECRET")
 AUTH0_DATABASE_CONNECTION_NAME = os.getenv("AUTH0_DATABASE_CONNECTION_NAME")
 AUTH0_TEAM_LOGIN_URL = os.getenv("AUTH0_TEAM_LOGIN_URL") # NEW – optional team dashboard URL
 
+JOB_POLL_SECONDS = 1  # How often background job status is refreshed
+
+# Shared by all sessions (see utils/cache.py). The token survives restarts with the disk tier
+M2M_TOKEN_CACHE = get_cache("auth0_m2m_token", ttl=43200, disk=True)  # Auth0 tokens last 24 hours
+USER_ROWS_CACHE = get_cache("auth0_user_rows")
+
+# Each section of this page is an st.fragment, so interacting with it reruns only that
+# section. These are the data each section renders; a section that changes data calls
+# `data_changed()`, which reruns the whole page only if another section renders that data
+# (Streamlit can rerun the current fragment or the whole app, not another fragment).
+SECTION_INPUTS = {
+    "navigation": {"page_access"},  # app.py's sidebar navigation
+    "users": {"user_list", "user_roles", "verification"},
+    "invite": set(),
+    "verification": {"user_list", "verification"},
+    "reset_link": {"user_list"},
+    "page_access": {"page_access"},
+}
+
 # Check authentication first
 require_page_access("views/user_admin.py")
 
@@ -38,27 +65,33 @@ if not all([AUTH0_DOMAIN, AUTH0_M2M_CLIENT_ID, AUTH0_M2M_CLIENT_SECRET, AUTH0_DA
 st.title("Auth0 User Management")
 st.caption(f"View users and manage invitations for the **{AUTH0_DATABASE_CONNECTION_NAME}** database connection.")
 
+# Messages from a section that triggered a full page rerun (see data_changed)
+for message, icon in st.session_state.pop("admin_toasts", []):
+    st.toast(message, icon=icon)
+
 # --- Helper Functions ---
 
-@st.cache_data(ttl=43200, show_spinner=False) # Cache M2M token for 12 hours
+def data_changed(section, *data, toast=None):
+    """Rerun after `section` changed `data`: the whole page if another section renders it, else just this section.
+
+    `toast` is an optional (message, icon) shown after the rerun.
+    """
+    if toast:
+        st.session_state.setdefault("admin_toasts", []).append(toast)
+    dependents = [name for name, inputs in SECTION_INPUTS.items() if name != section and inputs.intersection(data)]
+    # A fragment-scoped rerun is only possible while the fragment runs on its own
+    ctx = get_script_run_ctx()
+    in_fragment_run = bool(ctx and ctx.fragment_ids_this_run)
+    st.rerun(scope="fragment" if in_fragment_run and not dependents else "app")
+
 def fetch_m2m_token():
-    """Fetches an M2M access token from Auth0."""
+    """Fetches an M2M access token from Auth0 (cached for 12 hours, shared by all sessions)."""
     try:
-        response = requests.post(
-            f'https://{AUTH0_DOMAIN}/oauth/token',
-            json={
-                "grant_type": "client_credentials",
-                "client_id": AUTH0_M2M_CLIENT_ID,
-                "client_secret": AUTH0_M2M_CLIENT_SECRET,
-                "audience": f'https://{AUTH0_DOMAIN}/api/v2/'
-            },
-            headers={"content-type": "application/json"}
+        return M2M_TOKEN_CACHE.get_or_load(
+            (AUTH0_DOMAIN, AUTH0_M2M_CLIENT_ID),
+            lambda: get_management_token(AUTH0_DOMAIN, AUTH0_M2M_CLIENT_ID, AUTH0_M2M_CLIENT_SECRET),
         )
-        response.raise_for_status()
-        token = response.json().get("access_token")
-        if token:
-            return token
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, KeyError, ValueError) as e:
         st.error(f"Error fetching M2M token: {e}")
     return None
 
@@ -77,45 +110,66 @@ def list_auth0_users(access_token):
 
     st.write(f"For advanced user management tasks, including :orange[**deleting**] users, please use the [Auth0 Dashboard ↗️](https://manage.auth0.com/dashboard/{region}/{tenant}/users).")
 
-    # Fetch data if needed
-    if st.session_state.get("force_user_list_refresh", True):
-        try:
-            response = requests.get(
-                f'https://{AUTH0_DOMAIN}/api/v2/users',
-                headers={"Authorization": f"Bearer {access_token}"},
-                params={
-                    "per_page": 100,
-                    "page": 0,
-                    "include_totals": "true",
-                    "fields": "email,user_id,name,last_login,logins_count,email_verified,app_metadata,identities",
-                    "include_fields": "true",
-                    "search_engine": "v3",
-                    "q": f'identities.connection:"{AUTH0_DATABASE_CONNECTION_NAME}"'
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            # Extract users from response
-            if isinstance(data, list):
-                users = data
-            elif isinstance(data, dict) and 'users' in data:
-                users = data['users']
-                st.caption(f"Total users: {data.get('total', 'N/A')}")
-            else:
-                users = []
+    # Fetch data if needed. The list is cached once per process and shared by all admin
+    # sessions (see auth/auth0_management.py). Listing pages through every user, so it runs
+    # as a background job that keeps going across reruns (see utils/jobs.py)
+    snapshot = get_cached_user_list(AUTH0_DOMAIN, AUTH0_DATABASE_CONNECTION_NAME)
+    force = st.session_state.get("force_user_list_refresh", False)
+    stale = (snapshot is None or snapshot.expired) and not st.session_state.get("auth0_users_error")
+    if (force or stale) and not st.session_state.get("auth0_users_job_id"):
+        job = submit_job(
+            "List Auth0 users",
+            # Returns only the total: Job.result lives until the job is pruned, and the page
+            # reads the listing from the shared cache
+            lambda job: get_user_list(AUTH0_DOMAIN, access_token, AUTH0_DATABASE_CONNECTION_NAME,
+                                      force=force, progress=job.report).total,
+            key=f"list_users:{AUTH0_DOMAIN}:{AUTH0_DATABASE_CONNECTION_NAME}",
+        )
+        st.session_state.auth0_users_job_id = job.id
+        st.session_state.force_user_list_refresh = False
+
+    if st.session_state.get("auth0_users_job_id"):
+        # Poll without rerunning the whole page; the fragment triggers one full rerun when done
+        st.fragment(run_every=JOB_POLL_SECONDS)(user_list_job_status)()
+    if error := st.session_state.get("auth0_users_error"):
+        st.error(f"Error listing users: {error}")
+        return False
+    if snapshot:
+        st.caption(f"Total users: {snapshot.total}")
 
-            st.session_state.auth0_users = users
-            st.session_state.force_user_list_refresh = False
+    users_data = get_user_rows(snapshot)
+    if users_data:
+        st.dataframe(
+            users_data,
+            use_container_width=True,
+            key="user_selection",
+            on_select="rerun",
+            selection_mode="single-row",
+            hide_index=True
+        )
+    else:
+        st.info("No users found.")
 
-        except requests.exceptions.HTTPError as e:
-            st.error(f"Error listing users: {e}")
-            st.session_state.auth0_users = []
-            return False
+    return True
+
+def get_auth0_users():
+    """Return the shared, cached user list (read-only), or an empty tuple before the first fetch."""
+    snapshot = get_cached_user_list(AUTH0_DOMAIN, AUTH0_DATABASE_CONNECTION_NAME)
+    return snapshot.users if snapshot else ()
+
+def get_user_rows(snapshot):
+    """Return the users table rows (read-only), rebuilt only when the (immutable) snapshot changes.
+
+    The rows are shared by all admin sessions, like the snapshot they're built from.
+    """
+    if snapshot is None:
+        return []
+    cached = USER_ROWS_CACHE.get(id(snapshot))
+    if cached and cached[0]() is snapshot:  # Not a new snapshot that reused a freed one's id
+        return cached[1]
 
-    # Prepare dataframe
     users_data = []
-    for user in st.session_state.get("auth0_users", []):
+    for user in snapshot.users:
         roles = user.get('app_metadata', {}).get('roles', [])
         invited = user.get('app_metadata', {}).get('invited', False)
         users_data.append({
@@ -128,26 +182,30 @@ def list_auth0_users(access_token):
             "Logins Count": user.get('logins_count', 0),
             "User ID": user.get('user_id')
         })
+    # A weak reference, so a replaced snapshot isn't kept alive by the cache
+    USER_ROWS_CACHE.set(id(snapshot), (weakref.ref(snapshot), users_data))
+    return users_data
+
+def user_list_job_status():
+    """Show the user listing job's progress and rerun the page once it finishes."""
+    job = get_job(st.session_state.get("auth0_users_job_id"))
+    if job is None:  # Pruned or lost (e.g. process restart)
+        st.session_state.auth0_users_job_id = None
+        st.rerun()
+    if not job.done:
+        st.progress(job.progress, text=f"Loading users… {job.progress:.0%}")
+        return
 
-    if users_data:
-        st.dataframe(
-            users_data,
-            use_container_width=True,
-            key="user_selection",
-            on_select="rerun",
-            selection_mode="single-row",
-            hide_index=True
-        )
-    else:
-        st.info("No users found.")
-
-    return True
+    # The result is in the shared cache; only the outcome is kept per session
+    st.session_state.auth0_users_job_id = None
+    st.session_state.auth0_users_error = job.error
+    st.rerun()
 
 def update_user_roles(access_token, user_id, new_roles):
     """Updates a user's roles in Auth0."""
     try:
-        response = requests.patch(
-            f'https://{AUTH0_DOMAIN}/api/v2/users/{user_id}',
+        response = auth0_request(
+            "PATCH", f'/api/v2/users/{user_id}', AUTH0_DOMAIN,
             json={"app_metadata": {"roles": new_roles}},
             headers={
                 "Authorization": f"Bearer {access_token}",
@@ -155,6 +213,8 @@ def update_user_roles(access_token, user_id, new_roles):
             }
         )
         response.raise_for_status()
+        # Patch the shared list instead of re-downloading it for every admin
+        patch_cached_user(AUTH0_DOMAIN, user_id, {"app_metadata": {"roles": new_roles}})
         st.success("Roles updated successfully.")
         return True
     except requests.exceptions.HTTPError as e:
@@ -164,8 +224,8 @@ def update_user_roles(access_token, user_id, new_roles):
 def trigger_password_email(email, connection, client_id):
     """Triggers Auth0 to send a password reset email."""
     try:
-        response = requests.post(
-            f'https://{AUTH0_DOMAIN}/dbconnections/change_password',
+        response = auth0_request(
+            "POST", '/dbconnections/change_password', AUTH0_DOMAIN,
             json={
                 "client_id": client_id,
                 "email": email,
@@ -198,8 +258,8 @@ def create_user(access_token, email, connection, initial_roles=None):
             **({"roles": initial_roles} if initial_roles else {})
         }
 
-        response = requests.post(
-            f'https://{AUTH0_DOMAIN}/api/v2/users',
+        response = auth0_request(
+            "POST", '/api/v2/users', AUTH0_DOMAIN,
             json=payload,
             headers={
                 "Authorization": f"Bearer {access_token}",
@@ -225,8 +285,8 @@ def create_user(access_token, email, connection, initial_roles=None):
 def manually_verify_user(access_token, user_id):
     """Manually verify a user's email address."""
     try:
-        response = requests.patch(
-            f'https://{AUTH0_DOMAIN}/api/v2/users/{user_id}',
+        response = auth0_request(
+            "PATCH", f'/api/v2/users/{user_id}', AUTH0_DOMAIN,
             json={"email_verified": True},
             headers={
                 "Authorization": f"Bearer {access_token}",
@@ -234,6 +294,7 @@ def manually_verify_user(access_token, user_id):
             }
         )
         response.raise_for_status()
+        patch_cached_user(AUTH0_DOMAIN, user_id, {"email_verified": True})
         return True
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 403:
@@ -247,8 +308,8 @@ def generate_password_reset_ticket(access_token, user_id):
     """Generate a password reset ticket/link for manual sharing."""
     try:
         # Get the user details first to ensure they exist
-        user_response = requests.get(
-            f'https://{AUTH0_DOMAIN}/api/v2/users/{user_id}',
+        user_response = auth0_request(
+            "GET", f'/api/v2/users/{user_id}', AUTH0_DOMAIN,
             headers={"Authorization": f"Bearer {access_token}"}
         )
         user_response.raise_for_status()
@@ -260,8 +321,8 @@ def generate_password_reset_ticket(access_token, user_id):
             st.error("Missing STREAMLIT_AUTH_CLIENT_ID environment variable.")
             return None
 
-        response = requests.post(
-            f'https://{AUTH0_DOMAIN}/api/v2/tickets/password-change',
+        response = auth0_request(
+            "POST", '/api/v2/tickets/password-change', AUTH0_DOMAIN,
             json={
                 "user_id": user_id,
                 "client_id": client_id,
@@ -283,23 +344,18 @@ def generate_password_reset_ticket(access_token, user_id):
         st.error(f"Error generating password reset ticket: {e}")
         return None
 
-# --- Main Page Logic ---
-
-# Initialize session state
-if "auth0_users" not in st.session_state:
-    st.session_state.auth0_users = []
+# --- Page Sections ---
 
-# Main content
-if m2m_token := fetch_m2m_token():
-
-    # User list
-    list_auth0_users(m2m_token)
+@st.fragment
+def users_section(access_token):
+    """Users table, refresh button and role editor (which edits the table's selected row)."""
+    list_auth0_users(access_token)
 
     if st.button("Refresh Users"):
         st.session_state.force_user_list_refresh = True
         if "user_selection" in st.session_state:
             st.session_state.user_selection.selection.rows = []
-        st.rerun()
+        data_changed("users", "user_list")
 
     # Edit roles
     st.subheader("Edit User Roles")
@@ -308,8 +364,9 @@ if m2m_token := fetch_m2m_token():
     selection = st.session_state.get("user_selection")
     if selection and selection.selection.rows:
         idx = selection.selection.rows[0]
-        if idx < len(st.session_state.get("auth0_users", [])):
-            user = st.session_state.auth0_users[idx]
+        auth0_users = get_auth0_users()
+        if idx < len(auth0_users):
+            user = auth0_users[idx]
 
             with st.form(f"edit_roles_{user['user_id']}"):
                 st.write(f"**{user.get('name', user['email'])}**")
@@ -322,13 +379,14 @@ if m2m_token := fetch_m2m_token():
                 )
 
                 if st.form_submit_button("Update Roles"):
-                    if update_user_roles(m2m_token, user['user_id'], new_roles):
-                        st.session_state.force_user_list_refresh = True
-                        st.rerun()
+                    if update_user_roles(access_token, user['user_id'], new_roles):
+                        data_changed("users", "user_roles")
     else:
         st.info("Select a user row in the Users table to edit their roles.")
 
-    # Create new user
+@st.fragment
+def invite_section(access_token):
+    """Form creating a user and sending the password setup email."""
     st.subheader("Invite New User")
     st.markdown(f"Create a user in the **{AUTH0_DATABASE_CONNECTION_NAME}** connection and trigger Auth0 to send a password setup email.")
 
@@ -339,15 +397,17 @@ if m2m_token := fetch_m2m_token():
 
         if st.form_submit_button("Create and Invite"):
             if email and AUTH0_DATABASE_CONNECTION_NAME:
-                if create_user(m2m_token, email, AUTH0_DATABASE_CONNECTION_NAME, roles):
+                if create_user(access_token, email, AUTH0_DATABASE_CONNECTION_NAME, roles):
                     st.session_state.force_user_list_refresh = True
-                    st.toast(f"Invitation sent to {email}.", icon="📩")
+                    data_changed("invite", "user_list", toast=(f"Invitation sent to {email}.", "📩"))
             elif not email:
                 st.warning("Please enter an email address.")
             else:
                 st.error("AUTH0_DATABASE_CONNECTION_NAME not configured.")
 
-    # Manual User Verification
+@st.fragment
+def verification_section(access_token):
+    """Manual email verification of unverified users."""
     st.subheader("Manual Email Verification")
     st.markdown("⚠️ **Use this only when email delivery fails.** Manually verify a user's email address without sending an email.")
 
@@ -355,7 +415,7 @@ if m2m_token := fetch_m2m_token():
         st.warning("This bypasses the normal email verification process. Only use this when you have verified the user's identity through other means.")
 
         # Get unverified users
-        unverified_users = [u for u in st.session_state.get("auth0_users", [])
+        unverified_users = [u for u in get_auth0_users()
                           if not u.get('email_verified', False)]
 
         if unverified_users:
@@ -366,15 +426,16 @@ if m2m_token := fetch_m2m_token():
                 if st.form_submit_button("Verify Email", type="primary"):
                     # Extract user_id from selection
                     user_id = selected_user.split("ID: ")[1].rstrip(")")
-                    if manually_verify_user(m2m_token, user_id):
-                        st.success(
-                            "Email verified ✅ - If user can't log in, generate a one-time password-reset link below."
-                        )
-                        st.session_state.force_user_list_refresh = True
+                    if manually_verify_user(access_token, user_id):
+                        data_changed("verification", "verification", toast=(
+                            "Email verified ✅ - If user can't log in, generate a one-time password-reset link below.", "✅"
+                        ))
         else:
             st.info("No unverified users found.")
 
-    # Manual Password Reset Link Generation
+@st.fragment
+def reset_link_section(access_token):
+    """One-time password reset link generation (changes no data shown elsewhere)."""
     st.subheader("Password Reset Link")
     st.markdown(
         "Create a one-time password-reset link you can share through a secure channel if the user can't access their account or email verification fails."
@@ -383,16 +444,16 @@ if m2m_token := fetch_m2m_token():
     with st.expander("Generate link", expanded=False):
         st.info("The link is valid for 7 days and can be used only once.")
 
-        if st.session_state.get("auth0_users"):
+        if auth0_users := get_auth0_users():
             with st.form("generate_reset_link"):
                 user_list = [f"{u['email']} (ID: {u['user_id']})"
-                           for u in st.session_state.get("auth0_users", [])]
+                           for u in auth0_users]
                 selected_user_for_reset = st.selectbox("Select user", user_list)
 
                 if st.form_submit_button("Generate Link", type="primary"):
                     # Extract user_id from selection
                     user_id = selected_user_for_reset.split("ID: ")[1].rstrip(")")
-                    reset_link = generate_password_reset_ticket(m2m_token, user_id)
+                    reset_link = generate_password_reset_ticket(access_token, user_id)
 
                     if reset_link:
                         st.success("Copy the password-reset link below - treat this like a password.")
@@ -401,6 +462,15 @@ if m2m_token := fetch_m2m_token():
         else:
             st.info("No users found. Create a user first.")
 
+# --- Main Page Logic ---
+
+# Main content
+if m2m_token := fetch_m2m_token():
+    users_section(m2m_token)
+    invite_section(m2m_token)
+    verification_section(m2m_token)
+    reset_link_section(m2m_token)
+
 else:
     st.warning("M2M Access Token could not be fetched. User listing and management are unavailable.")
     st.info("Ensure the M2M application credentials are correctly set in the environment and have the required scopes (e.g., 'read:users', 'create:users', 'update:users_app_metadata').")
@@ -409,7 +479,7 @@ else:
 st.header("🔒 Page Access Management")
 st.markdown("Configure which roles can access each page in the application.")
 
-# Add this decorator to create an isolated fragment for page permissions
+# Isolated fragment for page permissions
 @st.fragment
 def page_access_management_fragment():
     """Fragment for page access management to prevent full page reruns."""
@@ -421,8 +491,8 @@ def page_access_management_fragment():
     tab1, tab2 = st.tabs(["Configure Access", "View Configuration"])
 
     with tab1:
-        # Get list of pages from ALL_PAGES (the single source of truth)
-        pages = [page["file"] for page in ALL_PAGES]
+        # Get list of pages from the page registry (the single source of truth)
+        pages = [page["file"] for page in get_all_pages()]
 
         st.markdown("### Page Permissions")
         st.caption("Define access rules for each page using the table below. Changes are saved upon clicking 'Save Configuration'.")
@@ -439,7 +509,9 @@ def page_access_management_fragment():
             row = {
                 "Page": page_name,
                 "Path": page_path,
-                "Public": is_public
+                "Public": is_public,
+                "Max Concurrent": page_config_from_file.get("max_concurrent") or 0,
+                "Queue Timeout": page_config_from_file.get("queue_timeout"),
             }
 
             for role in AVAILABLE_ROLES:
@@ -451,6 +523,7 @@ def page_access_management_fragment():
                     row[role_column_name] = role in current_roles
             data_for_editor.append(row)
 
+        import pandas as pd  # Deferred: only this editor needs a DataFrame
         df_for_editor = pd.DataFrame(data_for_editor)
 
         # --- Configure st.data_editor columns and order ---
@@ -458,6 +531,13 @@ def page_access_management_fragment():
             "Page": st.column_config.TextColumn("Page Name", help="The display name of the page.", disabled=True),
             "Path": None, # Hidden from display
             "Public": st.column_config.CheckboxColumn("Public", help="Accessible by anyone, no login required."),
+            "Max Concurrent": st.column_config.NumberColumn(
+                "Max Concurrent", min_value=0, step=1,
+                help="Reruns of the page allowed to run at once in each app process (0: unlimited)."),
+            "Queue Timeout": st.column_config.NumberColumn(
+                "Queue Timeout (s)", min_value=0.0, step=0.5,
+                help="How long a rerun over the limit waits for a slot before showing a busy message "
+                     "(empty: ADMISSION_QUEUE_TIMEOUT_SECONDS)."),
         }
 
         final_column_order = ["Page", "Public"]
@@ -479,6 +559,7 @@ def page_access_management_fragment():
             final_column_order.append(admin_role_key_actual_title_case)
 
         final_column_order.extend(sorted(other_role_columns_title_case))
+        final_column_order.extend(["Max Concurrent", "Queue Timeout"])
 
         # --- Display st.data_editor ---
         edited_df = st.data_editor(
@@ -531,16 +612,21 @@ def page_access_management_fragment():
                         st.error(error)
                     st.stop()
 
-                # Continue with the rest of the save process
-                updated_config = {"version": config["version"], "default_access": default_access, "pages": {}}
+                # Continue with the rest of the save process. Keys this editor doesn't
+                # manage (e.g. role_priorities) are kept as they are.
+                updated_config = {**config, "default_access": default_access, "pages": {}}
 
                 # Process data from the edited dataframe
                 for _, row_data in edited_df.iterrows():
                     page_path = row_data["Path"]
                     is_public_edited = row_data["Public"]
+                    rule = {
+                        key: value for key, value in config["pages"].get(page_path, {}).items()
+                        if key not in ("access", "roles", "max_concurrent", "queue_timeout")
+                    }
 
                     if is_public_edited:
-                        updated_config["pages"][page_path] = {"access": "public"}
+                        rule["access"] = "public"
                     else:
                         selected_roles = []
                         for role in AVAILABLE_ROLES:
@@ -549,15 +635,22 @@ def page_access_management_fragment():
                                 selected_roles.append(role)
 
                         if selected_roles:
-                            updated_config["pages"][page_path] = {"roles": selected_roles}
-                        else:
-                            updated_config["pages"][page_path] = {} # Uses default access
+                            rule["roles"] = selected_roles
+                        # Without roles the page uses the default access
+
+                    # Admission limits (see utils/admission.py); 0 is saved so it overrides PAGE_META
+                    if not pd.isna(row_data["Max Concurrent"]):
+                        rule["max_concurrent"] = int(row_data["Max Concurrent"])
+                    if not pd.isna(row_data["Queue Timeout"]):
+                        rule["queue_timeout"] = float(row_data["Queue Timeout"])
+                    updated_config["pages"][page_path] = rule
 
                 if save_page_access_config(updated_config):
                     st.success("Page access configuration updated successfully.", icon="✅")
                 else:
                     st.error("Failed to save configuration. Please check the logs.")
-                st.rerun() # This will only rerun the fragment now!
+                # The sidebar navigation depends on the rules, so this reruns the whole page
+                data_changed("page_access", "page_access")
 
     with tab2:
         # Display current configuration